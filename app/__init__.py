@@ -9,8 +9,20 @@ def create_app():
     app.config.from_object(Config)
     db.init_app(app)
 
+    # Latencia y códigos de estado por ruta para /metrics
+    from app.metrics import metrics
+    metrics.init_app(app)
+
+    # `flask init-db` (DDL de inventory / item_comparison) y esquema opcional al arrancar
+    from app.schema import init_app as init_schema
+    init_schema(app)
+
     # Importar y registrar rutas
     from app.routes import main
     app.register_blueprint(main)
 
+    if Config.WARMUP_ON_START:
+        from app.warmup import warm_up
+        app.logger.info(f"Warm-up: {warm_up()}")
+
     return app
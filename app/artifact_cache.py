@@ -0,0 +1,239 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+from config.config import Config
+
+
+class ArtifactCache:
+    """
+    Caché local en disco de artefactos (CSV/PDF generados y objetos descargados de Storage).
+
+    - Cada entrada se identifica por su ruta en Storage (p. ej. "pdf/<user_id>/<archivo>.pdf").
+    - El índice (tamaño, ETag, último acceso) vive en SQLite para que todos los
+      workers del mismo host lo compartan sin recorrer el directorio.
+    - Se respeta un presupuesto de bytes (LRU) y un TTL; un hilo "janitor"
+      desaloja las entradas vencidas en segundo plano.
+    """
+
+    def __init__(self, directory, max_bytes, ttl_seconds=3600, janitor_interval=60):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.janitor_interval = janitor_interval
+        self.db_path = os.path.join(self.directory, "index.sqlite3")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._janitor_pid = None
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db_ready = False
+
+    def _connect(self):
+        self._ensure_db()
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def _ensure_db(self):
+        # Primer uso, no __init__: el singleton del módulo no toca el disco al importarse
+        if self._db_ready:
+            return
+        with self._db_lock:
+            if self._db_ready:
+                return
+            os.makedirs(os.path.join(self.directory, "objects"), exist_ok=True)
+            with sqlite3.connect(self.db_path, timeout=10) as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS artifacts (
+                        key TEXT PRIMARY KEY,
+                        path TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        etag TEXT,
+                        last_modified REAL NOT NULL,
+                        created_at REAL NOT NULL,
+                        last_access REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS artifacts_last_access ON artifacts (last_access)")
+            self._db_ready = True
+
+    def _path_for(self, key):
+        self._ensure_db()  # crea objects/ antes de escribir
+        extension = os.path.splitext(key)[1]
+        return os.path.join(self.directory, "objects", hashlib.sha1(key.encode('utf-8')).hexdigest() + extension)
+
+    def _ensure_janitor(self):
+        # Un hilo por proceso: tras el fork de gunicorn cada worker arranca el suyo
+        if self._janitor_pid == os.getpid():
+            return
+        with self._lock:
+            if self._janitor_pid == os.getpid():
+                return
+            self._janitor_pid = os.getpid()
+            threading.Thread(target=self._janitor, name="artifact-cache-janitor", daemon=True).start()
+
+    def _janitor(self):
+        while True:
+            time.sleep(self.janitor_interval)
+            try:
+                self.evict()
+            except Exception as e:
+                print(f"Error en limpieza de caché de artefactos: {e}")
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"No se pudo eliminar {path}: {e}")
+
+    def get(self, key):
+        """Devuelve la entrada vigente (path, size, etag, last_modified) o None."""
+        self._ensure_janitor()
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT path, size, etag, last_modified, created_at FROM artifacts WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row and (now - row[4] > self.ttl_seconds or not os.path.exists(row[0])):
+                conn.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+                self._remove_file(row[0])
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE artifacts SET last_access = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return {"path": row[0], "size": row[1], "etag": row[2], "last_modified": row[3]}
+
+    def adopt(self, key, source_path, etag=None):
+        """
+        Mueve a la caché un archivo ya generado (en lugar de borrarlo).
+        Si no se indica ETag se usa el MD5 del contenido, que coincide con el
+        ETag que devuelve Storage para subidas de una sola parte.
+        """
+        if etag is None:
+            digest = hashlib.md5()
+            with open(source_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            etag = f'"{digest.hexdigest()}"'
+        path = self._path_for(key)
+        try:
+            os.replace(source_path, path)
+        except OSError:
+            shutil.move(source_path, path)
+        self._register(key, path, os.path.getsize(path), etag, time.time())
+
+    def writer(self, key, etag=None, last_modified=None, expected_size=None):
+        """
+        Escritor por bloques para guardar un objeto mientras se envía al cliente.
+        Devuelve None si el objeto no cabe en el presupuesto de la caché.
+        """
+        if expected_size is not None and expected_size > self.max_bytes:
+            return None
+        return _ArtifactWriter(self, key, etag, last_modified)
+
+    def _register(self, key, path, size, etag, last_modified):
+        self._ensure_janitor()
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO artifacts (key, path, size, etag, last_modified, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, path, size, etag, last_modified, now, now)
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+        if total > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Elimina las entradas vencidas y, si hace falta, las menos usadas hasta cumplir el presupuesto."""
+        now = time.time()
+        removed = []
+        with self._connect() as conn:
+            expired = conn.execute(
+                "SELECT key, path FROM artifacts WHERE created_at < ?", (now - self.ttl_seconds,)
+            ).fetchall()
+            removed.extend(expired)
+
+            total = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM artifacts WHERE created_at >= ?", (now - self.ttl_seconds,)
+            ).fetchone()[0]
+            if total > self.max_bytes:
+                for key, path, size in conn.execute(
+                    "SELECT key, path, size FROM artifacts WHERE created_at >= ? ORDER BY last_access",
+                    (now - self.ttl_seconds,)
+                ).fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    removed.append((key, path))
+                    total -= size
+
+            conn.executemany("DELETE FROM artifacts WHERE key = ?", [(key,) for key, _ in removed])
+
+        for _, path in removed:
+            self._remove_file(path)
+        self.evictions += len(removed)
+        return len(removed)
+
+    def stats(self):
+        with self._connect() as conn:
+            entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0,
+            "evictions": self.evictions
+        }
+
+
+class _ArtifactWriter:
+    """Archivo temporal que solo se registra en la caché si se escribe completo (`commit`)."""
+
+    def __init__(self, cache, key, etag, last_modified):
+        self.cache = cache
+        self.key = key
+        self.etag = etag
+        self.last_modified = last_modified
+        self.path = cache._path_for(key)
+        self.tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self.size = 0
+        self._file = open(self.tmp_path, 'wb')
+
+    def write(self, chunk):
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def commit(self):
+        self._file.close()
+        if self.size > self.cache.max_bytes:
+            self.discard()
+            return
+        os.replace(self.tmp_path, self.path)
+        self.cache._register(self.key, self.path, self.size, self.etag, self.last_modified or time.time())
+
+    def discard(self):
+        self._file.close()
+        self.cache._remove_file(self.tmp_path)
+
+
+# Caché compartida por todo el proceso
+artifact_cache = ArtifactCache(
+    Config.ARTIFACT_CACHE_DIR,
+    max_bytes=Config.ARTIFACT_CACHE_MAX_BYTES,
+    ttl_seconds=Config.ARTIFACT_CACHE_TTL,
+    janitor_interval=Config.ARTIFACT_CACHE_JANITOR_INTERVAL
+)
@@ -0,0 +1,79 @@
+import io
+import threading
+
+from sqlalchemy import inspect, text
+
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+
+def ensure_table(engine, table):
+    """
+    Crea la tabla del modelo si no existe, agrega las columnas del modelo que
+    falten y crea sus índices. Se ejecuta una vez por proceso, base de datos y tabla.
+    Es DDL: se llama desde app/schema.py (`flask init-db`) y los benchmarks, no en peticiones.
+    """
+    key = (str(engine.url), table.name)
+    if key in _schema_ready:
+        return
+    with _schema_lock:
+        if key in _schema_ready:
+            return
+        with engine.begin() as conn:
+            table.create(conn, checkfirst=True)
+            existing = {column['name'] for column in inspect(conn).get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+        _schema_ready.add(key)
+
+
+def _copy_batches(conn, table, columns, batches, not_null=()):
+    """PostgreSQL: un COPY ... FROM STDIN por lote sobre la conexión (y transacción) de `conn`."""
+    options = "FORMAT csv"
+    if not_null:
+        # Sin FORCE_NOT_NULL un texto vacío se cargaría como NULL
+        options += f", FORCE_NOT_NULL ({', '.join(not_null)})"
+    sql = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH ({options})"
+
+    cursor = conn.connection.cursor()
+    try:
+        for batch in batches:
+            buffer = io.StringIO()
+            batch[columns].to_csv(buffer, header=False, index=False, date_format='%Y-%m-%d %H:%M:%S')
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+    finally:
+        cursor.close()
+
+
+def _insert_batches(conn, table, columns, batches):
+    """Otros motores (SQLite en pruebas locales): INSERT con executemany por lote."""
+    statement = table.insert()
+    for batch in batches:
+        batch = batch[columns]
+        records = batch.astype(object).where(batch.notna(), None).to_dict('records')
+        conn.execute(statement, records)
+
+
+def bulk_load(engine, table, columns, batches, not_null=(), before=None):
+    """
+    Inserta DataFrames por lotes en una sola transacción: COPY (psycopg2) en
+    PostgreSQL y executemany en otros motores; nunca objetos ORM fila por fila.
+    `not_null` son las columnas de texto donde "" no debe convertirse en NULL.
+    `before` es una sentencia opcional (p. ej. un DELETE de las filas que se
+    reemplazan) que corre en la misma transacción antes de insertar.
+    Devuelve el método usado ('copy' o 'insert').
+    """
+    postgres = engine.dialect.name == 'postgresql'
+    with engine.begin() as conn:
+        if before is not None:
+            conn.execute(before)
+        if postgres:
+            _copy_batches(conn, table, columns, batches, not_null)
+        else:
+            _insert_batches(conn, table, columns, batches)
+    return 'copy' if postgres else 'insert'
@@ -0,0 +1,181 @@
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, delete, false, select, true, update
+
+from app.bulk import bulk_load, ensure_table
+from app.matching import as_index, find_id_column
+from app.models import ItemComparison
+
+# Orden de columnas de COPY / INSERT
+STORE_COLUMNS = ['user_id', 'item_number', 'description', 'is_matched', 'matched_with', 'source_file', 'created_at']
+
+
+def ensure_comparison_schema(engine):
+    """Crea `item_comparison` y sus índices si faltan (benchmarks; en despliegue se usa `flask init-db`)."""
+    ensure_table(engine, ItemComparison.__table__)
+
+
+class ReferenceMatcher:
+    """
+    Resuelve con qué item de la referencia coincide cada item, con las mismas
+    reglas que match_items: igual tal cual o igual sin ceros a la izquierda.
+    La tabla normalizado -> original se arma una vez y sirve para muchos lotes.
+    """
+
+    def __init__(self, reference_original):
+        self.original = as_index(reference_original)
+        values = self.original.to_numpy(dtype=object)
+        by_normalized = pd.Series(values, index=[item.lstrip('0') for item in values.tolist()], dtype=object)
+        # Si varios items normalizan igual ("0123" y "123") se usa el primero
+        self.by_normalized = by_normalized[~by_normalized.index.duplicated()]
+
+    def targets(self, items):
+        """Array con el item de referencia de cada item (None si no coincide)."""
+        items = np.asarray(items, dtype=object)
+        targets = np.full(len(items), None, dtype=object)
+        if not len(items) or not len(self.original):
+            return targets
+        exact = self.original.get_indexer(items) >= 0
+        targets[exact] = items[exact]
+
+        rest = np.flatnonzero(~exact)
+        normalized = [item.lstrip('0') for item in items[rest].tolist()]
+        positions = self.by_normalized.index.get_indexer(normalized)
+        found = positions >= 0
+        targets[rest[found]] = self.by_normalized.to_numpy()[positions[found]]
+        return targets
+
+
+def _description(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    return str(value).strip()[:255] or None
+
+
+def comparison_frame(parsed_files, matcher, user_id, created_at=None):
+    """
+    Filas de item_comparison para los archivos de process-all: un registro por
+    item distinto de cada archivo, con la descripción del manifiesto (item_desc)
+    y el item de referencia con el que coincidió.
+    """
+    lengths = {column.name: getattr(column.type, 'length', None) for column in ItemComparison.__table__.columns}
+    frames = []
+    for stored_name, df in parsed_files:
+        id_col = find_id_column(df)
+        if id_col is None:
+            continue
+        part = df.loc[df[id_col].notna()]
+        frame = pd.DataFrame({
+            # Mismo texto que compara match_items (conserva ceros a la izquierda)
+            'item_number': [str(value).strip() for value in part[id_col].tolist()],
+            'description': part['item_desc'].tolist() if 'item_desc' in part.columns else None
+        })
+        frame = frame.drop_duplicates('item_number')
+        frame['description'] = [_description(value) for value in frame['description'].tolist()]
+        frame['source_file'] = stored_name[:lengths['source_file']]
+        frames.append(frame)
+
+    if not frames:
+        return pd.DataFrame(columns=STORE_COLUMNS)
+    out = pd.concat(frames, ignore_index=True)
+    targets = matcher.targets(out['item_number'].to_numpy(dtype=object))
+    out['is_matched'] = targets != None  # noqa: E711 (comparación elemento a elemento)
+    out['matched_with'] = [target[:lengths['matched_with']] if target is not None else None for target in targets]
+    out['item_number'] = out['item_number'].str.slice(0, lengths['item_number'])
+    out['user_id'] = user_id[:lengths['user_id']]
+    out['created_at'] = created_at or datetime.utcnow()
+    return out[STORE_COLUMNS]
+
+
+def store_comparisons(engine, parsed_files, reference_original, user_id, batch_size=50000):
+    """
+    Guarda el resultado de la comparación de process-all en item_comparison
+    con escrituras por lotes (COPY en PostgreSQL, executemany en otros motores).
+
+    Reemplaza lo guardado antes para cada (user_id, source_file) de
+    `parsed_files`: volver a procesar el mismo archivo no duplica filas. El
+    DELETE y la carga van en la misma transacción. La tabla debe existir
+    (`flask init-db`). Devuelve filas, coincidentes, no coincidentes, método y segundos.
+    """
+    started = time.time()
+    table = ItemComparison.__table__
+    frame = comparison_frame(parsed_files, ReferenceMatcher(reference_original), user_id)
+    length = table.c.source_file.type.length
+    replaced = delete(table).where(
+        table.c.user_id == user_id[:table.c.user_id.type.length],
+        table.c.source_file.in_([name[:length] for name, _ in parsed_files])
+    )
+    batches = (frame.iloc[start:start + batch_size] for start in range(0, len(frame), batch_size))
+    method = bulk_load(engine, table, STORE_COLUMNS, batches, not_null=['item_number'], before=replaced)
+    matched = int(frame['is_matched'].sum())
+    return {
+        "rows": len(frame),
+        "matched": matched,
+        "unmatched": len(frame) - matched,
+        "method": method,
+        "seconds": round(time.time() - started, 4)
+    }
+
+
+def recompare_unmatched(engine, reference_original, removed_items=(), batch_size=10000):
+    """
+    Re-evalúa contra la referencia nueva solo las filas guardadas que no
+    coincidían, sin volver a leer los archivos históricos.
+
+    Las filas que coincidían con un item borrado de la referencia
+    (`removed_items`) pasan primero a no coincidentes, así que también se
+    re-evalúan (pueden seguir coincidiendo por su forma sin ceros). Las filas
+    no coincidentes se recorren por id en lotes de `batch_size`, cada lote en
+    su propia transacción, con el índice (is_matched, id).
+    """
+    started = time.time()
+    table = ItemComparison.__table__
+    matcher = ReferenceMatcher(reference_original)
+
+    demoted = 0
+    removed_items = list(removed_items)
+    with engine.begin() as conn:
+        for start in range(0, len(removed_items), 1000):
+            result = conn.execute(
+                update(table)
+                .where(table.c.is_matched == true(), table.c.matched_with.in_(removed_items[start:start + 1000]))
+                .values(is_matched=False, matched_with=None)
+            )
+            demoted += result.rowcount
+
+    promote = update(table)\
+        .where(table.c.id == bindparam('row_id'))\
+        .values(is_matched=True, matched_with=bindparam('target'))
+    length = table.c.matched_with.type.length
+    checked = matched = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.item_number)
+                .where(table.c.is_matched == false(), table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            checked += len(rows)
+            targets = matcher.targets([row.item_number for row in rows])
+            updates = [
+                {"row_id": row.id, "target": target[:length]}
+                for row, target in zip(rows, targets.tolist()) if target is not None
+            ]
+            if updates:
+                conn.execute(promote, updates)
+                matched += len(updates)
+
+    return {
+        "checked": checked,
+        "matched": matched,
+        "demoted": demoted,
+        "seconds": round(time.time() - started, 4)
+    }
@@ -0,0 +1,207 @@
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from config.config import Config
+
+FILE_TYPES = ['pdf', 'csv', 'xlsx']
+BUCKET_NAME = 'uploads'
+
+
+def fetch_folder(client, file_type, folder, page_size=1000):
+    """
+    Lista todos los objetos de `folder` en Storage, ordenados por fecha
+    (recientes primero). Se pagina con limit/offset porque `list()` devuelve
+    como máximo `limit` objetos por llamada.
+
+    Un objeto sin `created_at` toma la fecha actual (como el listado
+    original), así que se reordena antes de intercalarlo con los demás tipos.
+    """
+    entries = []
+    offset = 0
+    fallback = None
+    while True:
+        response = client.storage.from_(BUCKET_NAME).list(folder, {
+            "limit": page_size,
+            "offset": offset,
+            "sortBy": {"column": "created_at", "order": "desc"}
+        })
+        if not response:
+            break
+        for file_info in response:
+            file_name = file_info.get('name', '')
+            if not file_name or file_name.startswith('.'):
+                continue
+            created_at = file_info.get('created_at')
+            if not created_at:
+                fallback = fallback or datetime.now().isoformat()
+                created_at = fallback
+            entries.append((
+                created_at,
+                file_type,
+                file_name,
+                (file_info.get('metadata') or {}).get('size', 0)
+            ))
+        if len(response) < page_size:
+            break
+        offset += page_size
+    if fallback:
+        # Storage ordena los objetos sin fecha al final; con la fecha actual van primero
+        entries.sort(key=lambda entry: entry[0], reverse=True)
+    return entries
+
+
+class FileListingCache:
+    """
+    Caché por usuario y tipo de los listados de Storage usados en /api/files.
+
+    Cada subida a `<tipo>/<user_id>/` incrementa una generación guardada en
+    SQLite (compartida por los workers del mismo host); un listado en memoria
+    solo se reutiliza si su generación sigue vigente y no ha expirado el TTL.
+    """
+
+    def __init__(self, db_path, ttl_seconds=60):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db_ready = False
+
+    def _connect(self):
+        self._ensure_db()
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def _ensure_db(self):
+        # Al primer uso: importar el módulo no crea FILE_LISTING_DB
+        if self._db_ready:
+            return
+        with self._db_lock:
+            if self._db_ready:
+                return
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with sqlite3.connect(self.db_path, timeout=10) as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS listing_generations (
+                        prefix TEXT PRIMARY KEY,
+                        generation INTEGER NOT NULL
+                    )
+                """)
+            self._db_ready = True
+
+    def _generations(self, prefixes):
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT prefix, generation FROM listing_generations WHERE prefix IN ({','.join('?' * len(prefixes))})",
+                prefixes
+            ).fetchall()
+        generations = dict(rows)
+        return {prefix: generations.get(prefix, 0) for prefix in prefixes}
+
+    def invalidate(self, prefix):
+        """Marca como obsoleto el listado de `prefix` ("<tipo>/<user_id>") en todos los workers."""
+        with self._lock:
+            self._entries.pop(prefix, None)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO listing_generations (prefix, generation) VALUES (?, 1) "
+                "ON CONFLICT(prefix) DO UPDATE SET generation = generation + 1",
+                (prefix,)
+            )
+
+    def invalidate_path(self, destination_path):
+        """Invalida el listado que contiene `destination_path` (p. ej. "pdf/<user_id>/archivo.pdf")."""
+        prefix = destination_path.rsplit('/', 1)[0]
+        if prefix and prefix != destination_path:
+            self.invalidate(prefix)
+
+    def get(self, client, user_id, file_types):
+        """
+        Devuelve {tipo: [(created_at, tipo, nombre, tamaño), ...]} para el usuario.
+        Los tipos que no están en caché se listan en paralelo.
+        """
+        prefixes = [f"{file_type}/{user_id}" for file_type in file_types]
+        generations = self._generations(prefixes)
+        now = time.time()
+
+        result = {}
+        missing = []
+        for file_type, prefix in zip(file_types, prefixes):
+            cached = self._entries.get(prefix)
+            if cached and cached[1] == generations[prefix] and now - cached[2] < self.ttl_seconds:
+                result[file_type] = cached[0]
+                self.hits += 1
+            else:
+                missing.append((file_type, prefix))
+                self.misses += 1
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=len(missing), thread_name_prefix="storage-list") as executor:
+                futures = [(file_type, prefix, executor.submit(fetch_folder, client, file_type, prefix)) for file_type, prefix in missing]
+                for file_type, prefix, future in futures:
+                    try:
+                        entries = future.result()
+                    except Exception as e:
+                        # Igual que antes: un tipo que falla no impide listar los demás
+                        print(f"Error al listar {file_type}: {str(e)}")
+                        result[file_type] = []
+                        continue
+                    result[file_type] = entries
+                    with self._lock:
+                        self._entries[prefix] = (entries, generations[prefix], now)
+        return result
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0,
+            "cached_listings": len(self._entries),
+            "ttl_seconds": self.ttl_seconds
+        }
+
+
+def list_files_page(client, user_id, file_types, page, limit, search_term=''):
+    """
+    Página de archivos del usuario ordenada por fecha (recientes primero).
+    Devuelve (archivos_de_la_página, total). La URL pública solo se calcula
+    para los archivos de la página.
+    """
+    listings = file_listing_cache.get(client, user_id, file_types)
+
+    # Cada listado ya viene ordenado por fecha: basta con intercalarlos hasta la página pedida
+    streams = [listings.get(file_type, []) for file_type in file_types]
+    if search_term:
+        streams = [[entry for entry in entries if search_term in entry[2].lower()] for entries in streams]
+    total = sum(len(entries) for entries in streams)
+
+    start = (page - 1) * limit
+    merged = heapq.merge(*streams, key=lambda entry: entry[0], reverse=True)
+    page_entries = itertools.islice(merged, start, start + limit)
+
+    bucket = client.storage.from_(BUCKET_NAME)
+    files = []
+    for created_at, file_type, name, size in page_entries:
+        files.append({
+            "nombre": name,
+            "tipo": file_type,
+            "fecha_subida": created_at,
+            "tamano": size,
+            "url": bucket.get_public_url(f"{file_type}/{user_id}/{name}")
+        })
+    return files, total
+
+
+# Caché compartida por todo el proceso
+file_listing_cache = FileListingCache(Config.FILE_LISTING_DB, ttl_seconds=Config.FILE_LISTING_TTL)
@@ -0,0 +1,328 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from openpyxl.cell.cell import ERROR_CODES as _ERROR_CODES
+
+from config.config import Config
+
+SUPPORTED_EXTENSIONS = ('.xlsx', '.csv')
+
+# Columnas que usa el pipeline de process-all (consolidación, CSV, PDF y comparación)
+MANIFEST_COLUMNS = ['series_desc', 'pallet_id', 'item_id', 'item_desc', 'us_price', 'quantity']
+ID_COLUMN_ALIASES = ['item_id', 'no.', 'no', 'item_number', 'number']
+PIPELINE_COLUMNS = MANIFEST_COLUMNS + [col for col in ID_COLUMN_ALIASES if col not in MANIFEST_COLUMNS]
+# Columnas del manifiesto que se cargan en la tabla Inventory (app/inventory.py)
+INVENTORY_COLUMNS = [
+    'series_code', 'series_desc', 'pallet_id', 'pallet_available_flag',
+    'item_id', 'item_desc', 'family_code', 'reporting_group_desc',
+    'publisher_desc', 'imprint_desc', 'us_price', 'can_price', 'pub_date',
+    'quantity', 'extended_retail', 'extended_percent'
+]
+# Esquema tipado del manifiesto (apply_manifest_schema): textos que se codifican como
+# categoría si se repiten lo suficiente y columnas enteras que se reducen al tipo más angosto.
+# Los precios se quedan en float64: float32 no representa centavos con exactitud en sumas.
+CATEGORY_COLUMNS = [
+    'series_code', 'series_desc', 'pallet_id', 'item_id', 'item_desc', 'family_code',
+    'reporting_group_desc', 'publisher_desc', 'imprint_desc'
+]
+INTEGER_COLUMNS = ['quantity']
+# Filas iniciales con las que se descarta rápido un texto casi único (item_desc)
+CATEGORY_SAMPLE_ROWS = 2000
+
+
+def detect_delimiter(file_path, default=','):
+    """Detecta el separador de un CSV (',' o ';') leyendo una muestra inicial."""
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        sample = f.read(1024)
+    if ',' in sample:
+        return ','
+    if ';' in sample:
+        return ';'
+    return default
+
+
+def column_filter(columns):
+    """
+    Devuelve un callable para `usecols` que conserva solo las columnas pedidas,
+    comparando nombres sin espacios y en minúsculas. None = todas las columnas.
+    """
+    if columns is None:
+        return None
+    wanted = {str(col).strip().lower() for col in columns}
+    return lambda name: str(name).strip().lower() in wanted
+
+
+def available_engines():
+    """Motores de lectura de Excel disponibles en este entorno, del más rápido al más lento."""
+    engines = []
+    try:
+        import python_calamine  # noqa: F401
+        engines.append('calamine')
+    except ImportError:
+        pass
+    engines.extend(['openpyxl-stream', 'openpyxl'])
+    return engines
+
+
+def resolve_engine(engine=None):
+    """Resuelve el motor configurado; 'auto' elige el más rápido instalado."""
+    engine = (engine or Config.INGEST_ENGINE or 'auto').lower()
+    engines = available_engines()
+    if engine == 'auto':
+        return engines[0]
+    if engine not in engines:
+        print(f"Motor de lectura '{engine}' no disponible, usando {engines[0]}")
+        return engines[0]
+    return engine
+
+
+def _convert_cell(value):
+    """Misma conversión de celdas que pandas aplica con openpyxl."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value in _ERROR_CODES:
+        return np.nan
+    return value
+
+
+def _read_xlsx_streaming(path, columns=None):
+    """
+    Lee la primera hoja con openpyxl en modo read-only recorriendo solo valores
+    (sin objetos Cell ni estilos) y convirtiendo únicamente las columnas pedidas.
+    La inferencia de tipos es la misma de pd.read_excel (TextParser).
+    """
+    from openpyxl import load_workbook
+    from pandas.io.parsers import TextParser
+
+    workbook = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()
+        rows = sheet.iter_rows(values_only=True)
+        header = list(next(rows, None) or [])
+        while header and header[-1] is None:
+            header.pop()
+        if not header:
+            return pd.DataFrame()
+
+        keep_column = column_filter(columns)
+        indexes = [i for i, name in enumerate(header)
+                   if keep_column is None or (name is not None and keep_column(name))]
+
+        data = [[_convert_cell(header[i]) for i in indexes]]
+        last_row_with_data = 0
+        for row in rows:
+            width = len(row)
+            values = [_convert_cell(row[i]) if i < width else "" for i in indexes]
+            data.append(values)
+            if any(value != "" for value in values):
+                last_row_with_data = len(data) - 1
+
+        # Descartar filas vacías al final (igual que pandas)
+        data = data[:last_row_with_data + 1]
+        if not indexes:
+            return pd.DataFrame(index=range(len(data) - 1))
+        return TextParser(data, header=0).read()
+    finally:
+        workbook.close()
+
+
+def read_excel(path, columns=None, engine=None):
+    """Lee la primera hoja de un .xlsx con proyección de columnas y el motor más rápido disponible."""
+    engine = resolve_engine(engine)
+    if engine == 'openpyxl-stream':
+        return _read_xlsx_streaming(path, columns)
+    return pd.read_excel(path, sheet_name=0, engine=engine, usecols=column_filter(columns))
+
+
+def narrow_integers(series):
+    """Entero más angosto que contiene los valores (int8, int16...); si no son todos enteros se deja igual."""
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    if pd.api.types.is_float_dtype(series):
+        values = series.to_numpy()
+        if not np.isfinite(values).all() or (values % 1).any():
+            return series
+    elif not pd.api.types.is_integer_dtype(series):
+        return series
+    return pd.to_numeric(series, downcast='integer')
+
+
+def apply_manifest_schema(df, max_unique_ratio=None):
+    """
+    Aplica el esquema tipado del manifiesto sin cambiar los valores:
+    - CATEGORY_COLUMNS de texto con a lo más `max_unique_ratio` valores distintos
+      por fila pasan a `category` (cada texto se guarda una vez + códigos enteros);
+    - INTEGER_COLUMNS se reducen con narrow_integers.
+    Los ids leídos como número se dejan numéricos (los ceros a la izquierda solo existen en texto).
+    """
+    if max_unique_ratio is None:
+        max_unique_ratio = Config.MANIFEST_CATEGORY_RATIO
+    rows = len(df)
+    converted = {}
+    for column in df.columns:
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            continue
+        if column in CATEGORY_COLUMNS:
+            if not rows or not (pd.api.types.is_string_dtype(series) or pd.api.types.is_object_dtype(series)):
+                continue
+            # Descarte rápido con las primeras filas: si ya son casi todas distintas no se
+            # factoriza la columna completa (en el peor caso solo se pierde el ahorro)
+            sample = series.iloc[:CATEGORY_SAMPLE_ROWS]
+            if sample.nunique() > len(sample) * max_unique_ratio:
+                continue
+            # Un solo hash por columna; categorías ordenadas como las de astype('category')
+            # para que groupby/sort den el mismo orden que con texto
+            codes, uniques = pd.factorize(series, sort=True)
+            if len(uniques) <= rows * max_unique_ratio:
+                converted[column] = pd.Series(
+                    pd.Categorical.from_codes(codes, categories=uniques), index=series.index, name=column
+                )
+        elif column in INTEGER_COLUMNS:
+            narrowed = narrow_integers(series)
+            if narrowed is not series:
+                converted[column] = narrowed
+    return df.assign(**converted) if converted else df
+
+
+def concat_manifests(dfs):
+    """
+    pd.concat que conserva las columnas categóricas: si las categorías de cada
+    archivo difieren, pandas convertiría la columna a texto, así que antes se
+    unifican (unión ordenada de categorías). Si los tipos de las categorías no
+    son compatibles (ids numéricos en un archivo y texto en otro) la columna se
+    une como siempre.
+    """
+    categorical = [
+        column for column in dict.fromkeys(column for df in dfs for column in df.columns)
+        if any(isinstance(df[column].dtype, pd.CategoricalDtype) for df in dfs if column in df.columns)
+    ]
+    if len(dfs) > 1 and categorical:
+        dtypes = {}
+        for column in categorical:
+            parts = [df[column].astype('category') for df in dfs if column in df.columns]
+            try:
+                categories = union_categoricals(parts, sort_categories=True).categories
+            except TypeError:
+                continue
+            dtypes[column] = pd.CategoricalDtype(categories)
+        dfs = [
+            df.astype({column: dtype for column, dtype in dtypes.items() if column in df.columns})
+            for df in dfs
+        ]
+    return pd.concat(dfs, ignore_index=True)
+
+
+def load_dataframe(source, delimiter=None, columns=None, engine=None):
+    """
+    Devuelve un DataFrame a partir de una ruta (.xlsx/.csv) o de un DataFrame ya leído.
+    Permite que el pipeline lea cada archivo una sola vez y comparta el resultado.
+    Con `columns` solo se leen esas columnas (el resto del archivo se ignora).
+    """
+    if isinstance(source, pd.DataFrame):
+        return source
+
+    file_extension = os.path.splitext(source)[1].lower()
+    if file_extension == ".xlsx":
+        return read_excel(source, columns=columns, engine=engine)
+    elif file_extension == ".csv":
+        if delimiter is None:
+            delimiter = detect_delimiter(source)
+        return pd.read_csv(source, delimiter=delimiter, usecols=column_filter(columns))
+    raise ValueError("Formato de archivo no soportado")
+
+
+# ---------------------------------------------------------------------------
+# Lectura en paralelo (pool de procesos)
+# ---------------------------------------------------------------------------
+
+def _to_columnar(df):
+    """Representación compacta para enviar entre procesos: nombres + un array por columna."""
+    return {
+        "columns": list(df.columns),
+        # Las categorías viajan como Categorical (códigos + categorías), no como objetos
+        "arrays": [
+            df.iloc[:, i].array if isinstance(df.dtypes.iloc[i], pd.CategoricalDtype) else df.iloc[:, i].to_numpy()
+            for i in range(df.shape[1])
+        ]
+    }
+
+
+def _from_columnar(payload):
+    df = pd.DataFrame(dict(enumerate(payload["arrays"])), copy=False)
+    df.columns = payload["columns"]
+    return df
+
+
+def _parse_local(path, columns=None):
+    """Lee un archivo sin lanzar excepciones: devuelve (DataFrame, error)."""
+    try:
+        df = load_dataframe(path, columns=columns)
+        if Config.MANIFEST_COMPACT_DTYPES:
+            df = apply_manifest_schema(df)
+        return df, None
+    except Exception as e:
+        return None, str(e)
+
+
+def _parse_worker(path, columns=None):
+    """Se ejecuta en el proceso hijo: devuelve (payload columnar, error)."""
+    df, error = _parse_local(path, columns)
+    return (_to_columnar(df) if df is not None else None), error
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """Pool de procesos compartido, creado de forma diferida y recreado tras un fork."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # 'spawn' evita heredar hilos/locks del worker web (seguro con gunicorn y en Windows)
+            context = multiprocessing.get_context(Config.PARSE_START_METHOD)
+            _pool = ProcessPoolExecutor(max_workers=Config.PARSE_WORKERS, mp_context=context)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def parse_files(paths, max_workers=None, columns=None):
+    """
+    Lee varios archivos .xlsx/.csv y devuelve una lista [(DataFrame, error), ...]
+    en el mismo orden que `paths`. Con más de un archivo y PARSE_WORKERS > 1
+    la lectura se reparte entre procesos; si el pool falla se lee en este proceso.
+    """
+    workers = Config.PARSE_WORKERS if max_workers is None else max_workers
+    if workers <= 1 or len(paths) <= 1:
+        return [_parse_local(path, columns) for path in paths]
+
+    try:
+        results = list(_get_pool().map(_parse_worker, paths, [columns] * len(paths)))
+    except BrokenProcessPool as e:
+        print(f"Pool de lectura no disponible, leyendo en serie: {e}")
+        _reset_pool()
+        return [_parse_local(path, columns) for path in paths]
+
+    return [
+        (_from_columnar(payload), None) if error is None else (None, error)
+        for payload, error in results
+    ]
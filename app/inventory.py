@@ -0,0 +1,211 @@
+import base64
+import json
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, or_, select
+
+from app.bulk import bulk_load, ensure_table
+from app.models import Inventory
+
+TEXT_COLUMNS = [
+    'series_code', 'series_desc', 'pallet_id', 'item_id', 'item_desc', 'family_code',
+    'reporting_group_desc', 'publisher_desc', 'imprint_desc', 'user_id', 'source_file'
+]
+PRICE_COLUMNS = ['us_price', 'can_price', 'extended_retail', 'extended_percent']
+# Orden de columnas de COPY / INSERT: INVENTORY_COLUMNS de app.ingest + user_id, source_file
+LOAD_COLUMNS = [column.name for column in Inventory.__table__.columns if column.name != 'id']
+
+
+def ensure_inventory_schema(engine):
+    """
+    Crea la tabla `inventory` si no existe, agrega las columnas nuevas del
+    modelo que falten (user_id, source_file) y los índices del modelo
+    (item_id, pallet_id, series_code y los compuestos de /api/inventory).
+    Se ejecuta una vez por proceso y base de datos. Es DDL: en despliegue va
+    por `flask init-db` (app/schema.py); aquí queda para los benchmarks.
+    """
+    ensure_table(engine, Inventory.__table__)
+
+
+def _text(series, max_length):
+    """Texto sin espacios ni notación científica ("1234.0" -> "1234"), recortado al largo de la columna."""
+    import pandas as pd
+    if pd.api.types.is_float_dtype(series):
+        series = series.astype('Int64')
+    values = series.astype(object).where(series.notna(), '')
+    values = values.astype(str).str.strip()
+    return values.str.slice(0, max_length) if max_length else values
+
+
+def _price(series):
+    import pandas as pd
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+    cleaned = series.astype(str).str.replace(r'[\$,\s]', '', regex=True)
+    return pd.to_numeric(cleaned, errors='coerce')
+
+
+def _flag(series):
+    import pandas as pd
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    values = series.astype(str).str.strip().str.lower()
+    return values.isin(['1', 'true', 't', 'y', 'yes', 'si', 'sí'])
+
+
+def inventory_frame(df, user_id=None, source_file=None):
+    """
+    Convierte un manifiesto al formato de la tabla Inventory.
+
+    Conserva los ceros a la izquierda de los ids, limpia precios "$1,234.00",
+    y completa las columnas obligatorias ausentes. Las filas sin pub_date
+    (obligatoria en el modelo) se descartan. Devuelve (DataFrame, descartadas).
+    """
+    # pandas se importa aquí: /api/inventory usa este módulo solo para consultar
+    import numpy as np
+    import pandas as pd
+    from app.ingest import INVENTORY_COLUMNS
+
+    lengths = {column.name: getattr(column.type, 'length', None) for column in Inventory.__table__.columns}
+    out = pd.DataFrame(index=df.index)
+    for column in INVENTORY_COLUMNS:
+        source = df[column] if column in df.columns else pd.Series(np.nan, index=df.index, dtype=object)
+        if column in TEXT_COLUMNS:
+            out[column] = _text(source, lengths[column])
+        elif column in PRICE_COLUMNS:
+            out[column] = _price(source)
+        elif column == 'quantity':
+            out[column] = pd.to_numeric(source, errors='coerce').fillna(0).astype('int64')
+        elif column == 'pallet_available_flag':
+            out[column] = _flag(source)
+        elif column == 'pub_date':
+            out[column] = pd.to_datetime(source, errors='coerce')
+    out['user_id'] = (user_id or '')[:lengths['user_id']] or None
+    out['source_file'] = (source_file or '')[:lengths['source_file']] or None
+
+    missing_date = out['pub_date'].isna()
+    return out[~missing_date], int(missing_date.sum())
+
+
+def load_inventory(engine, sources, user_id=None, batch_size=50000):
+    """
+    Carga manifiestos en Inventory por lotes: COPY en PostgreSQL (psycopg2)
+    y executemany en otros motores; nunca objetos ORM fila por fila.
+
+    `sources` es una lista de (nombre de archivo, DataFrame). Como en
+    store_comparisons, las filas ya cargadas para (user_id, source_file) se
+    borran en la misma transacción antes de insertar: volver a procesar un
+    manifiesto no lo duplica. La tabla debe existir (`flask init-db`).
+    Devuelve filas cargadas, descartadas, lotes, segundos y filas/s.
+    """
+    started = time.time()
+    table = Inventory.__table__
+    user_length = table.c.user_id.type.length
+    file_length = table.c.source_file.type.length
+    # Mismos valores que escribe inventory_frame ('' se guarda como NULL)
+    stored_user = (user_id or '')[:user_length] or None
+    replaced = delete(table).where(
+        table.c.user_id == stored_user,
+        table.c.source_file.in_([(name or '')[:file_length] for name, _ in sources])
+    )
+    counts = {"rows": 0, "skipped": 0, "batches": 0}
+
+    def batches():
+        for source_file, df in sources:
+            frame, skipped = inventory_frame(df, user_id=user_id, source_file=source_file)
+            counts["skipped"] += skipped
+            for start in range(0, len(frame), batch_size):
+                batch = frame.iloc[start:start + batch_size][LOAD_COLUMNS]
+                counts["rows"] += len(batch)
+                counts["batches"] += 1
+                yield batch
+
+    not_null = [c for c in TEXT_COLUMNS if c not in ('user_id', 'source_file')]
+    method = bulk_load(engine, table, LOAD_COLUMNS, batches(), not_null=not_null, before=replaced)
+
+    elapsed = time.time() - started
+    return {
+        **counts,
+        "method": method,
+        "seconds": round(elapsed, 4),
+        "rows_per_second": int(counts["rows"] / elapsed) if elapsed > 0 else 0
+    }
+
+
+# Filtros de igualdad de /api/inventory: parámetro -> columna
+INVENTORY_FILTERS = {
+    'publisher': 'publisher_desc',
+    'imprint': 'imprint_desc',
+    'reporting_group': 'reporting_group_desc',
+    'item_id': 'item_id',
+    'pallet_id': 'pallet_id',
+    'series_code': 'series_code',
+}
+INVENTORY_SORTS = ('id', 'pub_date')
+
+
+def encode_cursor(row, sort):
+    """Cursor opaco con la clave de la última fila de la página."""
+    key = {"s": sort, "id": row['id']}
+    if sort == 'pub_date':
+        key["d"] = row['pub_date'].isoformat()
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    """Clave (id,) o (pub_date, id) del cursor; ValueError si es inválido o de otro orden."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if key["s"] != sort or not isinstance(key["id"], int):
+            raise ValueError
+        if sort == 'pub_date':
+            return datetime.fromisoformat(key["d"]), key["id"]
+        return (key["id"],)
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Cursor inválido")
+
+
+def query_inventory(connection, user_id, filters=None, pub_date_from=None, pub_date_to=None,
+                    available=None, sort='id', cursor=None, limit=100):
+    """
+    Una página de Inventory del usuario con paginación por cursor (keyset).
+
+    En lugar de OFFSET, la página siguiente empieza después de la clave de la
+    última fila entregada (`id`, o `(pub_date, id)` con sort='pub_date'), así
+    que cada página es un rango de alguno de los índices compuestos del modelo
+    y su costo no depende de cuántas páginas se hayan recorrido.
+
+    Devuelve (filas, siguiente cursor o None).
+    """
+    table = Inventory.__table__
+    conditions = [table.c.user_id == user_id]
+    key = decode_cursor(cursor, sort) if cursor else None
+    if sort == 'pub_date':
+        order = [table.c.pub_date, table.c.id]
+        if key:
+            # (pub_date, id) > cursor escrito como una sola cota inferior de pub_date
+            # más un filtro: SQLite usa solo una cota por columna para el rango del índice
+            last_date, last_id = key
+            if pub_date_from is None or last_date > pub_date_from:
+                pub_date_from = last_date
+            conditions.append(or_(table.c.pub_date > last_date, table.c.id > last_id))
+    else:
+        order = [table.c.id]
+        if key:
+            conditions.append(table.c.id > key[0])
+
+    for param, value in (filters or {}).items():
+        conditions.append(table.c[INVENTORY_FILTERS[param]] == value)
+    if pub_date_from is not None:
+        conditions.append(table.c.pub_date >= pub_date_from)
+    if pub_date_to is not None:
+        conditions.append(table.c.pub_date <= pub_date_to)
+    if available is not None:
+        conditions.append(table.c.pallet_available_flag == available)
+
+    # Una fila extra indica si hay página siguiente sin un COUNT(*)
+    query = select(table).where(*conditions).order_by(*order).limit(limit + 1)
+    rows = [dict(row) for row in connection.execute(query).mappings()]
+    next_cursor = encode_cursor(rows[limit - 1], sort) if len(rows) > limit else None
+    return rows[:limit], next_cursor
@@ -0,0 +1,190 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config.config import Config
+
+
+class JobQueueFull(Exception):
+    """Se lanza cuando ya hay demasiados jobs pendientes en este worker."""
+
+
+class JobStore:
+    """
+    Estado de los jobs asíncronos en SQLite.
+
+    Se usa un archivo local (sin servicios externos) para que cualquier worker
+    de gunicorn del mismo host pueda responder a /api/jobs/<id>, aunque el job
+    se esté ejecutando en otro proceso.
+    """
+
+    def __init__(self, db_path, retention_seconds=86400):
+        self.db_path = db_path
+        self.retention_seconds = retention_seconds
+        self._db_lock = threading.Lock()
+        self._db_ready = False
+
+    def _connect(self):
+        self._ensure_db()
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def _ensure_db(self):
+        # Al primer uso: importar app.jobs no crea JOB_DB_PATH
+        if self._db_ready:
+            return
+        with self._db_lock:
+            if self._db_ready:
+                return
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with sqlite3.connect(self.db_path, timeout=10) as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS jobs (
+                        id TEXT PRIMARY KEY,
+                        user_id TEXT,
+                        status TEXT NOT NULL,
+                        stage TEXT,
+                        stages TEXT NOT NULL DEFAULT '{}',
+                        result TEXT,
+                        status_code INTEGER,
+                        created_at REAL NOT NULL,
+                        updated_at REAL NOT NULL,
+                        version INTEGER NOT NULL DEFAULT 0
+                    )
+                """)
+            self._db_ready = True
+
+    def create(self, user_id):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            # Purgar jobs antiguos para que la tabla no crezca indefinidamente
+            conn.execute("DELETE FROM jobs WHERE updated_at < ?", (now - self.retention_seconds,))
+            conn.execute(
+                "INSERT INTO jobs (id, user_id, status, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?)",
+                (job_id, user_id, now, now)
+            )
+        return job_id
+
+    def update_stage(self, job_id, stage, status, seconds=None):
+        with self._connect() as conn:
+            row = conn.execute("SELECT stages FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            stages = json.loads(row[0]) if row else {}
+            stages[stage] = {
+                "status": status,
+                "seconds": round(seconds, 4) if seconds is not None else None
+            }
+            conn.execute(
+                "UPDATE jobs SET status = 'running', stage = ?, stages = ?, updated_at = ?, version = version + 1 WHERE id = ?",
+                (stage, json.dumps(stages), time.time(), job_id)
+            )
+
+    def finish(self, job_id, status, result, status_code):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, stage = NULL, result = ?, status_code = ?, updated_at = ?, version = version + 1 WHERE id = ?",
+                (status, json.dumps(result), status_code, time.time(), job_id)
+            )
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, user_id, status, stage, stages, result, status_code, created_at, updated_at, version FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "job_id": row[0],
+            "user_id": row[1],
+            "status": row[2],
+            "stage": row[3],
+            "stages": json.loads(row[4] or '{}'),
+            "result": json.loads(row[5]) if row[5] else None,
+            "status_code": row[6],
+            "created_at": _format_timestamp(row[7]),
+            "updated_at": _format_timestamp(row[8]),
+            "version": row[9]
+        }
+
+
+def _format_timestamp(timestamp):
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(timestamp)) + "Z"
+
+
+class JobRunner:
+    """Pool local y acotado de hilos que ejecuta los jobs de process-all."""
+
+    def __init__(self, store, max_workers=2, max_pending=8):
+        self.store = store
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._executor_pid = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Creación diferida y por proceso (se llama con self._lock tomado): tras el fork de
+        # gunicorn los hilos y los jobs pendientes del padre no existen en el worker
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="process-all-job")
+            self._executor_pid = os.getpid()
+            self._pending = 0
+        return self._executor
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, app, user_id, fn):
+        """
+        Encola `fn(on_stage)` y devuelve el id del job.
+        `fn` debe devolver (payload, status_code) igual que run_process_all.
+        """
+        with self._lock:
+            executor = self._get_executor()
+            if self._pending >= self.max_pending:
+                raise JobQueueFull("Hay demasiados procesos en cola. Intenta de nuevo más tarde.")
+            self._pending += 1
+
+        try:
+            job_id = self.store.create(user_id)
+        except Exception:
+            # Sin job no hay run() que libere el lugar en la cola
+            self._release()
+            raise
+
+        def on_stage(stage, status, seconds):
+            self.store.update_stage(job_id, stage, status, seconds)
+
+        def run():
+            try:
+                with app.app_context():
+                    try:
+                        payload, status_code = fn(on_stage)
+                    except Exception as e:
+                        app.logger.error(f"Error en job {job_id}: {str(e)}", exc_info=True)
+                        payload, status_code = {"error": "Error interno del servidor", "details": str(e)}, 500
+                    status = 'completed' if status_code < 400 else 'failed'
+                    self.store.finish(job_id, status, payload, status_code)
+            finally:
+                self._release()
+
+        try:
+            executor.submit(run)
+        except Exception as e:
+            self._release()
+            self.store.finish(job_id, 'failed', {"error": "No se pudo encolar el proceso", "details": str(e)}, 500)
+            raise
+        return job_id
+
+
+job_store = JobStore(Config.JOB_DB_PATH, retention_seconds=Config.JOB_RETENTION_SECONDS)
+job_runner = JobRunner(job_store, max_workers=Config.JOB_WORKERS, max_pending=Config.JOB_MAX_PENDING)
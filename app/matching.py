@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+
+from app.ingest import ID_COLUMN_ALIASES
+
+
+def find_id_column(df):
+    """Devuelve la columna que contiene los IDs de item (item_id, no., etc.) o None."""
+    if 'item_id' in df.columns:
+        return 'item_id'
+    return next((col for col in df.columns if str(col).strip().lower() in ID_COLUMN_ALIASES), None)
+
+
+def as_index(values):
+    """Convierte un conjunto de IDs en un pd.Index (su tabla hash se construye una sola vez)."""
+    if isinstance(values, pd.Index):
+        return values
+    return pd.Index(list(values), dtype=object)
+
+
+def _file_items(df):
+    """IDs únicos de un archivo como strings sin espacios (conserva ceros a la izquierda)."""
+    id_col = find_id_column(df)
+    if id_col is None:
+        return None
+    # Deduplicar antes de convertir a texto: las conversiones corren sobre menos valores
+    ids = pd.unique(df[id_col].dropna().to_numpy(dtype=object))
+    ids = [str(value).strip() for value in ids.tolist()]
+    return pd.unique(np.array(ids, dtype=object))
+
+
+def match_items(parsed_files, reference_original, reference_normalized):
+    """
+    Compara los item_id de los archivos con la referencia de forma vectorizada.
+
+    - `parsed_files`: lista de (nombre almacenado, DataFrame).
+    - `reference_original` / `reference_normalized`: IDs de referencia con y sin
+      ceros a la izquierda (sets o pd.Index).
+
+    Un item coincide si está en la referencia tal cual o si coincide al quitar
+    los ceros a la izquierda. Devuelve el diccionario `comparison_results` de
+    process-all más estadísticas por archivo en `per_file`.
+    """
+    reference_original = as_index(reference_original)
+    reference_normalized = as_index(reference_normalized)
+
+    file_names = []
+    item_chunks = []
+    file_chunks = []
+    for stored_name, df in parsed_files:
+        try:
+            items = _file_items(df)
+        except Exception as e:
+            print(f"Error procesando archivo {stored_name}: {str(e)}")
+            continue
+        if items is None:
+            continue
+        item_chunks.append(items)
+        file_chunks.append(np.full(len(items), len(file_names), dtype=np.int32))
+        file_names.append(stored_name)
+
+    if item_chunks:
+        pair_items = np.concatenate(item_chunks)
+        pair_files = np.concatenate(file_chunks)
+    else:
+        pair_items = np.array([], dtype=object)
+        pair_files = np.array([], dtype=np.int32)
+
+    # Items únicos de todos los archivos y su posición para cada par (item, archivo)
+    item_codes, unique_items = pd.factorize(pair_items)
+    unique_items = np.asarray(unique_items, dtype=object)
+    normalized = np.array([item.lstrip('0') for item in unique_items.tolist()], dtype=object)
+
+    # Comparación normalizada (sin ceros a la izquierda): decide si el item coincide
+    normalized_positions = reference_normalized.get_indexer(normalized)
+    in_normalized = normalized_positions >= 0
+    # Comparación exacta (incluyendo ceros a la izquierda): solo puede darse en items
+    # que ya coincidieron normalizados, así que basta con buscar ese subconjunto
+    in_exact = np.zeros(len(unique_items), dtype=bool)
+    in_exact[in_normalized] = reference_original.get_indexer(unique_items[in_normalized]) >= 0
+
+    exact_count = int(in_exact.sum())
+    # Conteos de valores normalizados distintos usando las posiciones enteras en la referencia
+    normalized_count = len(np.unique(normalized_positions[in_normalized]))
+    normalized_exact_count = len(np.unique(normalized_positions[in_exact]))
+    unmatched = ~in_normalized
+    unmatched_count = int(unmatched.sum())
+    total_items = len(unique_items)
+
+    # Archivos de origen de cada item no encontrado (en el orden de los archivos)
+    pair_unmatched = unmatched[item_codes]
+    unmatched_codes = item_codes[pair_unmatched]
+    order = np.argsort(unmatched_codes, kind='stable')
+    unmatched_codes = unmatched_codes[order]
+    unmatched_files = np.asarray(file_names, dtype=object)[pair_files[pair_unmatched][order]]
+    unmatched_items = []
+    previous = None
+    for code, file_name in zip(unmatched_codes.tolist(), unmatched_files.tolist()):
+        if code != previous:
+            entry = {"item_id": unique_items[code], "source_files": [file_name]}
+            unmatched_items.append(entry)
+            previous = code
+        else:
+            entry["source_files"].append(file_name)
+
+    # Estadísticas por archivo
+    pair_matched = ~pair_unmatched
+    items_per_file = np.bincount(pair_files, minlength=len(file_names))
+    matched_per_file = np.bincount(pair_files, weights=pair_matched, minlength=len(file_names)).astype(int)
+    per_file = [
+        {
+            "file": name,
+            "total_items": int(items_per_file[i]),
+            "matched_items": int(matched_per_file[i]),
+            "unmatched_items": int(items_per_file[i] - matched_per_file[i]),
+            "match_percentage": round(matched_per_file[i] / items_per_file[i] * 100, 2) if items_per_file[i] else 0
+        }
+        for i, name in enumerate(file_names)
+    ]
+
+    return {
+        "total_reference_items": len(reference_original),
+        "total_processed_items": total_items,
+        "matched_items_count": exact_count + normalized_count - normalized_exact_count,  # Evitar duplicados
+        "unmatched_items": unmatched_items,
+        "match_percentage": round((total_items - unmatched_count) / total_items * 100, 2) if total_items else 0,
+        "files_with_missing_references": [stat["file"] for stat in per_file if stat["unmatched_items"]],
+        "validation_notes": {
+            "exact_matches": exact_count,
+            "normalized_matches": normalized_count,
+            "zero_padding_issues": normalized_count - exact_count
+        },
+        "per_file": per_file
+    }
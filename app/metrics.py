@@ -0,0 +1,256 @@
+import atexit
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+from config.config import Config
+
+# Límites (segundos) de los histogramas de latencia
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Métricas expuestas en /metrics: nombre -> (tipo, descripción)
+METRICS = {
+    'books4less_http_requests_total': (
+        'counter', 'Peticiones HTTP atendidas por ruta, método y código de estado.'),
+    'books4less_http_request_duration_seconds': (
+        'histogram', 'Latencia de las peticiones HTTP por ruta y método (hasta el primer byte en respuestas en streaming).'),
+    'books4less_process_all_stage_duration_seconds': (
+        'histogram', 'Duración de cada etapa de process-all.'),
+    'books4less_process_all_duration_seconds': (
+        'histogram', 'Duración total de process-all (síncrono y jobs).'),
+    'books4less_rows_processed_total': (
+        'counter', 'Filas leídas de manifiestos y archivos de referencia.'),
+    'books4less_supabase_requests_total': (
+        'counter', 'Peticiones HTTP a Supabase por servicio y código de estado.'),
+    'books4less_supabase_request_duration_seconds': (
+        'histogram', 'Latencia de Supabase hasta recibir las cabeceras de respuesta.'),
+    'books4less_supabase_bytes_total': (
+        'counter', 'Bytes enviados y recibidos de Supabase.'),
+}
+
+_LE_PATTERN = re.compile(r'le="([^"]*)"')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    """Etiquetas en formato de exposición: {a="x",b="y"} (orden estable, `le` al final)."""
+    items = sorted((k, v) for k, v in labels.items() if k != 'le')
+    if 'le' in labels:
+        items.append(('le', labels['le']))
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items) + '}'
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _format_le(bound):
+    return '+Inf' if bound == float('inf') else _format_value(bound)
+
+
+def _sort_key(sample):
+    name, labels, _ = sample
+    match = _LE_PATTERN.search(labels)
+    if match is None:
+        return name, labels, 0.0
+    return name, _LE_PATTERN.sub('', labels), float(match.group(1))
+
+
+class MetricsRegistry:
+    """
+    Contadores e histogramas estilo Prometheus compartidos por los workers.
+
+    Cada proceso acumula sus valores en memoria y un hilo los vuelca cada
+    `flush_interval` segundos a SQLite (una fila por proceso y serie, con el
+    valor acumulado). /metrics suma las filas de todos los procesos, así que
+    cualquier worker puede responder al scrape. Los valores de procesos que
+    ya terminaron se consolidan en una fila "retired" para que los contadores
+    no retrocedan cuando gunicorn recicla workers.
+    """
+
+    def __init__(self, db_path, flush_interval=5, buckets=DEFAULT_BUCKETS):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._values = {}
+        self._dirty = set()
+        self._pid = None
+        self._process = None
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db_ready = False
+
+    def _connect(self):
+        self._ensure_db()
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def _ensure_db(self):
+        # Al primer uso: importar el módulo no crea METRICS_DB
+        if self._db_ready:
+            return
+        with self._db_lock:
+            if self._db_ready:
+                return
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with sqlite3.connect(self.db_path, timeout=10) as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS metric_samples (
+                        process TEXT NOT NULL,
+                        name TEXT NOT NULL,
+                        labels TEXT NOT NULL,
+                        value REAL NOT NULL,
+                        PRIMARY KEY (process, name, labels)
+                    )
+                """)
+            self._db_ready = True
+
+    def _ensure_process(self):
+        # Tras el fork de gunicorn el worker empieza de cero (no hereda los valores del padre)
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._values = {}
+            self._dirty = set()
+            self._process = f"{os.getpid()}:{uuid.uuid4().hex}"
+            self._pid = os.getpid()
+            threading.Thread(target=self._flusher, name="metrics-flusher", daemon=True).start()
+            atexit.register(self.flush)
+
+    def _flusher(self):
+        rounds = 0
+        while True:
+            time.sleep(self.flush_interval)
+            rounds += 1
+            try:
+                self.flush()
+                # Consolidar procesos terminados cada ~minuto
+                if rounds % max(1, int(60 / self.flush_interval)) == 0:
+                    self.compact()
+            except Exception as e:
+                print(f"Error al guardar métricas: {e}")
+
+    def _add(self, name, labels, amount):
+        key = (name, _format_labels(labels))
+        self._values[key] = self._values.get(key, 0) + amount
+        self._dirty.add(key)
+
+    def inc(self, name, amount=1, **labels):
+        """Incrementa un contador (`name` debe terminar en _total)."""
+        self._ensure_process()
+        with self._lock:
+            self._add(name, labels, amount)
+
+    def observe(self, name, value, **labels):
+        """Registra una observación en un histograma (buckets acumulativos, _sum y _count)."""
+        self._ensure_process()
+        with self._lock:
+            # Todos los buckets se escriben (aunque sumen 0) para que el histograma esté completo
+            for bound in self.buckets:
+                self._add(f"{name}_bucket", {**labels, 'le': _format_le(bound)}, 1 if value <= bound else 0)
+            self._add(f"{name}_sum", labels, value)
+            self._add(f"{name}_count", labels, 1)
+
+    def flush(self):
+        """Vuelca a SQLite las series de este proceso que cambiaron desde el último volcado."""
+        if self._pid != os.getpid():
+            return
+        with self._lock:
+            rows = [(self._process, name, labels, self._values[(name, labels)]) for name, labels in self._dirty]
+            self._dirty = set()
+        if not rows:
+            return
+        try:
+            with self._connect() as conn:
+                conn.executemany("""
+                    INSERT INTO metric_samples (process, name, labels, value) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (process, name, labels) DO UPDATE SET value = excluded.value
+                """, rows)
+        except Exception:
+            with self._lock:
+                self._dirty.update((name, labels) for _, name, labels, _ in rows)
+            raise
+
+    def compact(self):
+        """Suma en la fila "retired" los valores de procesos de este host que ya no existen."""
+        with self._connect() as conn:
+            processes = [row[0] for row in conn.execute(
+                "SELECT DISTINCT process FROM metric_samples WHERE process != 'retired'")]
+            for process in processes:
+                pid = int(process.split(':', 1)[0])
+                if pid == os.getpid() or _pid_alive(pid):
+                    continue
+                conn.execute("""
+                    INSERT INTO metric_samples (process, name, labels, value)
+                    SELECT 'retired', name, labels, value FROM metric_samples WHERE process = ?
+                    ON CONFLICT (process, name, labels) DO UPDATE SET value = value + excluded.value
+                """, (process,))
+                conn.execute("DELETE FROM metric_samples WHERE process = ?", (process,))
+
+    def samples(self):
+        """(nombre, etiquetas, valor) sumados entre todos los procesos."""
+        self.flush()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT name, labels, SUM(value) FROM metric_samples GROUP BY name, labels").fetchall()
+        return sorted(rows, key=_sort_key)
+
+    def render(self):
+        """Texto en formato de exposición de Prometheus (text/plain; version=0.0.4)."""
+        by_metric = {}
+        for name, labels, value in self.samples():
+            base = name if name in METRICS else re.sub(r'_(bucket|sum|count)$', '', name)
+            by_metric.setdefault(base, []).append(f"{name}{labels} {_format_value(value)}")
+
+        lines = []
+        for base, (kind, description) in METRICS.items():
+            lines.append(f"# HELP {base} {description}")
+            lines.append(f"# TYPE {base} {kind}")
+            lines.extend(by_metric.get(base, []))
+        return '\n'.join(lines) + '\n'
+
+    def init_app(self, app):
+        """Registra la latencia y el código de estado de cada petición de la app."""
+        from flask import g, request
+
+        @app.before_request
+        def _start_timer():
+            g.metrics_started = time.perf_counter()
+
+        @app.after_request
+        def _record_request(response):
+            started = g.pop('metrics_started', None)
+            if started is not None:
+                # La regla (/download/<tipo>) y no la URL, para no crear una serie por archivo
+                route = request.url_rule.rule if request.url_rule else 'unmatched'
+                self.observe('books4less_http_request_duration_seconds', time.perf_counter() - started,
+                             route=route, method=request.method)
+                self.inc('books4less_http_requests_total', route=route, method=request.method,
+                         status=response.status_code)
+            return response
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Registro compartido por todo el proceso
+metrics = MetricsRegistry(Config.METRICS_DB, flush_interval=Config.METRICS_FLUSH_INTERVAL)
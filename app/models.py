@@ -5,11 +5,11 @@ from app import db
 
 class Inventory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    series_code = db.Column(db.String(20), nullable=False)
+    series_code = db.Column(db.String(20), nullable=False, index=True)
     series_desc = db.Column(db.String(100), nullable=False)
-    pallet_id = db.Column(db.String(20), nullable=False)
+    pallet_id = db.Column(db.String(20), nullable=False, index=True)
     pallet_available_flag = db.Column(db.Boolean, nullable=False)
-    item_id = db.Column(db.String(20), nullable=False)
+    item_id = db.Column(db.String(20), nullable=False, index=True)
     item_desc = db.Column(db.String(100), nullable=False)
     family_code = db.Column(db.String(20), nullable=False)
     reporting_group_desc = db.Column(db.String(50), nullable=False)
@@ -21,6 +21,20 @@ class Inventory(db.Model):
     quantity = db.Column(db.Integer, nullable=False)
     extended_retail = db.Column(db.Float)
     extended_percent = db.Column(db.Float)
+    # Origen de la fila (se llenan al cargar manifiestos desde process-all)
+    user_id = db.Column(db.String(100))
+    source_file = db.Column(db.String(255))
+
+    # Índices compuestos para /api/inventory: filtro por usuario (+ un filtro),
+    # terminados en la clave del cursor para que cada página sea un rango del índice
+    __table_args__ = (
+        db.Index('ix_inventory_user_id_id', 'user_id', 'id'),
+        db.Index('ix_inventory_user_publisher', 'user_id', 'publisher_desc', 'id'),
+        db.Index('ix_inventory_user_imprint', 'user_id', 'imprint_desc', 'id'),
+        db.Index('ix_inventory_user_reporting_group', 'user_id', 'reporting_group_desc', 'id'),
+        db.Index('ix_inventory_user_available', 'user_id', 'pallet_available_flag', 'id'),
+        db.Index('ix_inventory_user_pub_date', 'user_id', 'pub_date', 'id'),
+    )
 
 class UserFiles(db.Model):
     __tablename__ = 'user_files'
@@ -46,6 +60,14 @@ class ItemComparison(db.Model):
     matched_with = db.Column(db.String(50))  # ID del item con el que coincidió
     source_file = db.Column(db.String(255))  # Archivo de origen
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Re-comparación incremental (app/comparisons.py): no coincidentes por id
+    # y coincidencias con un item que se borró de la referencia
+    __table_args__ = (
+        db.Index('ix_item_comparison_matched_id', 'is_matched', 'id'),
+        db.Index('ix_item_comparison_matched_with', 'matched_with'),
+        db.Index('ix_item_comparison_user_file', 'user_id', 'source_file'),
+    )
     
     def __repr__(self):
         return f'<ItemComparison {self.item_number} - {self.description}>'
\ No newline at end of file
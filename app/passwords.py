@@ -0,0 +1,78 @@
+import threading
+
+import bcrypt
+
+from config.config import Config
+
+
+class PasswordHasherBusy(Exception):
+    """Se lanza cuando hay demasiadas operaciones de bcrypt en espera."""
+
+
+class PasswordHasher:
+    """
+    Hash y verificación de contraseñas con bcrypt, con admisión acotada.
+
+    bcrypt corre en el hilo de la petición (libera el GIL mientras calcula).
+    Dos semáforos limitan la carga por worker: como máximo `max_concurrent`
+    hashes a la vez, para no dedicar todos los núcleos a contraseñas, y como
+    máximo `max_pending` peticiones entre las que calculan y las que esperan.
+    Si no hay lugar en la cola, o el turno no llega en `queue_timeout`
+    segundos, se rechaza con PasswordHasherBusy en vez de acumular peticiones.
+
+    La petición sigue esperando el hash completo: esto acota CPU y cola, no
+    libera el worker. Con workers síncronos de gunicorn ese worker queda
+    ocupado durante el hash; para atender otras peticiones mientras tanto
+    hacen falta workers gthread o gevent.
+    """
+
+    def __init__(self, rounds=12, max_concurrent=2, max_pending=32, queue_timeout=5.0):
+        self.rounds = rounds
+        self.queue_timeout = queue_timeout
+        self._pending = threading.BoundedSemaphore(max(max_pending, max_concurrent))
+        self._running = threading.BoundedSemaphore(max_concurrent)
+
+    def _run(self, fn, *args):
+        # Cola llena: se rechaza de inmediato; si no, se espera turno hasta `queue_timeout`
+        if not self._pending.acquire(blocking=False):
+            raise PasswordHasherBusy("Demasiadas solicitudes de autenticación. Intenta de nuevo en unos segundos.")
+        try:
+            if not self._running.acquire(timeout=self.queue_timeout):
+                raise PasswordHasherBusy("Demasiadas solicitudes de autenticación. Intenta de nuevo en unos segundos.")
+            try:
+                return fn(*args)
+            finally:
+                self._running.release()
+        finally:
+            self._pending.release()
+
+    def hash(self, password):
+        """Devuelve el hash bcrypt (str) de `password` con el costo configurado."""
+        return self._run(_hash, password, self.rounds)
+
+    def verify(self, password, hashed):
+        return self._run(_verify, password, hashed)
+
+    def needs_rehash(self, hashed):
+        """True si el hash se generó con un costo distinto al configurado ($2b$<costo>$...)."""
+        try:
+            return int(hashed.split('$')[2]) != self.rounds
+        except (AttributeError, IndexError, ValueError):
+            return False
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+
+def _verify(password, hashed):
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+
+# Límites compartidos por todo el proceso
+password_hasher = PasswordHasher(
+    rounds=Config.BCRYPT_ROUNDS,
+    max_concurrent=Config.PASSWORD_WORKERS,
+    max_pending=Config.PASSWORD_MAX_PENDING,
+    queue_timeout=Config.PASSWORD_QUEUE_TIMEOUT
+)
@@ -0,0 +1,201 @@
+from datetime import datetime
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Table, TableStyle
+
+# Geometría de la tabla de productos (misma disposición que la orden original)
+TABLE_X = 50
+TABLE_TOP = letter[1] - 300
+TABLE_COL_WIDTHS = [30, 80, 228, 70, 90]
+TABLE_HEADER = ["L/N", "Item Number", "Description", "Ordered", "Ext. Price"]
+ROW_HEIGHT = 18
+BOTTOM_MARGIN = 50
+CELL_PADDING = 6
+# Distancia de la línea base del texto al borde inferior de la celda
+TEXT_BASELINE = 5
+MAX_DESCRIPTION = 40
+
+HEADER_FORM = "po_header"
+
+
+def rows_per_page():
+    """Filas de datos por página: deja sitio para el encabezado de la tabla y la fila TOTAL."""
+    return int((TABLE_TOP - BOTTOM_MARGIN) / ROW_HEIGHT) - 2
+
+
+def _block_style(extra=()):
+    return TableStyle([
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        *extra
+    ])
+
+
+def _draw_header_blocks(c, form_data):
+    """Dibuja los bloques fijos (empresa, PO/fecha, vendor, ship to, envío y pago)."""
+    width, height = letter
+
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(50, height - 40, "Book For Less LLC")
+    c.setFont("Helvetica", 10)
+    c.drawString(50, height - 55, "P.O. Box 344")
+    c.drawString(50, height - 70, "New York, NY 10001")
+
+    blocks = [
+        # (datos, anchos de columna, estilo, x, y)
+        (
+            [["Purchase Order", form_data.get('purchase_info', 'N/A')],
+             ["Date", form_data.get('order_date', 'N/A')]],
+            [100, 100], _block_style([('ALIGN', (0, 0), (-1, -1), 'CENTER')]),
+            width - 275, height - 90
+        ),
+        (
+            [["Vendor:"],
+             [form_data.get("seller_name", "")],
+             [form_data.get("seller_PO", "")],
+             [form_data.get("seller_address", "")]],
+            [225], _block_style([('LEFTPADDING', (0, 0), (-1, -1), 4)]),
+            50, height - 180
+        ),
+        (
+            [["Ship To:"],
+             [form_data.get("company_name", "")],
+             [form_data.get("company_address", "")],
+             [form_data.get("company_info", "")]],
+            [225], _block_style([('LEFTPADDING', (0, 0), (-1, -1), 4)]),
+            width - 300, height - 180
+        ),
+        (
+            [["Shipping Method", "Payment Terms"],
+             [form_data.get('shipping_method', 'N/A'), form_data.get('payment_terms', 'N/A')]],
+            [249, 249], _block_style([('LEFTPADDING', (0, 0), (-1, -1), 4)]),
+            50, height - 250
+        ),
+    ]
+    for data, col_widths, style, x, y in blocks:
+        table = Table(data, colWidths=col_widths)
+        table.setStyle(style)
+        table.wrapOn(c, width, height)
+        table.drawOn(c, x, y)
+
+    # Encabezado de la tabla de productos (igual en todas las páginas)
+    top = TABLE_TOP
+    c.setFillColor(colors.grey)
+    c.rect(TABLE_X, top - ROW_HEIGHT, sum(TABLE_COL_WIDTHS), ROW_HEIGHT, stroke=0, fill=1)
+    c.setFillColor(colors.whitesmoke)
+    c.setFont("Helvetica-Bold", 10)
+    x = TABLE_X
+    for label, col_width in zip(TABLE_HEADER, TABLE_COL_WIDTHS):
+        c.drawCentredString(x + col_width / 2, top - ROW_HEIGHT + TEXT_BASELINE, label)
+        x += col_width
+
+
+class PurchaseOrderRenderer:
+    """
+    Dibuja la orden de compra página a página con primitivas del canvas.
+
+    Los bloques fijos del encabezado se dibujan una sola vez en un Form XObject
+    y cada página solo lo referencia (`doForm`); las filas de pallets se pintan
+    con `rect`, `grid` y `drawString` en lugar de construir un `Table` por página.
+    """
+
+    def __init__(self, output_pdf, form_data=None):
+        self.output_pdf = output_pdf
+        self.form_data = form_data or {}
+        self.per_page = rows_per_page()
+
+        # Posiciones x de las columnas y de los centros (precalculadas una vez)
+        self.col_edges = [TABLE_X]
+        for col_width in TABLE_COL_WIDTHS:
+            self.col_edges.append(self.col_edges[-1] + col_width)
+        self.col_centers = [(left + right) / 2 for left, right in zip(self.col_edges, self.col_edges[1:])]
+        self.table_width = self.col_edges[-1] - TABLE_X
+
+    def _draw_rows(self, c, rows, total_row=None):
+        """Fondo alterno, rejilla y texto de las filas de una página."""
+        body = list(rows)
+        if total_row is not None:
+            body.append(total_row)
+        first_top = TABLE_TOP - ROW_HEIGHT
+        bottom = first_top - ROW_HEIGHT * len(body)
+
+        # Fondos alternos (whitesmoke / white): solo hace falta pintar las filas pares
+        c.setFillColor(colors.whitesmoke)
+        for i in range(0, len(body), 2):
+            c.rect(TABLE_X, first_top - ROW_HEIGHT * (i + 1), self.table_width, ROW_HEIGHT, stroke=0, fill=1)
+
+        # Rejilla completa (incluye el encabezado) en una sola llamada
+        c.setStrokeColor(colors.black)
+        c.setLineWidth(1)
+        c.grid(self.col_edges, [TABLE_TOP - ROW_HEIGHT * i for i in range(len(body) + 2)])
+
+        c.setFillColor(colors.black)
+        c.setFont("Helvetica", 10)
+        left_x = self.col_edges[2] + CELL_PADDING
+        centers = self.col_centers
+        y = first_top - ROW_HEIGHT + TEXT_BASELINE
+        for line, item_number, description, ordered, ext_price in body:
+            c.drawCentredString(centers[0], y, line)
+            c.drawCentredString(centers[1], y, item_number)
+            c.drawString(left_x, y, description)
+            c.drawCentredString(centers[3], y, ordered)
+            c.drawCentredString(centers[4], y, ext_price)
+            y -= ROW_HEIGHT
+        return bottom
+
+    def render(self, rows, total_row):
+        """
+        Genera el PDF completo. `rows` son filas de texto ya formateadas
+        [L/N, Item Number, Description, Ordered, Ext. Price]; `total_row` se
+        dibuja al final de la última página. Devuelve el número de páginas.
+        """
+        width, _ = letter
+        c = canvas.Canvas(self.output_pdf, pagesize=letter)
+
+        c.beginForm(HEADER_FORM)
+        _draw_header_blocks(c, self.form_data)
+        c.endForm()
+
+        pages = max(1, -(-len(rows) // self.per_page))
+        generated_on = f"Generated on: {datetime.now():%m/%d/%Y %H:%M}"
+        for page in range(pages):
+            if page > 0:
+                c.showPage()
+            c.doForm(HEADER_FORM)
+
+            chunk = rows[page * self.per_page:(page + 1) * self.per_page]
+            self._draw_rows(c, chunk, total_row if page == pages - 1 else None)
+
+            # Numeración y pie de página
+            c.setFillColor(colors.black)
+            c.setFont("Helvetica", 8)
+            c.drawRightString(width - 50, 30, f"Page {page + 1} of {pages}")
+            c.drawString(50, 30, generated_on)
+
+        c.save()
+        return pages
+
+
+def format_rows(grouped):
+    """
+    Convierte el DataFrame agrupado por pallet (series_desc, pallet_id, quantity,
+    'Extended @ %') en filas de texto para el renderer, sin iterrows.
+    """
+    descriptions = grouped['series_desc'].astype(str)
+    long_mask = descriptions.str.len() > MAX_DESCRIPTION
+    descriptions = descriptions.where(~long_mask, descriptions.str.slice(0, MAX_DESCRIPTION) + "...")
+
+    return [
+        [str(line), str(pallet_id), description, str(int(quantity)), f"${ext_price:,.2f}"]
+        for line, pallet_id, description, quantity, ext_price in zip(
+            range(1, len(grouped) + 1),
+            grouped['pallet_id'].tolist(),
+            descriptions.tolist(),
+            grouped['quantity'].tolist(),
+            grouped['Extended @ %'].tolist()
+        )
+    ]
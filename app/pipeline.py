@@ -0,0 +1,299 @@
+import os
+import time
+import pandas as pd
+from flask import current_app
+from werkzeug.utils import secure_filename
+from config.config import Config
+from app.reference_index import reference_index
+from app.ingest import parse_files, concat_manifests, narrow_integers, \
+    SUPPORTED_EXTENSIONS, PIPELINE_COLUMNS, INVENTORY_COLUMNS
+from app.matching import match_items
+from app.artifact_cache import artifact_cache
+from app.metrics import metrics
+from app.services import supabase, UploadBatch, create_pdf, create_csv, DOWNLOAD_FOLDER
+
+
+class StageReporter:
+    """
+    Mide el tiempo de cada etapa de process-all, lo registra en el log
+    y notifica al callback opcional (usado por los jobs asíncronos).
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.timings = {}
+        self._stage = None
+        self._started = None
+
+    def start(self, stage):
+        self._stage = stage
+        self._started = time.time()
+        if self.callback:
+            self.callback(stage, 'running', None)
+
+    def finish(self, label):
+        elapsed = time.time() - self._started
+        self.timings[self._stage] = round(elapsed, 4)
+        metrics.observe('books4less_process_all_stage_duration_seconds', elapsed, stage=self._stage)
+        current_app.logger.info(f"Tiempo {label}: {elapsed:.2f}s")
+        if self.callback:
+            self.callback(self._stage, 'done', elapsed)
+        return elapsed
+
+
+def consolidate_files(sources):
+    """
+    Consolida archivos validando estructura y calculando campos adicionales.
+    `sources` puede contener rutas o DataFrames ya leídos; el resultado se
+    devuelve en memoria (sin escribir un .xlsx intermedio).
+    """
+    # Las rutas se leen en paralelo (pool de procesos); el orden original se conserva
+    paths = [source for source in sources
+             if not isinstance(source, pd.DataFrame)
+             and os.path.splitext(source)[1].lower() in SUPPORTED_EXTENSIONS]
+    parsed = dict(zip(paths, parse_files(paths, columns=PIPELINE_COLUMNS)))
+
+    dfs = []
+    for source in sources:
+        try:
+            if isinstance(source, pd.DataFrame):
+                df = source
+            elif source in parsed:
+                df, error = parsed[source]
+                if error:
+                    raise ValueError(error)
+            else:
+                continue
+                
+            # Validar y calcular campos adicionales para cada archivo
+            if 'us_price' in df.columns and 'quantity' in df.columns:
+                us_price = pd.to_numeric(df['us_price'], errors='coerce').fillna(0)
+                quantity = pd.to_numeric(df['quantity'], errors='coerce').fillna(0)
+                if Config.MANIFEST_COMPACT_DTYPES:
+                    quantity = narrow_integers(quantity)
+                # assign devuelve un nuevo DataFrame: el original queda intacto para la comparación
+                df = df.assign(**{
+                    'us_price': us_price,
+                    'quantity': quantity,
+                    'Extended Retail': quantity * us_price
+                })
+                
+            dfs.append(df)
+        except Exception as e:
+            print(f"Error procesando {source if isinstance(source, str) else 'DataFrame'}: {e}")
+            continue
+            
+    if not dfs:
+        return None, "No se pudo leer ningún archivo válido."
+        
+    # Conserva las columnas categóricas del esquema del manifiesto al unir los archivos
+    consolidated_df = concat_manifests(dfs)
+    
+    return consolidated_df, None
+
+
+def run_process_all(saved_files, user_id, discount_rate, form_data, timestamp, excel_base,
+                    start_time=None, errors=None, on_stage=None):
+    """
+    Ejecuta las etapas de /api/process-all sobre archivos ya guardados en disco.
+
+    `saved_files` es una lista de tuplas (nombre_original, nombre_almacenado, ruta_temporal).
+    Devuelve (payload, status_code) para que el llamador decida cómo responder
+    (respuesta HTTP directa o resultado de un job asíncrono).
+    """
+    start_time = start_time or time.time()
+    errors = list(errors or [])
+    reporter = StageReporter(on_stage)
+    temp_file_paths = [temp_path for _, _, temp_path in saved_files]
+    csv_path = pdf_path = None
+    # Artefactos generados (ruta local, ruta en Storage) que se conservan en la caché local
+    artifacts = []
+    # Las subidas a Storage corren en paralelo mientras avanzan las demás etapas
+    uploads = UploadBatch()
+
+    try:
+        # 1. Obtener datos de referencia (índice compartido en memoria)
+        reporter.start('reference')
+        try:
+            reference = reference_index.get(supabase)
+            # Original (conserva ceros a la izquierda)
+            reference_original = reference.original_index
+            # Normalizado (sin ceros a la izquierda para comparación flexible)
+            reference_normalized = reference.normalized_index
+        except Exception as e:
+            current_app.logger.error(f"Error al obtener referencia: {str(e)}")
+            reference_original = frozenset()
+            reference_normalized = frozenset()
+        reporter.finish('carga referencia')
+
+        # 2. Procesar archivos subidos
+        reporter.start('upload')
+        parsed_files = []  # (nombre almacenado, DataFrame) leídos una sola vez
+        uploaded_files = []
+
+        # Leer cada archivo una única vez (en paralelo); el DataFrame se reutiliza en todas las etapas
+        columns = PIPELINE_COLUMNS
+        if Config.INVENTORY_INGEST:
+            columns = PIPELINE_COLUMNS + [c for c in INVENTORY_COLUMNS if c not in PIPELINE_COLUMNS]
+        parse_results = parse_files(temp_file_paths, columns=columns)
+
+        for (original_filename, new_filename, temp_path), (df, parse_error) in zip(saved_files, parse_results):
+            try:
+                if parse_error:
+                    raise ValueError(parse_error)
+                parsed_files.append((new_filename, df))
+
+                # Subir a Supabase (en segundo plano)
+                uploads.add(temp_path, f"xlsx/{user_id}/{new_filename}")
+                uploaded_files.append({
+                    'original_name': original_filename,
+                    'stored_name': new_filename
+                })
+
+            except Exception as e:
+                errors.append({"file": original_filename, "error": str(e)})
+                continue
+
+        if not parsed_files:
+            return {"error": "No se pudo procesar ningún archivo válido.", "details": errors}, 400
+
+        reporter.finish('subida archivos')
+
+        # 3. Consolidar archivos
+        reporter.start('consolidate')
+        consolidated_df, consolidate_error = consolidate_files([df for _, df in parsed_files])
+        if consolidate_error:
+            return {"error": consolidate_error}, 500
+        metrics.inc('books4less_rows_processed_total', len(consolidated_df), source='manifest')
+        reporter.finish('consolidación')
+
+        # 4. Generar CSV
+        reporter.start('csv')
+        csv_filename = f"{excel_base}_{timestamp}.csv"
+        csv_path = os.path.join(DOWNLOAD_FOLDER, csv_filename)
+
+        try:
+            csv_result = create_csv(consolidated_df, csv_path)
+            if "error" in csv_result:
+                return csv_result, 500
+            uploads.add(csv_path, f"csv/{user_id}/{csv_filename}")
+            artifacts.append((csv_path, f"csv/{user_id}/{csv_filename}"))
+        except Exception as e:
+            current_app.logger.error(f"Error al generar CSV: {str(e)}")
+            return {"error": "Error al generar CSV", "details": str(e)}, 500
+
+        reporter.finish('generación CSV')
+
+        # 5. Generar PDF
+        reporter.start('pdf')
+        pdf_filename = f"{excel_base}_{timestamp}.pdf"
+        pdf_path = os.path.join(DOWNLOAD_FOLDER, pdf_filename)
+
+        try:
+            pdf_result = create_pdf(consolidated_df, pdf_path, discount_rate, form_data)
+            if "error" in pdf_result:
+                return pdf_result, 500
+            uploads.add(pdf_path, f"pdf/{user_id}/{pdf_filename}")
+            artifacts.append((pdf_path, f"pdf/{user_id}/{pdf_filename}"))
+        except Exception as e:
+            current_app.logger.error(f"Error al generar PDF: {str(e)}")
+            return {"error": "Error al generar PDF", "details": str(e)}, 500
+
+        reporter.finish('generación PDF')
+
+        # 6. Comparación mejorada que maneja ceros a la izquierda
+        reporter.start('compare')
+
+        comparison_results = match_items(parsed_files, reference_original, reference_normalized)
+
+        reporter.finish('comparación')
+
+        # Clave de item_comparison e inventory: el nombre original del archivo, así
+        # re-procesar el mismo archivo reemplaza sus filas en lugar de duplicarlas
+        original_names = {item['stored_name']: secure_filename(item['original_name'])
+                          for item in uploaded_files}
+
+        # 7. Guardar la comparación en item_comparison (por lotes, COPY en PostgreSQL)
+        comparison_stats = None
+        if Config.COMPARISON_PERSIST:
+            reporter.start('comparison_store')
+            try:
+                from app import db
+                from app.comparisons import store_comparisons
+                comparison_stats = store_comparisons(
+                    db.engine,
+                    [(original_names[name], df) for name, df in parsed_files],
+                    reference_original,
+                    user_id
+                )
+            except Exception as e:
+                current_app.logger.error(f"Error al guardar comparación: {str(e)}", exc_info=True)
+                errors.append({"stage": "comparison_store", "error": str(e)})
+            reporter.finish('guardado comparación')
+
+        # 8. Cargar los manifiestos en Inventory (opcional, COPY en PostgreSQL)
+        inventory_stats = None
+        if Config.INVENTORY_INGEST:
+            reporter.start('inventory')
+            try:
+                from app import db
+                from app.inventory import load_inventory
+                inventory_stats = load_inventory(
+                    db.engine,
+                    [(original_names[name], df) for name, df in parsed_files],
+                    user_id=user_id,
+                    batch_size=Config.INVENTORY_BATCH_SIZE
+                )
+                current_app.logger.info(f"Inventario: {inventory_stats}")
+            except Exception as e:
+                current_app.logger.error(f"Error al cargar inventario: {str(e)}", exc_info=True)
+                errors.append({"stage": "inventory", "error": str(e)})
+            reporter.finish('carga inventario')
+
+        # Esperar a que terminen las subidas (tarda lo que la subida más lenta)
+        reporter.start('storage')
+        upload_results = uploads.results()
+        reporter.finish('espera subidas')
+
+        # Construir respuesta
+        total_time = time.time() - start_time
+        metrics.observe('books4less_process_all_duration_seconds', total_time)
+        response_data = {
+            "message": "Procesamiento completado exitosamente.",
+            "processing_time_seconds": round(total_time, 2),
+            "stage_timings": reporter.timings,
+            "download_links": {
+                "csv": f"/download/csv?user_id={user_id}&filename={csv_filename}",
+                "pdf": f"/download/pdf?user_id={user_id}&filename={pdf_filename}"
+            },
+            "uploaded_files": uploaded_files,
+            "storage_uploads": [
+                {k: v for k, v in result.items() if k != 'local_path'} for result in upload_results
+            ],
+            "comparison_results": comparison_results,
+            "comparison_store": comparison_stats,
+            "inventory": inventory_stats,
+            "errors": errors
+        }
+
+        return response_data, 200
+
+    finally:
+        # No borrar archivos que todavía se están subiendo
+        uploaded = {result['destination_path'] for result in uploads.results() if result['success']}
+
+        # El CSV y el PDF ya subidos se mueven a la caché local para servir /download sin ir a Storage
+        for path, destination_path in artifacts:
+            if destination_path in uploaded:
+                try:
+                    artifact_cache.adopt(destination_path, path)
+                except Exception as e:
+                    current_app.logger.warning(f"No se pudo guardar {path} en la caché: {str(e)}")
+
+        # Limpieza de archivos temporales
+        for path in temp_file_paths + [csv_path, pdf_path]:
+            try:
+                if path and os.path.exists(path):
+                    os.remove(path)
+            except Exception as e:
+                current_app.logger.warning(f"No se pudo eliminar archivo temporal {path}: {str(e)}")
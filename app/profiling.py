@@ -0,0 +1,169 @@
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+from config.config import Config
+
+
+def _frame_label(code):
+    """`función (archivo:línea)` con rutas cortas: relativas al proyecto o a site-packages."""
+    path = code.co_filename
+    if 'site-packages' + os.sep in path:
+        path = path.split('site-packages' + os.sep, 1)[1]
+    else:
+        path = os.path.relpath(path) if path.startswith(os.getcwd()) else os.path.basename(path)
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Profiler por muestreo del hilo de una petición.
+
+    Un hilo auxiliar toma la pila del hilo perfilado cada `interval` segundos
+    (sys._current_frames) y acumula el tiempo transcurrido desde la muestra
+    anterior en esa pila, de modo que las llamadas largas en C (pandas,
+    reportlab) que retrasan el muestreo pesan lo que realmente duraron.
+    El resultado son pilas "colapsadas" (formato de flamegraph.pl / speedscope)
+    con peso en microsegundos.
+    """
+
+    def __init__(self, thread_id=None, interval=0.005):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self.started = None
+        self.duration = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            key = ';'.join(reversed(stack))
+            self.stacks[key] = self.stacks.get(key, 0) + int((now - last) * 1_000_000)
+            self.samples += 1
+            last = now
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started
+        return self
+
+    def collapsed(self):
+        """Una línea por pila: `raíz;...;hoja peso_us`."""
+        return ''.join(f"{stack} {weight}\n" for stack, weight in sorted(self.stacks.items()))
+
+    def top(self, limit=30):
+        """Funciones con más tiempo propio (hoja de la pila) y acumulado (en cualquier nivel), en ms."""
+        own = {}
+        cumulative = {}
+        for stack, weight in self.stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] = own.get(frames[-1], 0) + weight
+            # Recursión: cada función cuenta una vez por pila
+            for label in set(frames):
+                cumulative[label] = cumulative.get(label, 0) + weight
+        total = sum(self.stacks.values()) or 1
+        return [
+            {
+                "function": label,
+                "own_ms": round(own.get(label, 0) / 1000, 1),
+                "cumulative_ms": round(weight / 1000, 1),
+                "cumulative_percent": round(100 * weight / total, 1)
+            }
+            for label, weight in sorted(cumulative.items(), key=lambda item: (-own.get(item[0], 0), -item[1]))[:limit]
+        ]
+
+
+class ProfileStore:
+    """
+    Perfiles de peticiones guardados en el área local de artefactos:
+    `<id>.json` (resumen y top-N) y `<id>.collapsed` (pilas para flamegraph).
+    Se conservan los `max_profiles` más recientes.
+    """
+
+    def __init__(self, directory, max_profiles=50, top_n=30):
+        self.directory = os.path.abspath(directory)
+        self.max_profiles = max_profiles
+        self.top_n = top_n
+
+    @staticmethod
+    def new_id():
+        return uuid.uuid4().hex
+
+    def _path(self, profile_id, extension):
+        # El id viene de la URL: solo se aceptan los hex generados por new_id()
+        if not profile_id or not all(c in '0123456789abcdef' for c in profile_id):
+            raise KeyError(profile_id)
+        return os.path.join(self.directory, f"{profile_id}.{extension}")
+
+    def save(self, profile_id, profiler, **metadata):
+        os.makedirs(self.directory, exist_ok=True)
+        summary = {
+            "id": profile_id,
+            "created_at": time.time(),
+            "duration_seconds": round(profiler.duration, 4),
+            "samples": profiler.samples,
+            "interval_seconds": profiler.interval,
+            **metadata,
+            "top": profiler.top(self.top_n)
+        }
+        with open(self._path(profile_id, 'collapsed'), 'w') as f:
+            f.write(profiler.collapsed())
+        # El .json se escribe al final: su presencia indica que el perfil está completo
+        with open(self._path(profile_id, 'json'), 'w') as f:
+            json.dump(summary, f, indent=2)
+        self.prune()
+        return summary
+
+    def load(self, profile_id):
+        """Resumen del perfil; KeyError si no existe."""
+        try:
+            with open(self._path(profile_id, 'json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise KeyError(profile_id)
+
+    def collapsed_path(self, profile_id):
+        path = self._path(profile_id, 'collapsed')
+        if not os.path.exists(path):
+            raise KeyError(profile_id)
+        return path
+
+    def prune(self):
+        summaries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith('.json')),
+            key=lambda entry: entry.stat().st_mtime,
+            reverse=True
+        )
+        for entry in summaries[self.max_profiles:]:
+            profile_id = entry.name[:-len('.json')]
+            for extension in ('json', 'collapsed'):
+                try:
+                    os.remove(os.path.join(self.directory, f"{profile_id}.{extension}"))
+                except FileNotFoundError:
+                    pass
+
+
+# Almacén compartido por todo el proceso
+profile_store = ProfileStore(Config.PROFILE_DIR, max_profiles=Config.PROFILE_MAX_PROFILES, top_n=Config.PROFILE_TOP_N)
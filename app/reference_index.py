@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+
+from config.config import Config
+
+
+class ReferenceSnapshot:
+    """Vista inmutable de item_reference: conjunto original y normalizado (sin ceros a la izquierda)."""
+
+    def __init__(self, items, generation):
+        import pandas as pd
+
+        self.original = frozenset(items)
+        self.normalized = frozenset(item.lstrip('0') for item in self.original)
+        # Índices con tabla hash precalculada para la comparación vectorizada
+        self.original_index = pd.Index(list(self.original), dtype=object)
+        self.normalized_index = pd.Index(list(self.normalized), dtype=object)
+        self.generation = generation
+        self.loaded_at = time.time()
+
+    def __len__(self):
+        return len(self.original)
+
+
+class ReferenceIndex:
+    """
+    Índice en memoria de `item_reference` compartido por todas las peticiones del worker.
+
+    Se carga una sola vez y se refresca cuando:
+    - cambia la generación (upload_reference llama a `invalidate()`), o
+    - expira el TTL configurado.
+
+    La generación se guarda en un archivo pequeño para que la invalidación
+    también llegue a los demás workers de gunicorn del mismo host.
+    """
+
+    def __init__(self, ttl_seconds=300, generation_file=None, page_size=1000):
+        self.ttl_seconds = ttl_seconds
+        self.generation_file = generation_file
+        self.page_size = page_size
+        self._snapshot = None
+        self._local_generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.last_refresh_seconds = 0.0
+        self.total_refresh_seconds = 0.0
+
+    def _current_generation(self):
+        """Lee la generación compartida (o la local si no hay archivo configurado)."""
+        if not self.generation_file:
+            return self._local_generation
+        try:
+            with open(self.generation_file, 'r') as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _is_fresh(self, snapshot, generation):
+        if snapshot is None or snapshot.generation != generation:
+            return False
+        return (time.time() - snapshot.loaded_at) < self.ttl_seconds
+
+    def _fetch_items(self, client):
+        """
+        Descarga todos los item_number de forma paginada (evita el límite de
+        filas de PostgREST). Se ordena por id: sin ORDER BY las páginas de
+        `range` no tienen un orden estable y podrían repetir u omitir filas.
+        """
+        items = []
+        page = 0
+        while True:
+            response = client.table('item_reference')\
+                .select('item_number')\
+                .order('id')\
+                .range(page * self.page_size, (page + 1) * self.page_size - 1)\
+                .execute()
+            if not response.data:
+                break
+            # Conservar los valores exactos como strings (incluyendo ceros a la izquierda)
+            items.extend(str(item['item_number']) for item in response.data)
+            page += 1
+        return items
+
+    def get(self, client):
+        """Devuelve el snapshot vigente, recargándolo desde Supabase si es necesario."""
+        generation = self._current_generation()
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot, generation):
+            self.hits += 1
+            return snapshot
+
+        with self._lock:
+            # Otro hilo pudo haber refrescado mientras esperábamos el lock
+            snapshot = self._snapshot
+            if self._is_fresh(snapshot, generation):
+                self.hits += 1
+                return snapshot
+
+            self.misses += 1
+            start = time.time()
+            snapshot = ReferenceSnapshot(self._fetch_items(client), generation)
+            elapsed = time.time() - start
+
+            self._snapshot = snapshot
+            self.refreshes += 1
+            self.last_refresh_seconds = elapsed
+            self.total_refresh_seconds += elapsed
+            return snapshot
+
+    def invalidate(self):
+        """Marca el índice como obsoleto en este worker y en los demás del mismo host."""
+        with self._lock:
+            self._local_generation += 1
+            self._snapshot = None
+            if self.generation_file:
+                generation = self._current_generation() + 1
+                tmp_path = f"{self.generation_file}.{os.getpid()}.tmp"
+                try:
+                    with open(tmp_path, 'w') as f:
+                        f.write(str(generation))
+                    os.replace(tmp_path, self.generation_file)
+                except OSError as e:
+                    print(f"No se pudo actualizar la generación de referencia: {e}")
+
+    def stats(self):
+        snapshot = self._snapshot
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0,
+            "refreshes": self.refreshes,
+            "last_refresh_seconds": round(self.last_refresh_seconds, 4),
+            "total_refresh_seconds": round(self.total_refresh_seconds, 4),
+            "generation": snapshot.generation if snapshot else None,
+            "items": len(snapshot) if snapshot else 0,
+            "age_seconds": round(time.time() - snapshot.loaded_at, 2) if snapshot else None,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+
+# Índice compartido por todo el proceso
+reference_index = ReferenceIndex(
+    ttl_seconds=Config.REFERENCE_CACHE_TTL,
+    generation_file=Config.REFERENCE_GENERATION_FILE
+)
@@ -0,0 +1,224 @@
+import hashlib
+import queue
+import threading
+import time
+
+import pandas as pd
+
+from app.ingest import column_filter, detect_delimiter
+
+# Columnas que se leen del archivo de referencia
+REFERENCE_COLUMNS = ['no.', 'description']
+
+
+def row_digest(item_number, description):
+    """Huella corta de una fila (item_number, description) para detectar cambios."""
+    return hashlib.blake2b(f"{item_number}\x1f{description}".encode('utf-8'), digest_size=8).digest()
+
+
+def read_reference_header(path, ext):
+    """Nombres de columna del archivo (normalizados en minúsculas y sin espacios)."""
+    if ext == 'xlsx':
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            header = next(workbook.worksheets[0].iter_rows(max_row=1, values_only=True), ())
+        finally:
+            workbook.close()
+        columns = [str(name) for name in header if name is not None]
+    else:
+        columns = list(pd.read_csv(path, delimiter=detect_delimiter(path), encoding='utf-8', nrows=0).columns)
+    return [col.strip().lower() for col in columns]
+
+
+def _clean(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def iter_reference_rows(path, ext, chunk_size=10000):
+    """
+    Recorre el archivo de referencia sin cargarlo completo en memoria y
+    devuelve tuplas (item_number, description) ya limpias.
+    - CSV: se lee por bloques de `chunk_size` filas, todo como texto (conserva ceros a la izquierda).
+    - XLSX: se recorre fila a fila con openpyxl en modo read-only.
+    """
+    if ext == 'xlsx':
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = [str(name).strip().lower() if name is not None else '' for name in next(rows, ())]
+            item_index = header.index('no.')
+            description_index = header.index('description')
+            for row in rows:
+                width = len(row)
+                yield (
+                    _clean(row[item_index]) if item_index < width else '',
+                    _clean(row[description_index]) if description_index < width else ''
+                )
+        finally:
+            workbook.close()
+        return
+
+    chunks = pd.read_csv(
+        path,
+        delimiter=detect_delimiter(path),
+        encoding='utf-8',
+        dtype=str,
+        keep_default_na=False,
+        usecols=column_filter(REFERENCE_COLUMNS),
+        chunksize=chunk_size
+    )
+    for chunk in chunks:
+        chunk.columns = chunk.columns.str.strip().str.lower()
+        items = chunk['no.'].str.strip().tolist()
+        descriptions = chunk['description'].str.strip().tolist()
+        yield from zip(items, descriptions)
+
+
+def fetch_current_reference(client, page_size=1000):
+    """Lee item_reference completo de forma paginada: {item_number: (id, huella)}."""
+    current = {}
+    page = 0
+    while True:
+        response = client.table('item_reference')\
+            .select('id,item_number,description')\
+            .order('id')\
+            .range(page * page_size, (page + 1) * page_size - 1)\
+            .execute()
+        if not response.data:
+            break
+        for row in response.data:
+            item_number = str(row['item_number'])
+            current[item_number] = (row['id'], row_digest(item_number, row.get('description') or ''))
+        page += 1
+    return current
+
+
+class _BatchWriter:
+    """
+    Hilo que envía los lotes a Supabase mientras el archivo se sigue leyendo.
+    La cola es acotada: si la base de datos va más lenta, la lectura espera
+    (la memoria no crece con el tamaño del archivo).
+    """
+
+    def __init__(self, client, max_pending=2):
+        self.client = client
+        self.error = None
+        self.write_seconds = 0.0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="reference-sync-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                return
+            if self.error is not None:
+                continue
+            operation, payload = task
+            start = time.time()
+            try:
+                if operation == 'upsert':
+                    self.client.table('item_reference').upsert(payload, on_conflict='item_number').execute()
+                else:
+                    self.client.table('item_reference').delete().in_('id', payload).execute()
+            except Exception as e:
+                self.error = e
+            self.write_seconds += time.time() - start
+
+    def put(self, operation, payload):
+        if self.error is not None:
+            raise self.error
+        self._queue.put((operation, payload))
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+def sync_reference(client, rows, source_file='', batch_size=1000):
+    """
+    Sincroniza item_reference con las filas (item_number, description) de `rows`
+    enviando solo las diferencias: upsert de filas nuevas o modificadas y
+    borrado de las que ya no existen. La tabla nunca queda vacía.
+
+    `rows` puede ser un generador (ver iter_reference_rows): se limpia, se
+    deduplica y se envía por lotes de `batch_size` mientras se sigue leyendo.
+    """
+    start = time.time()
+    current = fetch_current_reference(client, page_size=batch_size)
+    fetch_seconds = time.time() - start
+
+    writer = _BatchWriter(client)
+    seen = set()
+    batch = []
+    rows_read = inserted = updated = 0
+    parse_start = time.time()
+    try:
+        for item_number, description in rows:
+            rows_read += 1
+            # Filtrar filas vacías y limitar longitudes
+            if not item_number or not description:
+                continue
+            item_number = item_number[:100]
+            description = description[:500]
+
+            # Evitar duplicados por item_number (se conserva la primera aparición)
+            if item_number in seen:
+                continue
+            seen.add(item_number)
+
+            existing = current.get(item_number)
+            if existing is None:
+                inserted += 1
+            elif existing[1] != row_digest(item_number, description):
+                updated += 1
+            else:
+                continue
+
+            batch.append({
+                'item_number': item_number,
+                'description': description,
+                'source_file': source_file[:255]
+            })
+            if len(batch) >= batch_size:
+                writer.put('upsert', batch)
+                batch = []
+
+        if batch:
+            writer.put('upsert', batch)
+        parse_seconds = time.time() - parse_start
+
+        deleted_items = [item_number for item_number in current if item_number not in seen]
+        to_delete = [current[item_number][0] for item_number in deleted_items]
+        for i in range(0, len(to_delete), batch_size):
+            writer.put('delete', to_delete[i:i + batch_size])
+    finally:
+        writer.close()
+
+    total_seconds = time.time() - start
+    return {
+        "inserted": inserted,
+        "updated": updated,
+        "deleted": len(to_delete),
+        "unchanged": len(seen) - inserted - updated,
+        "total_items": len(seen),
+        "rows_read": rows_read,
+        # item_number borrados (para re-evaluar comparaciones guardadas); no va en la respuesta HTTP
+        "deleted_items": deleted_items,
+        "timing": {
+            "fetch_seconds": round(fetch_seconds, 3),
+            "parse_seconds": round(parse_seconds, 3),
+            "write_seconds": round(writer.write_seconds, 3),
+            "total_seconds": round(total_seconds, 3),
+            "rows_per_second": round(rows_read / total_seconds) if total_seconds else rows_read
+        }
+    }
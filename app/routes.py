@@ -1,23 +1,31 @@
 
 import os
+import hmac
+import json
 import tempfile
 import traceback
 import time
-import bcrypt
 import jwt
-import pandas as pd
-from app import db
 from functools import wraps
 from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
-from supabase import create_client
+from werkzeug.http import is_resource_modified, unquote_etag, parse_date
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
 from config.config import Config
-from flask import Blueprint, jsonify, request, current_app, make_response, send_file
-from app.services import upload_to_supabase, download_file_from_supabase, process_file, create_pdf, create_csv, delete_old_files
-
-
-
-supabase = create_client(Config.SUPABASE_URL, Config.SUPABASE_API_KEY)
+from flask import Blueprint, jsonify, request, current_app, make_response, send_file, Response, g
+from app.reference_index import reference_index
+# reference_sync y pipeline (pandas, openpyxl, reportlab) se importan en las rutas que los usan
+from app.services import upload_many_to_supabase, open_storage_stream
+from app.jobs import job_store, job_runner, JobQueueFull
+from app.artifact_cache import artifact_cache
+from app.file_listing import list_files_page
+from app.token_cache import verified_token_cache
+from app.passwords import password_hasher, PasswordHasherBusy
+from app.user_cache import user_cache
+from app.metrics import metrics
+from app.profiling import SamplingProfiler, profile_store
+# Cliente de Supabase compartido (se crea en el primer uso, uno por proceso)
+from app.supabase_client import supabase
 
 
 main = Blueprint('main', __name__)
@@ -25,11 +33,12 @@ main = Blueprint('main', __name__)
 # Carpetas locales (no se modifican)
 DOWNLOAD_FOLDER = "downloads"
 UPLOAD_FOLDER = "uploads"
-os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# Limpieza de archivos antiguos
-delete_old_files()
+@main.record_once
+def create_folders(state):
+    # Al registrar el blueprint (create_app), no al importar el módulo
+    os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 # para el login
 # Debes tener definida en tu configuración una clave secreta
@@ -80,26 +89,31 @@ def home():
     """
 
 # decorador para autenticacion de usuario 
+def request_token():
+    """Token de la petición: cabecera Authorization (Bearer) o, si no viene, cookies."""
+    token = None
+
+    # Buscar token en el header
+    auth_header = request.headers.get('Authorization')
+    if auth_header and auth_header.startswith('Bearer '):
+        token = auth_header.split(' ')[1]
+
+    # Si no viene en el header, buscar en cookies
+    if not token:
+        token = request.cookies.get('login_token') or request.cookies.get('session_token')
+    return token
+
 def token_required(role=None):
     def decorator(f):
         @wraps(f)
         def wrapped(*args, **kwargs):
-            token = None
-
-            # Buscar token en el header
-            auth_header = request.headers.get('Authorization')
-            if auth_header and auth_header.startswith('Bearer '):
-                token = auth_header.split(' ')[1]
-
-            # Si no viene en el header, buscar en cookies
-            if not token:
-                token = request.cookies.get('login_token') or request.cookies.get('session_token')
-
+            token = request_token()
             if not token:
                 return jsonify({"error": "Token no proporcionado."}), 401
 
             try:
-                payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+                # La firma solo se verifica la primera vez; luego se usa la caché hasta `exp`
+                payload = verified_token_cache.decode(token, SECRET_KEY, [ALGORITHM])
             except jwt.ExpiredSignatureError:
                 return jsonify({"error": "Token expirado."}), 401
             except jwt.InvalidTokenError:
@@ -117,6 +131,74 @@ def token_required(role=None):
 # @token_required()  # cualquier usuario autenticado
 # @token_required(role='admin')  # solo admins
 
+def optional_token_payload():
+    """Payload del token si la petición trae uno válido; None en otro caso (nunca corta la petición)."""
+    token = request_token()
+    if not token:
+        return None
+    try:
+        return verified_token_cache.decode(token, SECRET_KEY, [ALGORITHM])
+    except jwt.InvalidTokenError:
+        return None
+
+# Profiling bajo demanda: solo si la petición lo pide (cabecera X-Profile o ?profile=1) y es de un admin.
+# Para cualquier otro usuario el indicador se ignora y la petición sigue su curso normal.
+@main.before_request
+def start_profiling():
+    if not (request.headers.get('X-Profile') or request.args.get('profile')):
+        return None
+    payload = optional_token_payload()
+    if not payload or payload.get("role") != 'admin':
+        return None
+    g.profile_user_id = payload.get('user_id')
+    g.profiler = SamplingProfiler(interval=Config.PROFILE_INTERVAL).start()
+    return None
+
+@main.after_request
+def finish_profiling(response):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    profile_id = profile_store.new_id()
+    try:
+        profile_store.save(
+            profile_id, profiler.stop(),
+            method=request.method,
+            path=request.path,
+            status=response.status_code,
+            user_id=g.pop('profile_user_id', None)
+        )
+        response.headers['X-Profile-Id'] = profile_id
+    except Exception as e:
+        current_app.logger.error(f"No se pudo guardar el perfil: {str(e)}")
+    return response
+
+@main.teardown_request
+def discard_profiling(exc):
+    # Si la vista lanzó una excepción after_request no se ejecuta: detener el muestreo igualmente
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop()
+
+@main.route('/api/profiles/<profile_id>', methods=['GET'])
+@token_required(role='admin')
+def get_profile(profile_id):
+    """Resumen (top-N por tiempo propio) de un perfil guardado."""
+    try:
+        return jsonify(profile_store.load(profile_id)), 200
+    except KeyError:
+        return jsonify({"error": "Perfil no encontrado"}), 404
+
+@main.route('/api/profiles/<profile_id>/flamegraph', methods=['GET'])
+@token_required(role='admin')
+def get_profile_flamegraph(profile_id):
+    """Pilas colapsadas (flamegraph.pl, speedscope) con peso en microsegundos."""
+    try:
+        path = profile_store.collapsed_path(profile_id)
+    except KeyError:
+        return jsonify({"error": "Perfil no encontrado"}), 404
+    return send_file(path, mimetype='text/plain', as_attachment=True, download_name=f"{profile_id}.collapsed")
+
 @main.route('/api/upload-excel', methods=['POST'])
 def upload_excel():
     """
@@ -139,6 +221,7 @@ def upload_excel():
             return jsonify({"error": "No se proporcionaron archivos"}), 400
             
         response_data = []
+        pending_uploads = []  # (posición en response_data, ruta temporal, ruta destino)
         temp_dir = os.path.join(UPLOAD_FOLDER, "temp_uploads")
         os.makedirs(temp_dir, exist_ok=True)
 
@@ -162,7 +245,7 @@ def upload_excel():
                 })
                 continue
             
-            # Procesar archivo válido
+            # Guardar archivo válido; la subida se hace en lote más abajo
             try:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
                 original_filename = secure_filename(file.filename)
@@ -171,27 +254,12 @@ def upload_excel():
                 
                 file.save(temp_path)
                 
-                # Subir a Supabase
                 destination_path = f"xlsx/{user_id}/{new_filename}"
-                upload_success = upload_to_supabase(temp_path, destination_path)
-                
-                # Obtener URL pública (opcional)
-                file_url = ""
-                if upload_success:
-                    try:
-                        file_url = supabase.storage.from_('uploads').get_public_url(destination_path)
-                    except Exception as url_error:
-                        print(f"Error al obtener URL: {url_error}")
-                
-                # Registrar respuesta
                 response_data.append({
-                    "success": upload_success,
                     "filename": new_filename,
-                    "original_filename": original_filename,
-                    "file_url": file_url if upload_success else "",
-                    "destination_path": destination_path if upload_success else "",
-                    "error": "" if upload_success else "Error al subir a Supabase"
+                    "original_filename": original_filename
                 })
+                pending_uploads.append((len(response_data) - 1, temp_path, destination_path))
                 
             except Exception as file_error:
                 response_data.append({
@@ -199,14 +267,35 @@ def upload_excel():
                     "error": f"Error procesando archivo: {str(file_error)}",
                     "success": False
                 })
-                
-            finally:
-                # Limpieza del archivo temporal
-                if 'temp_path' in locals():
-                    try:
-                        os.remove(temp_path)
-                    except Exception as cleanup_error:
-                        print(f"Error limpiando archivo temporal: {cleanup_error}")
+
+        # Subir todos los archivos a Supabase en paralelo
+        upload_results = upload_many_to_supabase([(path, dest) for _, path, dest in pending_uploads])
+
+        for (index, temp_path, destination_path), result in zip(pending_uploads, upload_results):
+            upload_success = result['success']
+            
+            # Obtener URL pública (opcional)
+            file_url = ""
+            if upload_success:
+                try:
+                    file_url = supabase.storage.from_('uploads').get_public_url(destination_path)
+                except Exception as url_error:
+                    print(f"Error al obtener URL: {url_error}")
+            
+            # Registrar respuesta
+            response_data[index].update({
+                "success": upload_success,
+                "file_url": file_url if upload_success else "",
+                "destination_path": destination_path if upload_success else "",
+                "upload_seconds": result['seconds'],
+                "error": "" if upload_success else "Error al subir a Supabase"
+            })
+            
+            # Limpieza del archivo temporal
+            try:
+                os.remove(temp_path)
+            except Exception as cleanup_error:
+                print(f"Error limpiando archivo temporal: {cleanup_error}")
 
         # Estadísticas del proceso
         success_count = sum(1 for item in response_data if item['success'])
@@ -242,17 +331,26 @@ def login_user():
         if not email or not password:
             return jsonify({"error": "El email y la contraseña son obligatorios."}), 400
 
-        user_query = supabase.table('users').select('id, email, password, is_admin').eq('email', email).execute()
-        if not user_query.data or len(user_query.data) == 0:
+        # El hash se lee de Supabase en cada login (no de la caché del worker)
+        user = user_cache.credentials(supabase, email)
+        if not user:
             return jsonify({"error": "Usuario no encontrado."}), 404
 
-        user = user_query.data[0]
         user_id = user.get('id')
         stored_hashed = user.get('password')
 
-        if not bcrypt.checkpw(password.encode('utf-8'), stored_hashed.encode('utf-8')):
+        # bcrypt con admisión acotada (PASSWORD_WORKERS a la vez, 503 si la cola está llena)
+        if not password_hasher.verify(password, stored_hashed):
             return jsonify({"error": "Contraseña incorrecta."}), 401
 
+        # Si cambió BCRYPT_ROUNDS, se vuelve a hashear con el costo nuevo
+        if password_hasher.needs_rehash(stored_hashed):
+            try:
+                new_hashed = password_hasher.hash(password)
+                supabase.table('users').update({'password': new_hashed}).eq('id', user_id).execute()
+            except Exception as e:
+                current_app.logger.warning(f"No se pudo actualizar el hash de {email}: {str(e)}")
+
         is_admin = user.get('is_admin', False)
 
         login_payload = {
@@ -285,6 +383,8 @@ def login_user():
 
         return response
 
+    except PasswordHasherBusy as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
@@ -303,13 +403,12 @@ def register_user():
         if password != confirm_password:
             return jsonify({'error': 'Las contraseñas no coinciden.'}), 400
 
-        # Verificar si el correo ya está registrado
-        existing_user = supabase.table('users').select('email').eq('email', email).execute()
-        if existing_user.data:
+        # Verificar si el correo ya está registrado (la consulta queda en caché para el login)
+        if user_cache.get(supabase, email):
             return jsonify({'error': 'El correo ya está registrado.'}), 400
 
-        # Hashear la contraseña
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        # Hashear la contraseña (con admisión acotada de bcrypt)
+        hashed_password = password_hasher.hash(password)
 
         # Insertar en Supabase
         result = supabase.table('users').insert({
@@ -328,8 +427,13 @@ def register_user():
         # Obtener el ID del usuario recién creado
         user_id = result_dict['data'][0]['id']
 
+        # Solo campos no secretos: un segundo registro con el mismo correo no vuelve a consultar
+        user_cache.put({'id': user_id, 'email': email, 'is_admin': False})
+
         return jsonify({'message': 'Usuario registrado exitosamente.', 'user_id': user_id}), 201
 
+    except PasswordHasherBusy as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
@@ -351,12 +455,12 @@ def change_password():
             return jsonify({'error': 'Las contraseñas no coinciden.'}), 400
 
         # Verificar si el usuario existe en la base de datos
-        user_query = supabase.table('users').select('id').eq('email', email).execute()
-        if not user_query.data or len(user_query.data) == 0:
+        user = user_cache.get(supabase, email)
+        if not user:
             return jsonify({'error': 'Usuario no encontrado.'}), 404
 
-        # Hashear la nueva contraseña
-        hashed_new_password = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        # Hashear la nueva contraseña (con admisión acotada de bcrypt)
+        hashed_new_password = password_hasher.hash(new_password)
 
         # Actualizar la contraseña del usuario en Supabase
         update_result = supabase.table('users').update({
@@ -370,37 +474,26 @@ def change_password():
 
         return jsonify({'message': 'Contraseña actualizada exitosamente.'}), 200
 
+    except PasswordHasherBusy as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
     
 
 @main.route('/api/protected', methods=['GET'])
+@token_required()
 def protected_route():
-    try:
-        # Leer el token desde la cookie
-        session_token = request.cookies.get('session_token')
-
-        if not session_token:
-            return jsonify({"error": "Token de sesión no encontrado."}), 401
-
-        # Decodificar y verificar el token
-        payload = jwt.decode(session_token, SECRET_KEY, algorithms=[ALGORITHM])
-
-        # Puedes acceder a los datos del usuario desde el payload
-        user_id = payload.get('user_id')
-        email = payload.get('email')
+    # El decorador ya verificó el token; los datos del usuario vienen en request.user
+    payload = request.user
+    user_id = payload.get('user_id')
+    email = payload.get('email')
 
-        return jsonify({
-            "message": "Acceso concedido",
-            "user_id": user_id,
-            "email": email
-        }), 200
-
-    except jwt.ExpiredSignatureError:
-        return jsonify({"error": "El token ha expirado."}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({"error": "Token inválido."}), 401
+    return jsonify({
+        "message": "Acceso concedido",
+        "user_id": user_id,
+        "email": email
+    }), 200
 
 @main.route('/api/reference-items', methods=['GET'])
 def get_reference_items():
@@ -423,6 +516,38 @@ def get_reference_items():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@main.route('/api/reference-items/cache-stats', methods=['GET'])
+@token_required(role='admin')
+def reference_cache_stats():
+    """Contadores del índice de referencia en memoria de este worker."""
+    return jsonify(reference_index.stats()), 200
+
+@main.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Métricas de todos los workers en formato de exposición de Prometheus."""
+    if Config.METRICS_TOKEN:
+        expected = f"Bearer {Config.METRICS_TOKEN}"
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), expected):
+            return jsonify({"error": "No autorizado"}), 401
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def recompare_stored_comparisons(deleted_items):
+    """Re-evalúa item_comparison contra la referencia nueva; los errores no fallan la subida."""
+    from app import db
+    from app.comparisons import recompare_unmatched
+
+    try:
+        reference = reference_index.get(supabase)
+        stats = recompare_unmatched(
+            db.engine, reference.original_index,
+            removed_items=deleted_items, batch_size=Config.COMPARISON_BATCH_SIZE
+        )
+        current_app.logger.info(f"Re-comparación de item_comparison: {stats}")
+        return stats
+    except Exception as e:
+        current_app.logger.error(f"Error al re-evaluar comparaciones: {str(e)}", exc_info=True)
+        return {"error": str(e)}
+
 @main.route('/api/upload-reference', methods=['POST'])
 def upload_reference():
     try:
@@ -438,93 +563,51 @@ def upload_reference():
         if ext not in ['csv', 'xlsx']:
             return jsonify({"error": "Formato no soportado"}), 400
 
+        import pandas as pd
+        from app.reference_sync import sync_reference, iter_reference_rows, read_reference_header, REFERENCE_COLUMNS
+
         try:
             # Save file temporarily to avoid streaming issues
             temp_path = None
             try:
-                if ext == 'xlsx':
-                    # Create temp file for Excel to avoid memory issues
-                    temp_path = os.path.join(tempfile.gettempdir(), secure_filename(file.filename))
-                    file.save(temp_path)
-                    df = pd.read_excel(temp_path, engine='openpyxl')
-                else:
-                    # For CSV, we can process in memory
-                    sample = file.stream.read(1024).decode('utf-8')
-                    file.stream.seek(0)
-                    delimiter = ',' if ',' in sample else ';'
-                    df = pd.read_csv(file, delimiter=delimiter, encoding='utf-8')
-                
-                print(f"Registros totales en archivo: {len(df)}")
-                
+                # Guardar en disco: el archivo se recorre por bloques sin cargarlo completo en memoria
+                with tempfile.NamedTemporaryFile(delete=False, suffix=f".{ext}") as temp_file:
+                    temp_path = temp_file.name
+                file.save(temp_path)
+
                 # Normalize column names
-                df.columns = df.columns.str.strip().str.lower()
-                required_columns = ['no.', 'description']
-                if not all(col in df.columns for col in required_columns):
+                columns = read_reference_header(temp_path, ext)
+                required_columns = REFERENCE_COLUMNS
+                if not all(col in columns for col in required_columns):
                     return jsonify({
                         "error": f"El archivo debe contener columnas: {', '.join(required_columns)}",
-                        "columns_found": list(df.columns)
+                        "columns_found": columns
                     }), 400
 
-                # Clean data safely
-                df = df[required_columns].copy()
-                df = df.fillna('')
-                df['no.'] = df['no.'].astype(str).str.strip()
-                df['description'] = df['description'].astype(str).str.strip()
-
-                # Filter out empty rows
-                df = df[(df['no.'] != '') & (df['description'] != '')]
-
-                # Remove duplicates by 'no.' column to avoid DB constraint violation
-                df = df.drop_duplicates(subset=['no.'])
-
-                # Prepare records with validation
-                records = []
-                for _, row in df.iterrows():
-                    records.append({
-                        'item_number': str(row['no.'])[:100],  # Limit length
-                        'description': str(row['description'])[:500],  # Limit length
-                        'source_file': secure_filename(file.filename)[:255]
-                    })
-
-                print(f"Registros válidos preparados para inserción: {len(records)}")
-
                 try:
-                    # Delete existing records in batches to avoid timeouts
-                    batch_size = 1000
-                    total_deleted = 0
-                    while True:
-                        # Obtener los primeros N IDs que no sean 0
-                        fetch = supabase.table('item_reference').select('id').neq('id', 0).limit(batch_size).execute()
-                        ids_to_delete = [row['id'] for row in fetch.data]
-
-                        if not ids_to_delete:
-                            break  # No hay más registros a eliminar
-
-                        # Borrar esos registros por lote
-                        result = supabase.table('item_reference').delete().in_('id', ids_to_delete).execute()
-                        total_deleted += len(ids_to_delete)
-                    
-                    print(f"Registros eliminados: {total_deleted}")
-
-                    # Insert new records in batches
-                    if records:
-                        total_inserted = 0
-                        for i in range(0, len(records), batch_size):
-                            batch = records[i:i + batch_size]
-                            response = supabase.table('item_reference').insert(batch).execute()
-                            if response.data:
-                                total_inserted += len(response.data)
-                        
-                        print(f"Registros insertados exitosamente: {total_inserted}")
-                        return jsonify({
-                            "message": f"Base de datos actualizada. {total_inserted} items subidos",
-                            "total_items": total_inserted
-                        }), 200
+                    # Leer, limpiar, deduplicar y sincronizar por lotes mientras se lee el archivo
+                    rows = iter_reference_rows(temp_path, ext)
+                    sync = sync_reference(supabase, rows, source_file=secure_filename(file.filename), batch_size=1000)
+                    deleted_items = sync.pop('deleted_items')
+                    print(f"Registros totales en archivo: {sync['rows_read']}")
+                    print(f"Sincronización de referencia: {sync}")
+                    metrics.inc('books4less_rows_processed_total', sync['rows_read'], source='reference')
+
+                    if sync['inserted'] or sync['updated'] or sync['deleted']:
+                        reference_index.invalidate()
+
+                    # Solo las comparaciones guardadas sin coincidencia se re-evalúan
+                    # (un cambio de descripción no cambia ninguna coincidencia)
+                    if Config.COMPARISON_PERSIST and (sync['inserted'] or sync['deleted']):
+                        sync['recompare'] = recompare_stored_comparisons(deleted_items)
+
+                    if sync['total_items']:
+                        message = (f"Base de datos actualizada. {sync['total_items']} items "
+                                   f"({sync['inserted']} nuevos, {sync['updated']} modificados, {sync['deleted']} eliminados)")
                     else:
-                        return jsonify({
-                            "message": "Base de datos vaciada. No hay datos válidos para insertar.",
-                            "total_items": 0
-                        }), 200
+                        message = "Base de datos vaciada. No hay datos válidos para insertar."
+
+                    return jsonify({"message": message, **sync}), 200
                         
                 except Exception as e:
                     current_app.logger.error(f"Error en operación de base de datos: {str(e)}", exc_info=True)
@@ -554,47 +637,6 @@ def upload_reference():
             "details": str(e)
         }), 500
         
-def consolidate_files(file_paths):
-    """
-    Consolida archivos validando estructura y calculando campos adicionales.
-    """
-    dfs = []
-    for path in file_paths:
-        try:
-            ext = os.path.splitext(path)[1].lower()
-            if ext == ".xlsx":
-                df = pd.read_excel(path, engine="openpyxl")
-            elif ext == ".csv":
-                try:
-                    df = pd.read_csv(path, delimiter=",", engine="python")
-                except:
-                    df = pd.read_csv(path, delimiter=";", engine="python")
-            else:
-                continue
-                
-            # Validar y calcular campos adicionales para cada archivo
-            if 'us_price' in df.columns and 'quantity' in df.columns:
-                df['us_price'] = pd.to_numeric(df['us_price'], errors='coerce').fillna(0)
-                df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce').fillna(0)
-                df['Extended Retail'] = df['quantity'] * df['us_price']
-                
-            dfs.append(df)
-        except Exception as e:
-            print(f"Error procesando {path}: {e}")
-            continue
-            
-    if not dfs:
-        return None, "No se pudo leer ningún archivo válido."
-        
-    consolidated_df = pd.concat(dfs, ignore_index=True)
-    
-    # Guardar el archivo consolidado procesado
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    consolidated_file = os.path.join(DOWNLOAD_FOLDER, f"{timestamp}_consolidado_procesado.xlsx")
-    consolidated_df.to_excel(consolidated_file, index=False)
-    
-    return consolidated_file, None
-
 @main.route('/api/process-all', methods=['POST'])
 def process_all():
     """
@@ -653,26 +695,9 @@ def process_all():
         # Generar timestamp único para nombres de archivo
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-        # 1. Obtener datos de referencia
-        reference_time = time.time()
-        try:
-            reference_response = supabase.table('item_reference')\
-                .select('item_number,description').execute()
-            reference_items = pd.DataFrame(reference_response.data if reference_response.data else [])
-            reference_set = set(reference_items['item_number'].astype(str).str.strip()) if not reference_items.empty else set()
-        except Exception as e:
-            current_app.logger.error(f"Error al obtener referencia: {str(e)}")
-            reference_items = pd.DataFrame()
-            reference_set = set()
-        
-        current_app.logger.info(f"Tiempo carga referencia: {time.time() - reference_time:.2f}s")
-
-        # 2. Procesar archivos subidos
-        upload_time = time.time()
-        temp_file_paths = []
+        # Guardar archivos subidos (el procesamiento ocurre en run_process_all)
+        saved_files = []  # (nombre original, nombre almacenado, ruta temporal)
         errors = []
-        uploaded_files = []
-        all_processed_items = set()
 
         for file in files:
             if not file:
@@ -691,210 +716,41 @@ def process_all():
                 new_filename = f"{base_name}_{timestamp}.{ext}"
                 temp_path = os.path.join(UPLOAD_FOLDER, new_filename)
                 file.save(temp_path)
-                temp_file_paths.append(temp_path)
-
-                # Leer archivo y extraer item_ids
-                if ext == 'xlsx':
-                    df = pd.read_excel(temp_path)
-                else:
-                    sample = file.stream.read(1024).decode('utf-8')
-                    file.stream.seek(0)
-                    delimiter = ',' if ',' in sample else ';'
-                    df = pd.read_csv(temp_path, delimiter=delimiter)
-                
-                # Normalizar nombres de columnas
-                df.columns = df.columns.str.strip().str.lower()
-                
-                # Buscar columna que contiene los IDs (item_id, no., etc.)
-                id_column = None
-                for col in ['item_id', 'no.', 'no', 'item_number', 'number']:
-                    if col in df.columns:
-                        id_column = col
-                        break
-                
-                if id_column:
-                    items_in_file = set(df[id_column].astype(str).str.strip())
-                    all_processed_items.update(items_in_file)
-                
-                # Subir a Supabase
-                supa_path = f"xlsx/{user_id}/{new_filename}"
-                upload_to_supabase(temp_path, supa_path)
-                uploaded_files.append({
-                    'original_name': original_filename,
-                    'stored_name': new_filename
-                })
-                
+                saved_files.append((original_filename, new_filename, temp_path))
             except Exception as e:
                 errors.append({"file": original_filename, "error": str(e)})
                 continue
 
-        if not temp_file_paths:
+        if not saved_files:
             return jsonify({"error": "No se pudo procesar ningún archivo válido.", "details": errors}), 400
 
-        current_app.logger.info(f"Tiempo subida archivos: {time.time() - upload_time:.2f}s")
-
-        # 3. Consolidar archivos
-        consolidate_time = time.time()
-        consolidated_file, consolidate_error = consolidate_files(temp_file_paths)
-        if consolidate_error:
-            return jsonify({"error": consolidate_error}), 500
-        current_app.logger.info(f"Tiempo consolidación: {time.time() - consolidate_time:.2f}s")
-
-        # 4. Generar CSV
-        csv_time = time.time()
         excel_base = secure_filename(files[0].filename.rsplit('.', 1)[0])
-        csv_filename = f"{excel_base}_{timestamp}.csv"
-        csv_path = os.path.join(DOWNLOAD_FOLDER, csv_filename)
-        
-        try:
-            csv_result = create_csv(consolidated_file, csv_path)
-            if "error" in csv_result:
-                return jsonify(csv_result), 500
-            upload_to_supabase(csv_path, f"csv/{user_id}/{csv_filename}")
-        except Exception as e:
-            current_app.logger.error(f"Error al generar CSV: {str(e)}")
-            return jsonify({"error": "Error al generar CSV", "details": str(e)}), 500
-        
-        current_app.logger.info(f"Tiempo generación CSV: {time.time() - csv_time:.2f}s")
 
-        # 5. Generar PDF
-        pdf_time = time.time()
-        pdf_filename = f"{excel_base}_{timestamp}.pdf"
-        pdf_path = os.path.join(DOWNLOAD_FOLDER, pdf_filename)
-        
-        try:
-            pdf_result = create_pdf(consolidated_file, pdf_path, discount_rate, form_data)
-            if "error" in pdf_result:
-                return jsonify(pdf_result), 500
-            upload_to_supabase(pdf_path, f"pdf/{user_id}/{pdf_filename}")
-        except Exception as e:
-            current_app.logger.error(f"Error al generar PDF: {str(e)}")
-            return jsonify({"error": "Error al generar PDF", "details": str(e)}), 500
-        
-        current_app.logger.info(f"Tiempo generación PDF: {time.time() - pdf_time:.2f}s")
-
-        # 6. Comparación mejorada que maneja ceros a la izquierda
-        compare_time = time.time()
-
-        # Obtener TODOS los item_number de la referencia conservando ceros a la izquierda
-        try:
-            # Consulta paginada para manejar grandes volúmenes
-            reference_items = []
-            page = 0
-            while True:
-                response = supabase.table('item_reference')\
-                    .select('item_number')\
-                    .range(page*1000, (page+1)*1000-1)\
-                    .execute()
-                if not response.data:
-                    break
-                # Conservar los valores exactos como strings (incluyendo ceros a la izquierda)
-                reference_items.extend([str(item['item_number']) for item in response.data])
-                page += 1
-            
-            # Crear dos versiones del conjunto de referencia:
-            # 1. Original (conserva ceros a la izquierda)
-            reference_set_original = set(reference_items)
-            # 2. Normalizado (sin ceros a la izquierda para comparación flexible)
-            reference_set_normalized = set([item.lstrip('0') for item in reference_items])
-            
-        except Exception as e:
-            current_app.logger.error(f"Error al obtener referencia: {str(e)}")
-            reference_items = []
-            reference_set_original = set()
-            reference_set_normalized = set()
-
-        # Extraer TODOS los item_id de los archivos Excel conservando ceros a la izquierda
-        all_processed_items_original = set()
-        all_processed_items_normalized = set()
-        file_item_mapping = {}
-
-        for file_path in temp_file_paths:
-            try:
-                df = pd.read_excel(file_path)
-                
-                # Buscar la columna item_id (exactamente ese nombre)
-                if 'item_id' not in df.columns:
-                    # Si no existe, buscar columnas alternativas
-                    id_col = next((col for col in df.columns if col.lower() in ['item_id', 'no.', 'item_number', 'number']), None)
-                else:
-                    id_col = 'item_id'
-                
-                if id_col:
-                    # Convertir a string y limpiar espacios
-                    df[id_col] = df[id_col].astype(str).str.strip()
-                    
-                    # Procesar cada item
-                    for item in df[id_col].dropna().unique():
-                        # Conservar versión original
-                        all_processed_items_original.add(item)
-                        # Crear versión normalizada (sin ceros a la izquierda)
-                        normalized_item = item.lstrip('0')
-                        all_processed_items_normalized.add(normalized_item)
-                        
-                        # Mapeo para trazabilidad
-                        if item not in file_item_mapping:
-                            file_item_mapping[item] = []
-                        file_item_mapping[item].append(os.path.basename(file_path))
-                            
-            except Exception as e:
-                current_app.logger.error(f"Error procesando archivo {file_path}: {str(e)}")
-                continue
+        from app.pipeline import run_process_all
 
-        # Realizar comparaciones considerando ceros a la izquierda
-        unmatched_items = set()
-
-        # Primera pasada: comparación exacta (incluyendo ceros a la izquierda)
-        exact_matches = all_processed_items_original & reference_set_original
-
-        # Segunda pasada: comparación normalizada (sin ceros a la izquierda)
-        normalized_matches = all_processed_items_normalized & reference_set_normalized
-
-        # Identificar items no coincidentes
-        for item in all_processed_items_original:
-            # Verificar si no coincide ni exactamente ni en versión normalizada
-            if item not in exact_matches and item.lstrip('0') not in normalized_matches:
-                unmatched_items.add(item)
-
-        # Construcción del resultado
-        comparison_results = {
-            "total_reference_items": len(reference_set_original),
-            "total_processed_items": len(all_processed_items_original),
-            "matched_items_count": len(exact_matches) + len(normalized_matches) - len(set([i.lstrip('0') for i in exact_matches]) & set([i.lstrip('0') for i in normalized_matches])),  # Evitar duplicados
-            "unmatched_items": [{"item_id": item, "source_files": file_item_mapping.get(item, [])} for item in unmatched_items],
-            "match_percentage": round((len(all_processed_items_original) - len(unmatched_items)) / len(all_processed_items_original) * 100, 2) if all_processed_items_original else 0,
-            "files_with_missing_references": list(set(f for item in unmatched_items for f in file_item_mapping.get(item, []))),
-            "validation_notes": {
-                "exact_matches": len(exact_matches),
-                "normalized_matches": len(normalized_matches),
-                "zero_padding_issues": len(normalized_matches) - len(exact_matches)
-            }
-        }
+        def run(on_stage=None):
+            return run_process_all(saved_files, user_id, discount_rate, form_data, timestamp, excel_base,
+                                   start_time=start_time, errors=errors, on_stage=on_stage)
 
-        current_app.logger.info(f"Tiempo comparación: {time.time() - compare_time:.2f}s")
-        # Limpieza de archivos temporales
-        for path in temp_file_paths + [consolidated_file, csv_path, pdf_path]:
+        # Modo asíncrono opcional: responder de inmediato con el id del job
+        async_mode = (request.form.get('async') or request.args.get('async') or '').lower() in ('1', 'true', 'yes')
+        if async_mode:
             try:
-                if os.path.exists(path):
-                    os.remove(path)
-            except Exception as e:
-                current_app.logger.warning(f"No se pudo eliminar archivo temporal {path}: {str(e)}")
-
-        # Construir respuesta
-        total_time = time.time() - start_time
-        response_data = {
-            "message": "Procesamiento completado exitosamente.",
-            "processing_time_seconds": round(total_time, 2),
-            "download_links": {
-                "csv": f"/download/csv?user_id={user_id}&filename={csv_filename}",
-                "pdf": f"/download/pdf?user_id={user_id}&filename={pdf_filename}"
-            },
-            "uploaded_files": uploaded_files,
-            "comparison_results": comparison_results,
-            "errors": errors
-        }
+                job_id = job_runner.submit(current_app._get_current_object(), user_id, run)
+            except JobQueueFull as e:
+                for _, _, temp_path in saved_files:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                return jsonify({"error": str(e)}), 503
+            return jsonify({
+                "message": "Procesamiento en cola.",
+                "job_id": job_id,
+                "status_url": f"/api/jobs/{job_id}",
+                "events_url": f"/api/jobs/{job_id}/events"
+            }), 202
 
-        return jsonify(response_data), 200
+        response_data, status_code = run()
+        return jsonify(response_data), status_code
 
     except Exception as e:
         current_app.logger.error(f"Error en process-all: {str(e)}", exc_info=True)
@@ -903,6 +759,65 @@ def process_all():
             "details": str(e)
         }), 500
         
+def get_own_job(job_id):
+    """El job si pertenece al usuario del token (o el usuario es admin); None en otro caso."""
+    job = job_store.get(job_id)
+    if not job:
+        return None
+    if request.user.get('role') != 'admin' and str(job['user_id']) != str(request.user.get('user_id')):
+        # Mismo 404 que un job inexistente: no se revela que el id existe
+        return None
+    return job
+
+@main.route('/api/jobs/<job_id>', methods=['GET'])
+@token_required()
+def get_job(job_id):
+    """Estado de un job asíncrono de process-all: etapa actual, tiempos por etapa y resultado."""
+    job = get_own_job(job_id)
+    if not job:
+        return jsonify({"error": "Job no encontrado"}), 404
+    return jsonify(job), 200
+
+@main.route('/api/jobs/<job_id>/events', methods=['GET'])
+@token_required()
+def job_events(job_id):
+    """
+    Stream server-sent events con el progreso del job.
+
+    Con workers síncronos cada stream ocupa un worker, así que dura como
+    máximo JOB_EVENTS_TIMEOUT segundos: el cliente (EventSource) se reconecta
+    solo tras `retry` ms, o puede consultar /api/jobs/<id>.
+    """
+    if not get_own_job(job_id):
+        return jsonify({"error": "Job no encontrado"}), 404
+
+    timeout = Config.JOB_EVENTS_TIMEOUT
+
+    def generate():
+        yield f"retry: {Config.JOB_EVENTS_RETRY_MS}\n\n"
+        last_version = None
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = job_store.get(job_id)
+            if job is None:
+                break
+            if job['version'] != last_version:
+                last_version = job['version']
+                finished = job['status'] in ('completed', 'failed')
+                event = 'done' if finished else 'progress'
+                yield f"event: {event}\ndata: {json.dumps(job)}\n\n"
+                if finished:
+                    return
+            else:
+                # Comentario SSE para mantener viva la conexión
+                yield ": keep-alive\n\n"
+            time.sleep(0.5)
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @main.route('/api/files', methods=['GET'])
 def list_files():
     try:
@@ -928,59 +843,99 @@ def list_files():
 
         search_term = request.args.get('search', '').strip().lower()
 
-        bucket_name = 'uploads'
-        result_files = []
+        # Listados en paralelo y en caché por usuario; solo se arma la página pedida
+        paginatedFiles, totalFiles = list_files_page(supabase, user_id, searchType, page, limit, search_term)
 
-        for type in searchType:
-            folder = f"{type}/{user_id}"
-            try:
-                response = supabase.storage.from_(bucket_name).list(folder)
-                if not response:
-                    continue
+        return jsonify({
+            "success": True,
+            "archivos": paginatedFiles,
+            "paginacion": {
+                "total": totalFiles,
+                "page": page,
+                "limit": limit,
+                "pages": (totalFiles + limit - 1) // limit  # Redondeo hacia arriba
+            }
+        }), 200
+
+    except Exception as e:
+        print(f"Error general: {str(e)}")
+        return jsonify({
+            "error": "Error interno del servidor",
+            "details": str(e)
+        }), 500
 
-                for file_info in response:
-                    file_name = file_info.get('name', '')
-                    if not file_name or file_name.startswith('.'):
-                        continue
+@main.route('/api/inventory', methods=['GET'])
+@token_required()
+def list_inventory():
+    """
+    Inventario cargado por el usuario del token, filtrado en el servidor y paginado por
+    cursor: se pide la primera página sin `cursor` y las siguientes con el
+    `next_cursor` de la respuesta anterior.
+
+    Filtros: publisher, imprint, reporting_group, item_id, pallet_id,
+    series_code (igualdad), pub_date_from / pub_date_to (ISO 8601) y
+    available (true/false). `sort` es `id` o `pub_date` (por defecto
+    `pub_date` si se filtra por fecha).
+    """
+    from app import db
+    from app.inventory import INVENTORY_FILTERS, INVENTORY_SORTS, query_inventory
 
-                    if search_term and search_term not in file_name.lower():
-                        continue
-                    
-                    file_path = f"{folder}/{file_name}"
+    try:
+        user_id = request.user.get('user_id')
+        if not user_id:
+            return jsonify({"error": "El token no tiene user_id"}), 401
+        user_id = str(user_id)
 
-                    try:
-                        url_descarga = supabase.storage.from_(bucket_name).get_public_url(file_path)
-                        result_files.append({
-                            "nombre": file_name,
-                            "tipo": type,
-                            "fecha_subida": file_info.get('created_at', datetime.now().isoformat()),
-                            "tamano": file_info.get('metadata', {}).get('size', 0),
-                            "url": url_descarga
-                        })
-                    except Exception as e:
-                        print(f"Error al obtener URL para {file_path}: {str(e)}")
-                        continue
+        try:
+            limit = int(request.args.get('limit', Config.INVENTORY_PAGE_LIMIT))
+            if limit < 1:
+                raise ValueError
+        except ValueError:
+            return jsonify({"error": "El parámetro limit debe ser un entero positivo"}), 400
+        limit = min(limit, Config.INVENTORY_MAX_PAGE_LIMIT)
 
-            except Exception as e:
-                print(f"Error al listar {type}: {str(e)}")
-                continue
+        try:
+            pub_date_from = request.args.get('pub_date_from')
+            pub_date_to = request.args.get('pub_date_to')
+            pub_date_from = datetime.fromisoformat(pub_date_from) if pub_date_from else None
+            pub_date_to = datetime.fromisoformat(pub_date_to) if pub_date_to else None
+        except ValueError:
+            return jsonify({"error": "pub_date_from y pub_date_to deben tener formato ISO 8601 (YYYY-MM-DD)"}), 400
 
-        # Ordenar por fecha (recientes primero)
-        result_files.sort(key=lambda x: x['fecha_subida'], reverse=True)
-        
-        totalFiles = len(result_files)
-        start = (page - 1) * limit
-        end = start + limit
-        paginatedFiles = result_files[start:end]
+        available = request.args.get('available')
+        if available is not None:
+            available = available.strip().lower()
+            if available not in ('true', 'false', '1', '0'):
+                return jsonify({"error": "El parámetro available debe ser true o false"}), 400
+            available = available in ('true', '1')
+
+        default_sort = 'pub_date' if pub_date_from or pub_date_to else 'id'
+        sort = request.args.get('sort', default_sort)
+        if sort not in INVENTORY_SORTS:
+            return jsonify({"error": f"El parámetro sort debe ser uno de: {', '.join(INVENTORY_SORTS)}"}), 400
+
+        filters = {param: request.args[param] for param in INVENTORY_FILTERS if request.args.get(param)}
+
+        try:
+            with db.engine.connect() as conn:
+                rows, next_cursor = query_inventory(
+                    conn, user_id, filters=filters, pub_date_from=pub_date_from, pub_date_to=pub_date_to,
+                    available=available, sort=sort, cursor=request.args.get('cursor'), limit=limit
+                )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        for row in rows:
+            row['pub_date'] = row['pub_date'].isoformat() if row['pub_date'] else None
 
         return jsonify({
             "success": True,
-            "archivos": paginatedFiles,
+            "items": rows,
             "paginacion": {
-                "total": totalFiles,
-                "page": page,
                 "limit": limit,
-                "pages": (totalFiles + limit - 1) // limit  # Redondeo hacia arriba
+                "sort": sort,
+                "next_cursor": next_cursor,
+                "has_more": next_cursor is not None
             }
         }), 200
 
@@ -1019,29 +974,43 @@ def descargar_archivo(tipo):
         file_path = f"{tipo}/{user_id}/{filename}"
         bucket_name = 'uploads'
 
-        try:
-            # Descargar el archivo desde Supabase
-            file_data = supabase.storage.from_(bucket_name).download(file_path)
-            
-            if not file_data:
-                return jsonify({"error": "Archivo no encontrado"}), 404
-
-            # Crear respuesta
-            response = make_response(file_data)
-            
-            # Configurar headers según tipo de archivo
-            if tipo == 'pdf':
-                response.headers['Content-Type'] = 'application/pdf'
-                response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
-            elif tipo == 'csv':
-                response.headers['Content-Type'] = 'text/csv'
-                response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
-            else:  # xlsx
-                response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
-            
+        if tipo == 'pdf':
+            content_type = 'application/pdf'
+        elif tipo == 'csv':
+            content_type = 'text/csv'
+        else:  # xlsx
+            content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+        # Servir desde la caché local si el artefacto se generó o descargó recientemente
+        cached = artifact_cache.get(file_path)
+        if cached:
+            # send_file resuelve Range, If-None-Match e If-Modified-Since sobre el archivo local
+            try:
+                response = send_file(
+                    cached['path'],
+                    mimetype=content_type,
+                    as_attachment=True,
+                    download_name=filename,
+                    conditional=True,
+                    etag=unquote_etag(cached['etag'])[0] if cached['etag'] else True,
+                    last_modified=cached['last_modified'],
+                    max_age=None
+                )
+            except RequestedRangeNotSatisfiable as e:
+                return e.get_response()
+            response.headers['Cache-Control'] = 'private, no-cache'
             return response
 
+        # Encabezados del cliente que se reenvían a Storage (rangos y validación condicional)
+        forward_headers = {
+            name: request.headers[name]
+            for name in ('Range', 'If-Range', 'If-None-Match', 'If-Modified-Since')
+            if name in request.headers
+        }
+
+        try:
+            # Abrir la descarga sin cargar el archivo en memoria
+            upstream = open_storage_stream(bucket_name, file_path, forward_headers)
         except Exception as download_error:
             current_app.logger.error(f"Error al descargar: {str(download_error)}")
             return jsonify({
@@ -1049,6 +1018,91 @@ def descargar_archivo(tipo):
                 "details": str(download_error)
             }), 500
 
+        if upstream.status_code in (400, 404):
+            upstream.close()
+            return jsonify({"error": "Archivo no encontrado"}), 404
+
+        # Validadores del objeto (ETag / Last-Modified) tal como los entrega Storage
+        headers = {'Accept-Ranges': 'bytes', 'Cache-Control': 'private, no-cache'}
+        for name in ('ETag', 'Last-Modified'):
+            if upstream.headers.get(name):
+                headers[name] = upstream.headers[name]
+
+        if upstream.status_code == 416:
+            upstream.close()
+            if upstream.headers.get('Content-Range'):
+                headers['Content-Range'] = upstream.headers['Content-Range']
+            return Response(status=416, headers=headers)
+
+        # 304 si Storage ya respondió "sin cambios" o si los validadores del cliente coinciden
+        etag = upstream.headers.get('ETag')
+        not_modified = upstream.status_code == 304 or (
+            upstream.status_code == 200
+            and ('If-None-Match' in request.headers or 'If-Modified-Since' in request.headers)
+            and not is_resource_modified(
+                request.environ,
+                etag=unquote_etag(etag)[0] if etag else None,
+                last_modified=upstream.headers.get('Last-Modified')
+            )
+        )
+        if not_modified:
+            upstream.close()
+            return Response(status=304, headers=headers)
+
+        if upstream.status_code not in (200, 206):
+            upstream.close()
+            current_app.logger.error(f"Error al descargar: Storage respondió {upstream.status_code}")
+            return jsonify({
+                "error": "No se pudo descargar el archivo",
+                "details": f"Storage respondió {upstream.status_code}"
+            }), 500
+
+        # Configurar headers según tipo de archivo
+        headers['Content-Type'] = content_type
+        headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        for name in ('Content-Length', 'Content-Range'):
+            if upstream.headers.get(name):
+                headers[name] = upstream.headers[name]
+
+        # Las descargas completas se guardan a la vez en la caché local
+        cache_writer = None
+        if upstream.status_code == 200:
+            content_length = upstream.headers.get('Content-Length')
+            try:
+                cache_writer = artifact_cache.writer(
+                    file_path,
+                    etag=etag,
+                    last_modified=parse_date(upstream.headers.get('Last-Modified')).timestamp()
+                    if upstream.headers.get('Last-Modified') else None,
+                    expected_size=int(content_length) if content_length else None
+                )
+            except Exception as e:
+                current_app.logger.warning(f"No se pudo cachear {file_path}: {str(e)}")
+
+        def generate():
+            # Se envía por bloques de tamaño fijo: la memoria no depende del tamaño del archivo
+            completed = False
+            try:
+                for chunk in upstream.iter_raw(chunk_size=Config.DOWNLOAD_CHUNK_SIZE):
+                    if chunk:
+                        if cache_writer:
+                            cache_writer.write(chunk)
+                        yield chunk
+                completed = True
+            finally:
+                upstream.close()
+                if cache_writer:
+                    # Solo se registra si el cliente recibió el archivo completo
+                    try:
+                        if completed:
+                            cache_writer.commit()
+                        else:
+                            cache_writer.discard()
+                    except Exception as e:
+                        print(f"No se pudo cachear {file_path}: {e}")
+
+        return Response(generate(), status=upstream.status_code, headers=headers, direct_passthrough=True)
+
     except Exception as e:
         current_app.logger.error(f"Error en descarga: {str(e)}")
         return jsonify({
@@ -0,0 +1,39 @@
+import click
+
+from config.config import Config
+
+
+def schema_tables():
+    """Tablas que el código crea o amplía (columnas e índices nuevos) fuera de una migración."""
+    from app.models import Inventory, ItemComparison
+    return [Inventory.__table__, ItemComparison.__table__]
+
+
+def ensure_schema(engine):
+    """
+    Crea las tablas que falten y agrega las columnas e índices nuevos de
+    `inventory` e `item_comparison`. Es DDL: se ejecuta como paso explícito de
+    despliegue (`flask --app wsgi init-db`) o al arrancar con DB_SCHEMA_ON_START,
+    nunca dentro de una petición. Devuelve los nombres de las tablas revisadas.
+    """
+    from app.bulk import ensure_table
+
+    tables = schema_tables()
+    for table in tables:
+        ensure_table(engine, table)
+    return [table.name for table in tables]
+
+
+def init_app(app):
+    """Registra `flask init-db` y, si DB_SCHEMA_ON_START está activo, aplica el esquema al arrancar."""
+    from app import db
+
+    @app.cli.command('init-db')
+    def init_db():
+        """Crea/actualiza las tablas, columnas e índices de inventory e item_comparison."""
+        tables = ensure_schema(db.engine)
+        click.echo(f"Esquema listo: {', '.join(tables)}")
+
+    if Config.DB_SCHEMA_ON_START:
+        with app.app_context():
+            app.logger.info(f"Esquema listo: {ensure_schema(db.engine)}")
@@ -1,52 +1,84 @@
 import os
 import time
-import pandas as pd
-import requests
-import csv
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.platypus import Table, TableStyle
-from supabase import create_client
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
 from config.config import Config
-from datetime import datetime
+from app.file_listing import file_listing_cache
+from app.supabase_client import supabase, supabase_factory
 
-# Crear cliente de Supabase
-supabase = create_client(Config.SUPABASE_URL, Config.SUPABASE_API_KEY)
+# pandas, openpyxl y reportlab se importan dentro de cada función: importar este
+# módulo (lo hace routes.py al arrancar) no debe cargarlos
 
+# La carpeta la crea el blueprint al registrarse (routes.create_folders), no el import
 DOWNLOAD_FOLDER = "downloads"
-os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
-
-# Tiempo de expiración del archivo (en minutos)
-EXPIRATION_TIME = 5  # Eliminar después de 5 minutos
-
-def delete_old_files():
-    current_time = time.time()
-    for filename in os.listdir(DOWNLOAD_FOLDER):
-        file_path = os.path.join(DOWNLOAD_FOLDER, filename)
-        if os.path.isfile(file_path):
-            file_age = current_time - os.path.getctime(file_path)
-            if file_age > EXPIRATION_TIME * 60:
-                os.remove(file_path)
 
 def upload_to_supabase(file_path, destination_path):
-    """Sube un archivo al almacenamiento de Supabase."""
+    """
+    Sube un archivo al almacenamiento de Supabase.
+    Las carpetas en Storage son solo prefijos: no hace falta comprobarlas ni crearlas.
+    """
     try:
-        # Crear estructura de carpetas si no existe
-        folder = "/".join(destination_path.split("/")[:-1])
-        try:
-            supabase.storage.from_('uploads').list(folder)
-        except:
-            # Si falla, asumimos que la carpeta no existe
-            supabase.storage.from_('uploads').create_folder(folder)
-            
         with open(file_path, 'rb') as f:
             response = supabase.storage.from_('uploads').upload(destination_path, f)
+        file_listing_cache.invalidate_path(destination_path)
         return response
     except Exception as e:
         print(f"Error al subir archivo: {e}")
         return None
 
+def _timed_upload(file_path, destination_path):
+    """Sube un archivo y devuelve el resultado con su duración."""
+    start = time.time()
+    try:
+        with open(file_path, 'rb') as f:
+            supabase.storage.from_('uploads').upload(destination_path, f)
+        file_listing_cache.invalidate_path(destination_path)
+        error = ""
+    except Exception as e:
+        print(f"Error al subir archivo {destination_path}: {e}")
+        error = str(e)
+    return {
+        "local_path": file_path,
+        "destination_path": destination_path,
+        "success": not error,
+        "error": error,
+        "seconds": round(time.time() - start, 4)
+    }
+
+class UploadBatch:
+    """
+    Lote de subidas concurrentes a Supabase Storage con un pool de hilos acotado.
+    Los archivos se pueden ir agregando mientras el lote ya está subiendo;
+    `results()` espera a que terminen todos y devuelve los resultados en orden.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or Config.STORAGE_UPLOAD_WORKERS
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="storage-upload")
+        self._futures = []
+        self._results = None
+
+    def add(self, file_path, destination_path):
+        self._futures.append(self._executor.submit(_timed_upload, file_path, destination_path))
+
+    def results(self):
+        if self._results is None:
+            self._results = [future.result() for future in self._futures]
+            self._executor.shutdown(wait=True)
+        return self._results
+
+def upload_many_to_supabase(files, max_workers=None):
+    """
+    Sube varios archivos en paralelo. `files` es una lista de (ruta_local, ruta_destino).
+    Devuelve una lista (en el mismo orden) con success/error/seconds por archivo.
+    """
+    if not files:
+        return []
+    batch = UploadBatch(max_workers=min(len(files), max_workers or Config.STORAGE_UPLOAD_WORKERS))
+    for file_path, destination_path in files:
+        batch.add(file_path, destination_path)
+    return batch.results()
+
 def download_file_from_supabase(supabase_path, local_path):
     """Descarga un archivo de Supabase Storage"""
     try:
@@ -55,28 +87,55 @@ def download_file_from_supabase(supabase_path, local_path):
         if not res:
             return None
         
-        # Descargar el archivo
-        response = requests.get(res['signed_url'])
-        if response.status_code == 200:
-            with open(local_path, 'wb') as f:
-                f.write(response.content)
-            return True
+        # Descargar el archivo por bloques con el pool HTTP compartido
+        with supabase_factory.http_client().stream('GET', res['signed_url']) as response:
+            if response.status_code == 200:
+                with open(local_path, 'wb') as f:
+                    for chunk in response.iter_bytes():
+                        f.write(chunk)
+                return True
         return False
     except Exception as e:
         print(f"Error al descargar de Supabase: {e}")
         return None
     
+def open_storage_stream(bucket, path, headers=None):
+    """
+    Abre la descarga de un objeto de Supabase Storage sin leer el cuerpo.
+    Los encabezados `headers` (Range, If-None-Match, ...) se reenvían tal cual;
+    el llamador debe consumir `iter_raw()` y cerrar la respuesta.
+    """
+    url = f"{Config.SUPABASE_URL.rstrip('/')}/storage/v1/object/{bucket}/{quote(path)}"
+    request_headers = {
+        "Authorization": f"Bearer {Config.SUPABASE_API_KEY}",
+        "apikey": Config.SUPABASE_API_KEY,
+        # Sin compresión: los bytes y Content-Length se reenvían sin cambios
+        "Accept-Encoding": "identity"
+    }
+    request_headers.update(headers or {})
+    http_client = supabase_factory.http_client()
+    request = http_client.build_request("GET", url, headers=request_headers, timeout=Config.STORAGE_TIMEOUT)
+    return http_client.send(request, stream=True)
+
 def clean_numeric_column(series):
     """
     Limpia una serie numérica eliminando signos de dólar, comas y espacios,
     y luego la convierte a numérico.
     """
+    import pandas as pd
+
     # Convertir a cadena y quitar $ y comas
     cleaned = series.astype(str).replace({'\$': '', ',': '', ' ': ''}, regex=True)
     return pd.to_numeric(cleaned, errors='coerce').fillna(0)
 
 def process_file(input_file, discount_percent):
-    """Procesa un archivo Excel validando columnas requeridas y calculando campos adicionales."""
+    """
+    Procesa un archivo Excel validando columnas requeridas y calculando campos adicionales.
+    `input_file` puede ser una ruta o un DataFrame ya leído.
+    """
+    import pandas as pd
+    from app.ingest import load_dataframe
+
     try:
         # Columnas requeridas
         required_columns = [
@@ -86,14 +145,8 @@ def process_file(input_file, discount_percent):
             'quantity'
         ]
         
-        # Leer el archivo
-        file_extension = os.path.splitext(input_file)[1].lower()
-        if file_extension == ".xlsx":
-            df = pd.read_excel(input_file, sheet_name=0, engine="openpyxl")
-        elif file_extension == ".csv":
-            df = pd.read_csv(input_file, delimiter=";")
-        else:
-            return {"error": "Formato de archivo no soportado"}
+        # Leer el archivo (o reutilizar el DataFrame recibido sin modificarlo)
+        df = load_dataframe(input_file, delimiter=";", columns=required_columns).copy()
         
         # Validar columnas requeridas
         missing_columns = [col for col in required_columns if col not in df.columns]
@@ -109,6 +162,7 @@ def process_file(input_file, discount_percent):
         df['Extended @ 3%'] = df['Extended Retail'] * (discount_percent / 100)
         
         # Guardar el archivo procesado (en lugar del original)
+        os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
         output_csv = os.path.join(DOWNLOAD_FOLDER, "archivo_procesado.csv")
         df.to_csv(output_csv, index=False)
         
@@ -117,13 +171,10 @@ def process_file(input_file, discount_percent):
         return {"error": str(e)}
 
 def create_pdf(input_file, output_pdf, discount_percent, form_data=None):
-    from datetime import datetime
-    from reportlab.lib import colors
-    from reportlab.lib.pagesizes import letter
-    from reportlab.platypus import Table, TableStyle
-    from reportlab.pdfgen import canvas
+    """Genera la orden de compra en PDF. `input_file` puede ser una ruta o un DataFrame."""
+    from app.pdf_renderer import PurchaseOrderRenderer, format_rows
+    from app.ingest import load_dataframe
     import pandas as pd
-    import os
 
     try:
         if form_data is None:
@@ -133,18 +184,15 @@ def create_pdf(input_file, output_pdf, discount_percent, form_data=None):
         required = ['series_desc','pallet_id','item_id','item_desc','us_price','quantity']
 
         # Leer datos
-        ext = os.path.splitext(input_file)[1].lower()
-        if ext == '.xlsx':
-            df = pd.read_excel(input_file, engine='openpyxl')
-        elif ext == '.csv':
-            df = pd.read_csv(input_file)
-        else:
-            return {"error": "Formato de archivo no soportado"}
+        df = load_dataframe(input_file, delimiter=",", columns=required)
 
         miss = [c for c in required if c not in df.columns]
         if miss:
             return {"error": f"Faltan columnas: {', '.join(miss)}"}
 
+        # Trabajar solo con las columnas necesarias para no modificar el DataFrame original
+        df = df[required].copy()
+
         # Limpieza y cálculos
         # Elimina el símbolo de dólar y convierte a número
         df['us_price'] = df['us_price'].replace('[\$,]', '', regex=True).astype(float)
@@ -159,158 +207,20 @@ def create_pdf(input_file, output_pdf, discount_percent, form_data=None):
 
 
         # Agrupar por pallet_id
-        grouped = df.groupby('pallet_id').agg({
+        # observed=True: con columnas categóricas (esquema del manifiesto) solo los grupos presentes
+        grouped = df.groupby('pallet_id', observed=True).agg({
             'series_desc':'first',
             'quantity':'sum',
             'Extended @ %':'sum'
         }).reset_index()
 
-        # Inicializar canvas
-        c = canvas.Canvas(output_pdf, pagesize=letter)
-        width, height = letter
-
-        # Prepara filas de productos
-        product_rows = []
-        max_desc = 40
-        for i, row in grouped.iterrows():
-            desc = str(row['series_desc'])
-            if len(desc)>max_desc:
-                desc = desc[:max_desc]+"..."
-            product_rows.append([
-                i+1,
-                row['pallet_id'],
-                desc,
-                int(row['quantity']),
-                f"${row['Extended @ %']:,.2f}"
-            ])
-
         # Totales
         total_qty = int(grouped['quantity'].sum())
         total_ext = grouped['Extended @ %'].sum()
-        total_row = ["","","TOTAL:", total_qty, f"${total_ext:,.2f}"]
-
-        # Parámetros de tabla y paginación
-        header = ["L/N","Item Number","Description","Ordered","Ext. Price"]
-        y0      = height - 300
-        margin  = 50
-        row_h   = 18
-        per_pg  = int((y0 - margin)/row_h) - 1
-
-        # Fragmentar y dibujar cada página
-        chunks = [product_rows[i:i+per_pg] for i in range(0, len(product_rows), per_pg)]
-        for pi, rows in enumerate(chunks):
-            if pi > 0:
-                c.showPage()
-
-        # === ENCABEZADO EN TODAS LAS PÁGINAS ===
-        c.setFont("Helvetica-Bold", 14)
-        c.drawString(50, height - 40, "Book For Less LLC")
-        c.setFont("Helvetica", 10)
-        c.drawString(50, height - 55, "P.O. Box 344")
-        c.drawString(50, height - 70, "New York, NY 10001")
-
-        # Purchase Order / Date
-        po = [
-            ["Purchase Order", form_data.get('purchase_info','N/A')],
-            ["Date",           form_data.get('order_date','N/A')]
-        ]
-        t_po = Table(po, colWidths=[100,100])
-        t_po.setStyle(TableStyle([
-            ('GRID', (0,0),(-1,-1),1,colors.black),
-            ('BACKGROUND',(0,0),(1,0),colors.lightgrey),
-            ('ALIGN',(0,0),(-1,-1),'CENTER'),
-            ('FONTNAME',(0,0),(-1,0),'Helvetica-Bold'),
-            ('FONTSIZE',(0,0),(-1,-1),9),
-        ]))
-        t_po.wrapOn(c,width,height)
-        t_po.drawOn(c, width-275, height-90)
-
-        # Vendor
-        vd = [
-            ["Vendor:"],
-            [form_data.get("seller_name","")],
-            [form_data.get("seller_PO","")],
-            [form_data.get("seller_address","")]
-        ]
-        t_vd = Table(vd, colWidths=[225])
-        t_vd.setStyle(TableStyle([
-            ('GRID',(0,0),(-1,-1),1,colors.black),
-            ('BACKGROUND',(0,0),(-1,0),colors.lightgrey),
-            ('FONTNAME',(0,0),(-1,0),'Helvetica-Bold'),
-            ('FONTSIZE',(0,0),(-1,-1),9),
-            ('LEFTPADDING',(0,0),(-1,-1),4),
-        ]))
-        t_vd.wrapOn(c,width,height)
-        t_vd.drawOn(c,50, height-180)
-
-        # Ship To
-        st = [
-            ["Ship To:"],
-            [form_data.get("company_name","")],
-            [form_data.get("company_address","")],
-            [form_data.get("company_info","")]
-        ]
-        t_st = Table(st, colWidths=[225])
-        t_st.setStyle(TableStyle([
-            ('GRID',(0,0),(-1,-1),1,colors.black),
-            ('BACKGROUND',(0,0),(-1,0),colors.lightgrey),
-            ('FONTNAME',(0,0),(-1,0),'Helvetica-Bold'),
-            ('FONTSIZE',(0,0),(-1,-1),9),
-            ('LEFTPADDING',(0,0),(-1,-1),4),
-        ]))
-        t_st.wrapOn(c,width,height)
-        t_st.drawOn(c, width-300, height-180)
-
-        # Shipping / Payment Terms
-        sp = [
-            ["Shipping Method","Payment Terms"],
-            [form_data.get('shipping_method','N/A'),
-            form_data.get('payment_terms',    'N/A')]
-        ]
-        t_sp = Table(sp, colWidths=[249,249])
-        t_sp.setStyle(TableStyle([
-            ('GRID',(0,0),(-1,-1),1,colors.black),
-            ('BACKGROUND',(0,0),(-1,0),colors.lightgrey),
-            ('FONTNAME',(0,0),(-1,0),'Helvetica-Bold'),
-            ('FONTSIZE',(0,0),(-1,-1),9),
-            ('LEFTPADDING',(0,0),(-1,-1),4),
-        ]))
-        t_sp.wrapOn(c,width,height)
-        t_sp.drawOn(c,50, height-250)
-
-        # === TABLA DE PRODUCTOS ===
-        y_start = height - 300
-        data = [header] + rows
-        if pi == len(chunks)-1:
-            data.append(total_row)
-
-        tbl = Table(data, colWidths=[30,80,228,70,90])
-        tbl.setStyle(TableStyle([
-            ('GRID',(0,0),(-1,-1),1,colors.black),
-            ('BACKGROUND',(0,0),(-1,0),colors.grey),
-            ('TEXTCOLOR',(0,0),(-1,0),colors.whitesmoke),
-            ('FONTNAME',(0,0),(-1,0),'Helvetica-Bold'),
-            ('ALIGN',(0,0),(-1,-1),'CENTER'),
-            ('ALIGN',(2,1),(2,-1),'LEFT'),
-            ('ROWBACKGROUNDS',(0,1),(-1,-1),[colors.whitesmoke,colors.white]),
-        ]))
-        tbl.wrapOn(c, width, height)
-        tbl.drawOn(c, 50, y_start - row_h*(len(rows)+1))
-
-        # ======= AGREGAR ESTAS LÍNEAS PARA NUMERACIÓN DE PÁGINA =======
-        page_number = f"Page {pi + 1} of {len(chunks)}"
-        c.drawRightString(width - 50, 30, page_number)
-
-            # ======= AGREGAR ESTAS LÍNEAS PARA NUMERACIÓN DE PÁGINA =======
-        page_number = f"Page {pi + 1} of {len(chunks)}"
-        c.drawRightString(width - 50, 30, page_number)
-
-        # Pie de página
-        c.setFont("Helvetica",8)
-        c.drawString(50,30, f"Generated on: {datetime.now():%m/%d/%Y %H:%M}")
-        c.save()
+        total_row = ["", "", "TOTAL:", str(total_qty), f"${total_ext:,.2f}"]
 
-        
+        # Dibujar todas las páginas (encabezado, tabla de pallets, totales y numeración)
+        PurchaseOrderRenderer(output_pdf, form_data).render(format_rows(grouped), total_row)
 
         return {"message": f"PDF creado exitosamente: {output_pdf}"}
 
@@ -322,17 +232,19 @@ def create_csv(input_file, output_csv):
     """
     Crea un CSV agrupado por 'item_id' e 'item_desc', sumando la 'quantity',
     formateando 'item_id' sin notación científica y asegurando que no se repitan.
+    `input_file` puede ser una ruta o un DataFrame ya leído.
     """
+    import pandas as pd
+    from app.ingest import load_dataframe
+
     try:
 
-        # Leer el archivo según su extensión
-        file_extension = os.path.splitext(input_file)[1].lower()
-        if file_extension == ".xlsx":
-            df = pd.read_excel(input_file, sheet_name=0, engine="openpyxl")
-        elif file_extension == ".csv":
-            df = pd.read_csv(input_file, delimiter=",")
-        else:
-            return {"error": "Formato de archivo no soportado"}
+        # Leer el archivo según su extensión (o reutilizar el DataFrame recibido)
+        csv_columns = ['item_id', 'item_desc', 'series_desc', 'quantity']
+        df = load_dataframe(input_file, delimiter=",", columns=csv_columns)
+
+        # Quedarse solo con las columnas usadas para no modificar el DataFrame original
+        df = df[[c for c in csv_columns if c in df.columns]].copy()
 
         # Asegurarse de que 'item_id' se trate como número para luego formatearlo
         if 'item_id' in df.columns:
@@ -366,7 +278,8 @@ def create_csv(input_file, output_csv):
             df.drop(columns=['Extended Retail'], inplace=True)
 
         # Agrupar por 'item_id' e 'item_desc', sumando 'quantity'
-        grouped_df = df.groupby(['item_id', 'item_desc'], as_index=False)['quantity'].sum()
+        # observed=True: con columnas categóricas no se genera el producto cartesiano (pandas 2.x)
+        grouped_df = df.groupby(['item_id', 'item_desc'], as_index=False, observed=True)['quantity'].sum()
 
         # Guardar el CSV resultante sin índices
         grouped_df.to_csv(output_csv, index=False)
@@ -0,0 +1,205 @@
+import os
+import threading
+import time
+
+import httpx
+
+from app.metrics import metrics
+from config.config import Config
+
+
+def http2_available():
+    """HTTP/2 requiere el paquete opcional `h2` (pip install "httpx[http2]")."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class ConnectionMetrics:
+    """
+    Cuenta peticiones y conexiones nuevas del transporte compartido a partir
+    de los eventos de traza de httpcore; el resto de peticiones reutilizó
+    una conexión abierta (keep-alive).
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.http2_requests = 0
+        self.new_connections = 0
+        self._lock = threading.Lock()
+
+    def trace(self, event_name, info):
+        if event_name == 'connection.connect_tcp.complete':
+            with self._lock:
+                self.new_connections += 1
+        elif event_name in ('http11.send_request_headers.started', 'http2.send_request_headers.started'):
+            with self._lock:
+                self.requests += 1
+                if event_name.startswith('http2'):
+                    self.http2_requests += 1
+
+    def on_request(self, request):
+        request.extensions['trace'] = self.trace
+
+    def stats(self):
+        reused = max(0, self.requests - self.new_connections)
+        return {
+            "requests": self.requests,
+            "http2_requests": self.http2_requests,
+            "new_connections": self.new_connections,
+            "reused_connections": reused,
+            "reuse_ratio": round(reused / self.requests, 4) if self.requests else 0
+        }
+
+
+def _service(path):
+    """rest, storage, auth, ... según el prefijo de la API de Supabase."""
+    parts = path.split('/')
+    return parts[1] if len(parts) > 2 and parts[1] else 'other'
+
+
+class _MeteredStream(httpx.SyncByteStream):
+    """Cuenta los bytes del cuerpo de la respuesta a medida que se leen."""
+
+    def __init__(self, stream, service):
+        self._stream = stream
+        self._service = service
+        self._received = 0
+
+    def __iter__(self):
+        for chunk in self._stream:
+            self._received += len(chunk)
+            yield chunk
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            metrics.inc('books4less_supabase_bytes_total', self._received,
+                        service=self._service, direction='received')
+
+
+class MeteredTransport(httpx.HTTPTransport):
+    """Transporte HTTP que registra peticiones, latencia y bytes enviados/recibidos de Supabase."""
+
+    def handle_request(self, request):
+        service = _service(request.url.path)
+        started = time.perf_counter()
+        try:
+            response = super().handle_request(request)
+        except Exception:
+            metrics.inc('books4less_supabase_requests_total', service=service, status='error')
+            raise
+        metrics.observe('books4less_supabase_request_duration_seconds', time.perf_counter() - started,
+                        service=service)
+        metrics.inc('books4less_supabase_requests_total', service=service, status=response.status_code)
+        sent = int(request.headers.get('content-length') or 0)
+        if sent:
+            metrics.inc('books4less_supabase_bytes_total', sent, service=service, direction='sent')
+        response.stream = _MeteredStream(response.stream, service)
+        return response
+
+
+class SupabaseClientFactory:
+    """
+    Cliente de Supabase único por proceso con un pool HTTP compartido.
+
+    Se crea en el primer uso (no al importar) y se vuelve a crear si el
+    proceso cambió de pid: tras el fork de gunicorn cada worker abre sus
+    propias conexiones en lugar de compartir sockets con el proceso padre.
+    PostgREST, Storage y las descargas directas usan el mismo httpx.Client,
+    con keep-alive y HTTP/2 (`h2` viene con httpx[http2] en requirements.txt).
+    """
+
+    def __init__(self):
+        self.metrics = ConnectionMetrics()
+        self._client = None
+        self._http_client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _create(self):
+        # supabase-py (~0.4 s de import) se carga con el primer cliente, no al arrancar
+        from supabase import create_client
+        from supabase.lib.client_options import SyncClientOptions
+
+        use_http2 = Config.SUPABASE_HTTP2 and http2_available()
+        if Config.SUPABASE_HTTP2 and not use_http2:
+            # Una vez por proceso: sin `h2` httpx usaría HTTP/1.1 sin avisar
+            print("Advertencia: SUPABASE_HTTP2 está activo pero el paquete `h2` no está instalado; "
+                  "se usa HTTP/1.1 (pip install \"httpx[http2]\")")
+        transport = MeteredTransport(
+            http2=use_http2,
+            limits=httpx.Limits(
+                max_connections=Config.SUPABASE_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.SUPABASE_MAX_KEEPALIVE,
+                keepalive_expiry=Config.SUPABASE_KEEPALIVE_EXPIRY
+            )
+        )
+        http_client = httpx.Client(
+            transport=transport,
+            timeout=httpx.Timeout(Config.SUPABASE_TIMEOUT, connect=Config.SUPABASE_CONNECT_TIMEOUT),
+            event_hooks={'request': [self.metrics.on_request]}
+        )
+        client = create_client(
+            Config.SUPABASE_URL,
+            Config.SUPABASE_API_KEY,
+            options=SyncClientOptions(httpx_client=http_client)
+        )
+        return client, http_client
+
+    def _ensure(self):
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    # No se cierra el cliente heredado: sus sockets pertenecen al proceso padre
+                    self._client, self._http_client = self._create()
+                    self._pid = os.getpid()
+
+    def get(self):
+        self._ensure()
+        return self._client
+
+    def use(self, client, http_client=None):
+        """
+        Fija el cliente de este proceso, p. ej. el Supabase en memoria de
+        benchmarks/fake_supabase.py. Sin `http_client`, las descargas directas
+        de Storage (/download) no están disponibles.
+        """
+        with self._lock:
+            self._client = client
+            self._http_client = http_client
+            self._pid = os.getpid()
+
+    def http_client(self):
+        """httpx.Client compartido, para peticiones directas a la API de Storage."""
+        self._ensure()
+        return self._http_client
+
+    def stats(self):
+        return {
+            **self.metrics.stats(),
+            "http2_enabled": bool(Config.SUPABASE_HTTP2 and http2_available()),
+            "max_connections": Config.SUPABASE_MAX_CONNECTIONS,
+            "max_keepalive_connections": Config.SUPABASE_MAX_KEEPALIVE
+        }
+
+
+class LazySupabase:
+    """
+    Sustituto del antiguo `supabase = create_client(...)` de cada módulo:
+    delega cada atributo (`table`, `storage`, ...) en el cliente de la fábrica.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+
+    def __getattr__(self, name):
+        return getattr(self._factory.get(), name)
+
+
+# Fábrica y cliente compartidos por todo el proceso
+supabase_factory = SupabaseClientFactory()
+supabase = LazySupabase(supabase_factory)
@@ -0,0 +1,86 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+
+from config.config import Config
+
+
+class VerifiedTokenCache:
+    """
+    Caché LRU acotada de tokens JWT ya verificados.
+
+    La clave es un hash del token (nunca se guarda el token en claro) y el
+    valor es el payload decodificado, válido hasta su `exp`. Un token alterado
+    produce otro hash, así que siempre pasa por la verificación completa.
+    """
+
+    def __init__(self, max_size=4096, max_ttl_seconds=300):
+        self.max_size = max_size
+        self.max_ttl_seconds = max_ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token):
+        return hashlib.blake2b(token.encode('utf-8'), digest_size=16).digest()
+
+    def decode(self, token, key, algorithms):
+        """
+        Igual que `jwt.decode(token, key, algorithms=algorithms)`, pero sin repetir
+        la verificación de firma para tokens recientes. Lanza las mismas
+        excepciones (ExpiredSignatureError, InvalidTokenError).
+        """
+        cache_key = self._key(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                payload, expires_at, has_exp = entry
+                if now < expires_at:
+                    self._entries.move_to_end(cache_key)
+                    self.hits += 1
+                    return dict(payload)
+                del self._entries[cache_key]
+                if has_exp:
+                    self.hits += 1
+                    raise jwt.ExpiredSignatureError("Signature has expired")
+            self.misses += 1
+
+        payload = jwt.decode(token, key, algorithms=algorithms)
+
+        # Tokens sin `exp`: se vuelven a verificar pasado max_ttl_seconds
+        exp = payload.get('exp')
+        has_exp = isinstance(exp, (int, float))
+        expires_at = exp if has_exp else now + self.max_ttl_seconds
+        with self._lock:
+            self._entries[cache_key] = (payload, expires_at, has_exp)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return dict(payload)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0,
+            "size": len(self._entries),
+            "max_size": self.max_size
+        }
+
+
+# Caché compartida por todo el proceso
+verified_token_cache = VerifiedTokenCache(
+    max_size=Config.TOKEN_CACHE_SIZE,
+    max_ttl_seconds=Config.TOKEN_CACHE_MAX_TTL
+)
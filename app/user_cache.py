@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import OrderedDict
+
+from config.config import Config
+
+# La caché solo guarda campos no secretos; el hash de la contraseña se lee siempre de Supabase
+USER_COLUMNS = 'id, email, is_admin'
+CREDENTIAL_COLUMNS = 'id, email, password, is_admin'
+
+
+class UserCache:
+    """
+    Caché LRU de corta duración de los registros de `users` por email.
+
+    Evita repetir la consulta a Supabase en ráfagas de login y entre
+    register -> login. Solo se guardan usuarios existentes (no hay caché
+    negativa) y cada entrada vence a los `ttl_seconds`, de modo que un cambio
+    hecho desde otro worker se ve como mucho tras ese tiempo.
+
+    Nunca guarda `password`: cada worker tiene su propia caché, y un hash
+    cacheado seguiría aceptando la contraseña anterior en los demás workers
+    después de un cambio. La verificación usa `credentials()`.
+    """
+
+    def __init__(self, ttl_seconds=30, max_size=1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, client, email):
+        """Devuelve el usuario (id, email, is_admin) o None si no existe."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is not None and now - entry[1] < self.ttl_seconds:
+                self._entries.move_to_end(email)
+                self.hits += 1
+                return dict(entry[0])
+            self.misses += 1
+
+        response = client.table('users').select(USER_COLUMNS).eq('email', email).execute()
+        if not response.data:
+            return None
+        user = response.data[0]
+        self.put(user)
+        return dict(user)
+
+    def credentials(self, client, email):
+        """
+        Usuario con su hash de contraseña, leído siempre de Supabase (login y
+        cambio de contraseña). Aprovecha la lectura para refrescar la entrada
+        sin el hash. Devuelve None si no existe.
+        """
+        response = client.table('users').select(CREDENTIAL_COLUMNS).eq('email', email).execute()
+        if not response.data:
+            self.invalidate(email)
+            return None
+        user = response.data[0]
+        self.put(user)
+        return dict(user)
+
+    def put(self, user):
+        """Guarda (o reemplaza) el registro de un usuario sin su contraseña, p. ej. tras registrarlo."""
+        user = {key: value for key, value in user.items() if key != 'password'}
+        with self._lock:
+            self._entries[user['email']] = (user, time.time())
+            self._entries.move_to_end(user['email'])
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, email):
+        with self._lock:
+            self._entries.pop(email, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0,
+            "size": len(self._entries),
+            "ttl_seconds": self.ttl_seconds
+        }
+
+
+# Caché compartida por todo el proceso
+user_cache = UserCache(ttl_seconds=Config.USER_CACHE_TTL, max_size=Config.USER_CACHE_SIZE)
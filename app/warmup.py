@@ -0,0 +1,36 @@
+import importlib
+import time
+
+# Módulos pesados que las rutas importan en su primer uso
+WARMUP_MODULES = (
+    'app.pipeline',        # pandas, numpy, openpyxl (ingest), matching
+    'app.reference_sync',
+    'app.pdf_renderer',    # reportlab
+    'supabase',
+)
+
+
+def warm_up(create_clients=False):
+    """
+    Importa por adelantado los módulos que de otro modo se cargan en la primera
+    petición que los usa.
+
+    Con `gunicorn --preload` conviene llamarlo en el proceso maestro (los
+    workers heredan los módulos ya cargados al hacer fork). `create_clients=True`
+    además crea el cliente de Supabase; debe hacerse después del fork (p. ej. en
+    el hook `post_fork` de gunicorn) porque el cliente es por proceso.
+
+    Devuelve los segundos que tomó cada paso.
+    """
+    timings = {}
+    for module in WARMUP_MODULES:
+        started = time.perf_counter()
+        importlib.import_module(module)
+        timings[module] = round(time.perf_counter() - started, 4)
+
+    if create_clients:
+        from app.supabase_client import supabase_factory
+        started = time.perf_counter()
+        supabase_factory.get()
+        timings['supabase_client'] = round(time.perf_counter() - started, 4)
+    return timings
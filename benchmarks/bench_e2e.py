@@ -0,0 +1,145 @@
+"""
+Benchmark de extremo a extremo de los endpoints Flask contra un Supabase en memoria.
+
+Recorre /api/upload-reference, /api/process-all y /api/files con manifiestos
+sintéticos y reporta el tiempo de cada etapa. La latencia de Supabase se
+simula por llamada (ver benchmarks/fake_supabase.py).
+
+Uso:
+    python -m benchmarks.bench_e2e --files 3 --rows 20000 --reference 100000 --latency-ms 20
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from app import create_app
+from app.supabase_client import supabase_factory
+from benchmarks.fake_supabase import FakeSupabase
+from benchmarks.manifests import make_manifest
+
+FORM_DATA = {
+    'user_id': 'bench-user',
+    'discount_rate': '20',
+    'purchase_info': 'PO-BENCH',
+    'order_date': '2025-01-01',
+    'seller_name': 'Vendor Inc.',
+    'company_name': 'Book For Less LLC',
+    'shipping_method': 'Ground',
+    'payment_terms': 'Net 30'
+}
+
+
+def write_inputs(directory, files, rows, reference_size, extension, seed=0):
+    """Manifiestos y archivo de referencia (~70% de los item_id de los manifiestos están en la referencia)."""
+    manifest_paths = []
+    item_ids = []
+    for i in range(files):
+        df = make_manifest(rows, seed=seed + i)
+        path = os.path.join(directory, f"manifest_{i}.{extension}")
+        if extension == 'csv':
+            df.to_csv(path, index=False)
+        else:
+            df.to_excel(path, index=False, engine='openpyxl')
+        manifest_paths.append(path)
+        item_ids.extend(df['item_id'])
+
+    rng = np.random.default_rng(seed)
+    known = pd.unique(pd.Series(item_ids))
+    known = known[rng.random(len(known)) < 0.7][:reference_size]
+    extra = [f"{n:013d}" for n in rng.integers(10**9, 10**12, max(0, reference_size - len(known)))]
+    reference = pd.DataFrame({'No.': list(known) + extra})
+    reference['Description'] = [f"Title {i}" for i in range(len(reference))]
+    reference_path = os.path.join(directory, "reference.csv")
+    reference.to_csv(reference_path, index=False)
+    return manifest_paths, reference_path
+
+
+def summarize(label, values, unit='s'):
+    scale = 1000 if unit == 'ms' else 1
+    values = sorted(v * scale for v in values)
+    p95 = values[min(len(values) - 1, int(0.95 * len(values)))]
+    print(f"  {label:<22} media {statistics.mean(values):9.3f} {unit}   p50 {statistics.median(values):9.3f} {unit}"
+          f"   p95 {p95:9.3f} {unit}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--files', type=int, default=3)
+    parser.add_argument('--rows', type=int, default=20000, help="filas por manifiesto")
+    parser.add_argument('--reference', type=int, default=100000)
+    parser.add_argument('--format', choices=['xlsx', 'csv'], default='xlsx')
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--list-requests', type=int, default=50)
+    args = parser.parse_args()
+
+    fake = FakeSupabase(latency=args.latency_ms / 1000)
+    supabase_factory.use(fake)
+    app = create_app()
+    client = app.test_client()
+
+    print(f"{args.files} manifiestos x {args.rows} filas ({args.format}), referencia {args.reference}, "
+          f"latencia Supabase {args.latency_ms} ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest_paths, reference_path = write_inputs(tmp, args.files, args.rows, args.reference, args.format)
+
+        # 1. Referencia
+        start = time.perf_counter()
+        with open(reference_path, 'rb') as f:
+            response = client.post('/api/upload-reference', data={'file': (f, 'reference.csv')},
+                                   content_type='multipart/form-data')
+        elapsed = time.perf_counter() - start
+        body = response.get_json()
+        assert response.status_code == 200, body
+        print(f"\n/api/upload-reference: {elapsed:.3f}s  "
+              f"(insertados {body.get('inserted')}, llamadas a Supabase {fake.calls})")
+        for stage, seconds in (body.get('timing') or {}).items():
+            print(f"  {stage:<22} {seconds}")
+
+        # 2. process-all
+        stage_timings = {}
+        totals = []
+        for _ in range(args.repeat):
+            handles = [open(path, 'rb') for path in manifest_paths]
+            try:
+                start = time.perf_counter()
+                response = client.post('/api/process-all', data={
+                    **FORM_DATA,
+                    'files': [(handle, os.path.basename(handle.name)) for handle in handles]
+                }, content_type='multipart/form-data')
+                totals.append(time.perf_counter() - start)
+            finally:
+                for handle in handles:
+                    handle.close()
+            body = response.get_json()
+            assert response.status_code == 200, body
+            for stage, seconds in body['stage_timings'].items():
+                stage_timings.setdefault(stage, []).append(seconds)
+            # Nombres con marca de tiempo por segundo: evitar colisiones en Storage
+            time.sleep(1)
+
+        print(f"\n/api/process-all ({args.repeat} ejecuciones, "
+              f"coincidencias {body['comparison_results']['matched_items_count']}):")
+        for stage, values in stage_timings.items():
+            summarize(stage, values)
+        summarize("total (petición)", totals)
+
+        # 3. Listado de archivos
+        timings = []
+        for i in range(args.list_requests):
+            start = time.perf_counter()
+            response = client.get(f"/api/files?user_id={FORM_DATA['user_id']}&page={i % 3 + 1}&limit=10")
+            timings.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.get_json()
+        print(f"\n/api/files ({args.list_requests} peticiones, {response.get_json()['paginacion']['total']} archivos):")
+        summarize("latencia", timings, unit='ms')
+
+
+if __name__ == '__main__':
+    main()
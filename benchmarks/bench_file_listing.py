@@ -0,0 +1,95 @@
+"""
+Benchmark de latencia de /api/files (app/file_listing.py) con un Storage simulado.
+
+Uso:
+    python -m benchmarks.bench_file_listing --files 5000 --latency-ms 40 --requests 200
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from app.file_listing import FILE_TYPES, file_listing_cache, list_files_page
+from benchmarks.fake_supabase import FakeSupabase
+
+
+def make_objects(user_id, files):
+    """Objetos de Storage ("uploads/<tipo>/<user_id>/<nombre>") repartidos entre pdf/csv/xlsx."""
+    base = datetime(2024, 1, 1)
+    objects = {}
+    for i in range(files):
+        file_type = FILE_TYPES[i % len(FILE_TYPES)]
+        created_at = (base + timedelta(minutes=i)).isoformat()
+        objects[f"uploads/{file_type}/{user_id}/manifest_{i:06d}.{file_type}"] = (bytes(1024 + i % 512), created_at)
+    return objects
+
+
+def legacy_list(client, user_id, page, limit):
+    """Flujo anterior (en serie, URL por objeto, orden en Python), pero sin el tope de 100 por carpeta."""
+    result = []
+    for file_type in FILE_TYPES:
+        folder = f"{file_type}/{user_id}"
+        bucket = client.storage.from_('uploads')
+        offset = 0
+        while True:
+            response = bucket.list(folder, {"limit": 1000, "offset": offset})
+            for info in response:
+                result.append({
+                    "nombre": info['name'],
+                    "tipo": file_type,
+                    "fecha_subida": info['created_at'],
+                    "tamano": info['metadata']['size'],
+                    "url": bucket.get_public_url(f"{folder}/{info['name']}")
+                })
+            if len(response) < 1000:
+                break
+            offset += 1000
+    result.sort(key=lambda x: x['fecha_subida'], reverse=True)
+    start = (page - 1) * limit
+    return result[start:start + limit], len(result)
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def measure(label, fn, requests):
+    timings = []
+    for i in range(requests):
+        start = time.perf_counter()
+        fn(i)
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"{label:<32} p50 {percentile(timings, 50):8.2f} ms   p95 {percentile(timings, 95):8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--files', type=int, default=5000)
+    parser.add_argument('--latency-ms', type=float, default=40)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    user_id = "bench-user"
+    client = FakeSupabase(latency=args.latency_ms / 1000)
+    client.objects = make_objects(user_id, args.files)
+    pages = max(1, args.files // args.limit)
+    print(f"{args.files} archivos, latencia por list() {args.latency_ms} ms, {args.requests} peticiones")
+
+    measure("anterior (serie, sin caché)", lambda i: legacy_list(client, user_id, i % pages + 1, args.limit),
+            max(1, args.requests // 10))
+
+    def cold(i):
+        for file_type in FILE_TYPES:
+            file_listing_cache.invalidate(f"{file_type}/{user_id}")
+        list_files_page(client, user_id, FILE_TYPES, i % pages + 1, args.limit)
+    measure("nuevo, caché invalidada", cold, max(1, args.requests // 10))
+
+    measure("nuevo, caché caliente", lambda i: list_files_page(client, user_id, FILE_TYPES, i % pages + 1, args.limit),
+            args.requests)
+    measure("nuevo, caché caliente + search", lambda i: list_files_page(
+        client, user_id, FILE_TYPES, 1, args.limit, search_term=f"{i % 1000:03d}"), args.requests)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark de lectura de manifiestos: tiempo de parseo y pico de RSS por motor.
+
+Uso:
+    python -m benchmarks.bench_ingest --rows 200000
+
+Cada combinación motor/proyección se mide en un proceso nuevo para que el pico
+de memoria de una no contamine a la siguiente.
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from benchmarks.manifests import write_manifest
+
+
+def _max_rss_mb():
+    """Pico de memoria residente del proceso actual en MB."""
+    # En Linux VmHWM se reinicia con exec (ru_maxrss se hereda del padre)
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss está en KiB en Linux y en bytes en macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def _measure(path, engine, columns, queue):
+    from app.ingest import read_excel
+    baseline = _max_rss_mb()
+    start = time.perf_counter()
+    df = read_excel(path, columns=columns, engine=engine)
+    elapsed = time.perf_counter() - start
+    queue.put((elapsed, _max_rss_mb(), _max_rss_mb() - baseline, df.shape))
+
+
+def run(path, engine, columns):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_measure, args=(path, engine, columns, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    from app.ingest import available_engines, PIPELINE_COLUMNS
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--file', help='Manifiesto .xlsx existente (si no, se genera uno)')
+    args = parser.parse_args()
+
+    path = args.file or os.path.join(tempfile.gettempdir(), f"bench_manifest_{args.rows}.xlsx")
+    if not args.file:
+        print(f"Generando manifiesto de {args.rows} filas en {path} ...")
+        write_manifest(path, args.rows)
+
+    print(f"{'motor':<18}{'columnas':<12}{'tiempo (s)':>12}{'pico RSS (MB)':>16}{'delta RSS (MB)':>16}  forma")
+    for engine in available_engines():
+        for label, columns in (('todas', None), ('proyectadas', PIPELINE_COLUMNS)):
+            elapsed, peak, delta, shape = run(path, engine, columns)
+            print(f"{engine:<18}{label:<12}{elapsed:>12.2f}{peak:>16.1f}{delta:>16.1f}  {shape}")
+
+
+if __name__ == '__main__':
+    main()
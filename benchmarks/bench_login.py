@@ -0,0 +1,98 @@
+"""
+Benchmark de throughput de /api/login contra un Supabase simulado en memoria.
+
+Uso:
+    python -m benchmarks.bench_login --users 50 --logins 400 --concurrency 16 --rounds 12 --latency-ms 30
+"""
+import argparse
+import threading
+import time
+
+import bcrypt
+
+from app import create_app
+from app import routes
+from app.passwords import PasswordHasher
+from app.supabase_client import supabase_factory
+from benchmarks.fake_supabase import FakeSupabase
+
+
+def legacy_login(client, email, password):
+    """Flujo anterior: consulta a `users` y bcrypt.checkpw en el hilo de la petición."""
+    user = client.table('users').select('id, email, password, is_admin').eq('email', email).execute().data[0]
+    return bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8'))
+
+
+def run(label, logins, concurrency, login):
+    """Reparte `logins` entre `concurrency` hilos y reporta logins/s y latencias."""
+    timings = []
+    lock = threading.Lock()
+    counter = iter(range(logins))
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            login(i)
+            elapsed = time.perf_counter() - start
+            with lock:
+                timings.append(elapsed)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = time.perf_counter() - start
+
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(0.95 * len(timings)))]
+    print(f"{label:<34} {logins / total:7.1f} logins/s   p50 {timings[len(timings) // 2] * 1000:7.1f} ms"
+          f"   p95 {p95 * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--logins', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=12)
+    parser.add_argument('--workers', type=int, default=2, help="PASSWORD_WORKERS (hashes simultáneos)")
+    parser.add_argument('--latency-ms', type=float, default=30)
+    args = parser.parse_args()
+
+    client = FakeSupabase(latency=args.latency_ms / 1000)
+    salt = bcrypt.gensalt(rounds=args.rounds)
+    hashed = bcrypt.hashpw(b"secret", salt).decode('utf-8')
+    client.tables['users'] = [
+        {"id": str(i), "email": f"user{i}@example.com", "password": hashed, "is_admin": False}
+        for i in range(args.users)
+    ]
+    supabase_factory.use(client)
+    routes.password_hasher = PasswordHasher(rounds=args.rounds, max_concurrent=args.workers)
+
+    app = create_app()
+    print(f"{args.logins} logins, {args.users} usuarios, concurrencia {args.concurrency}, "
+          f"bcrypt rounds {args.rounds}, bcrypt simultáneos {args.workers}, latencia {args.latency_ms} ms")
+
+    run("anterior (bcrypt en el hilo)", args.logins, args.concurrency,
+        lambda i: legacy_login(client, f"user{i % args.users}@example.com", "secret"))
+
+    def login(i):
+        response = app.test_client().post('/api/login', json={
+            "email": f"user{i % args.users}@example.com", "password": "secret"
+        })
+        assert response.status_code == 200, response.get_json()
+
+    # El login siempre lee el hash de Supabase: una consulta a users por login
+    calls = client.calls
+    run("/api/login", args.logins, args.concurrency, login)
+    print(f"  consultas a users: {client.calls - calls}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark de memoria de los manifiestos consolidados: esquema tipado vs tipos crudos.
+
+Genera un PO de referencia (--files manifiestos CSV con ids en texto y
+precios con formato), los lee con parse_files y los consolida con
+consolidate_files dos veces: con MANIFEST_COMPACT_DTYPES desactivado y
+activado. Reporta la memoria del DataFrame consolidado por columna
+(memory_usage deep), el pico de tracemalloc de lectura + consolidación y el
+tiempo, y verifica que el CSV generado sea idéntico.
+
+Uso:
+    python -m benchmarks.bench_manifest_memory --files 30 --rows 20000
+"""
+import argparse
+import filecmp
+import os
+import tempfile
+import time
+import tracemalloc
+
+from config.config import Config
+from app.ingest import PIPELINE_COLUMNS, parse_files
+from app.pipeline import consolidate_files
+from app.services import create_csv
+from benchmarks.manifests import make_manifest
+
+
+def consolidate(paths):
+    # En este proceso: el pico de tracemalloc incluye la lectura
+    parsed = [df for df, _ in parse_files(paths, max_workers=1, columns=PIPELINE_COLUMNS)]
+    df, error = consolidate_files(parsed)
+    if error:
+        raise RuntimeError(error)
+    return df
+
+
+def measure(paths, compact):
+    Config.MANIFEST_COMPACT_DTYPES = compact
+    started = time.perf_counter()
+    df = consolidate(paths)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    consolidate(paths)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return df, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--files', type=int, default=30)
+    parser.add_argument('--rows', type=int, default=20000, help="filas por manifiesto")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.files):
+            path = os.path.join(tmp, f"manifest_{i}.csv")
+            make_manifest(args.rows, seed=i, formatted=True).to_csv(path, index=False)
+            paths.append(path)
+        print(f"{args.files} manifiestos x {args.rows} filas ({args.files * args.rows} filas)\n")
+
+        results = {}
+        for compact in (False, True):
+            df, elapsed, peak = measure(paths, compact)
+            csv_path = os.path.join(tmp, f"po_{compact}.csv")
+            create_csv(df, csv_path)
+            results[compact] = (df, elapsed, peak, csv_path)
+
+        before, after = results[False][0], results[True][0]
+        before_usage = before.memory_usage(deep=True, index=False)
+        after_usage = after.memory_usage(deep=True, index=False)
+        print(f"  {'columna':<16} {'tipo antes':<12} {'tipo después':<14} {'antes MB':>9} {'después MB':>11}")
+        for column in before.columns:
+            print(f"  {column:<16} {str(before[column].dtype):<12} {str(after[column].dtype):<14} "
+                  f"{before_usage[column] / 1e6:>9.1f} {after_usage[column] / 1e6:>11.1f}")
+        print(f"  {'total':<16} {'':<12} {'':<14} {before_usage.sum() / 1e6:>9.1f} {after_usage.sum() / 1e6:>11.1f}"
+              f"   ({after_usage.sum() / before_usage.sum():.0%})\n")
+
+        for compact, label in ((False, 'tipos crudos'), (True, 'esquema tipado')):
+            _, elapsed, peak, _ = results[compact]
+            print(f"  {label:<16} lectura + consolidación {elapsed:6.2f} s   pico tracemalloc {peak / 1e6:8.1f} MB")
+        same = filecmp.cmp(results[False][3], results[True][3], shallow=False)
+        print(f"\nCSV idéntico: {'sí' if same else 'NO'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark del renderer de órdenes de compra en PDF (app/pdf_renderer.py).
+
+Uso:
+    python -m benchmarks.bench_pdf --pallets 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from app.pdf_renderer import rows_per_page
+from app.services import create_pdf
+from benchmarks.manifests import make_manifest
+
+FORM_DATA = {
+    'purchase_info': 'PO-BENCH',
+    'order_date': '01/01/2025',
+    'seller_name': 'Vendor Inc.',
+    'seller_address': '1 Main St',
+    'company_name': 'Book For Less LLC',
+    'shipping_method': 'Ground',
+    'payment_terms': 'Net 30'
+}
+
+
+def make_order(pallets, items_per_pallet=2, seed=0):
+    """Manifiesto con exactamente `pallets` pallets distintos."""
+    df = make_manifest(pallets * items_per_pallet, seed=seed)
+    df['pallet_id'] = [f"P{n:07d}" for n in np.arange(len(df)) % pallets]
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--pallets', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_order(args.pallets)
+    pages = -(-args.pallets // rows_per_page())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output_pdf = os.path.join(tmp, "orden.pdf")
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = create_pdf(df, output_pdf, 20, FORM_DATA)
+            timings.append(time.perf_counter() - start)
+            if 'error' in result:
+                raise SystemExit(result['error'])
+        size = os.path.getsize(output_pdf)
+
+    best = min(timings)
+    print(f"{args.pallets} pallets, {pages} páginas, {size / 1024 / 1024:.1f} MB")
+    print(f"create_pdf: mejor {best:.3f}s, mediana {sorted(timings)[len(timings) // 2]:.3f}s "
+          f"-> {pages / best:.0f} páginas/s")
+
+
+if __name__ == '__main__':
+    main()
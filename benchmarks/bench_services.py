@@ -0,0 +1,215 @@
+"""
+Microbenchmarks de la capa de servicios comparados contra una línea base guardada.
+
+Mide tiempo (mediana de --repeat ejecuciones) y pico de memoria asignada
+(tracemalloc, en una ejecución aparte) de load_dataframe, consolidate_files,
+process_file, create_csv y create_pdf con manifiestos sintéticos en el formato
+del proveedor (ids con ceros a la izquierda, precios "$1,234.00").
+
+Uso:
+    python -m benchmarks.bench_services                       # compara con la línea base
+    python -m benchmarks.bench_services --rows 1000 10000 100000 1000000
+    python -m benchmarks.bench_services --save-baseline       # regenera la línea base
+
+Termina con código 1 si algún caso es más lento o usa más memoria que la línea
+base por encima de la tolerancia. La línea base depende de la máquina: se
+regenera con --save-baseline en la máquina de referencia, con el stack fijado
+del proyecto (Python del workflow de despliegue y pandas de requirements.txt).
+Si la versión menor de Python o de pandas no coincide con la de la línea base
+no se compara (código 2), salvo con --allow-env-mismatch.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from app import services
+from app.ingest import load_dataframe
+from app.pipeline import consolidate_files
+from benchmarks.manifests import make_manifest
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baselines', 'bench_services.json')
+DEFAULT_ROWS = [1000, 10000, 100000]
+
+FORM_DATA = {
+    'purchase_info': 'PO-BENCH',
+    'order_date': '01/01/2025',
+    'seller_name': 'Vendor Inc.',
+    'seller_address': '1 Main St',
+    'company_name': 'Book For Less LLC',
+    'shipping_method': 'Ground',
+    'payment_terms': 'Net 30'
+}
+
+
+def _check(result):
+    """Los servicios devuelven {"error": ...} en lugar de lanzar excepciones."""
+    if isinstance(result, dict) and 'error' in result:
+        raise RuntimeError(result['error'])
+    if isinstance(result, tuple) and result[1]:
+        raise RuntimeError(result[1])
+    return result
+
+
+def make_cases(df, csv_path, output_dir):
+    """Casos a medir: nombre -> función sin argumentos."""
+    return {
+        'load_dataframe': lambda: load_dataframe(csv_path),
+        'consolidate_files': lambda: _check(consolidate_files([df])),
+        'process_file': lambda: _check(services.process_file(df, 20)),
+        'create_csv': lambda: _check(services.create_csv(df, os.path.join(output_dir, 'items.csv'))),
+        'create_pdf': lambda: _check(services.create_pdf(df, os.path.join(output_dir, 'order.pdf'), 20, FORM_DATA))
+    }
+
+
+def measure(case, repeat):
+    """Mediana de tiempo de `repeat` ejecuciones y pico de memoria (MB) de una ejecución trazada."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        case()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        case()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return statistics.median(timings), peak / (1024 * 1024)
+
+
+def run(rows_list, repeat, only=None):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # process_file escribe en DOWNLOAD_FOLDER
+        services.DOWNLOAD_FOLDER = tmp
+        for rows in rows_list:
+            df = make_manifest(rows, seed=rows, formatted=True)
+            csv_path = os.path.join(tmp, f"manifest_{rows}.csv")
+            df.to_csv(csv_path, index=False)
+            # Lo mismo que recibe el pipeline: el manifiesto leído del archivo
+            df = load_dataframe(csv_path)
+
+            for name, case in make_cases(df, csv_path, tmp).items():
+                if only and name not in only:
+                    continue
+                seconds, peak_mb = measure(case, repeat)
+                results.setdefault(name, {})[str(rows)] = {
+                    "seconds": round(seconds, 4),
+                    "peak_mb": round(peak_mb, 1)
+                }
+                print(f"  {name:<18}{rows:>9} filas {seconds:10.3f} s {peak_mb:10.1f} MB", flush=True)
+    return results
+
+
+def compare(results, baseline, time_tolerance, memory_tolerance, min_delta):
+    """Imprime la tabla contra la línea base y devuelve la lista de regresiones."""
+    regressions = []
+    print(f"\n{'caso':<18}{'filas':>9}{'tiempo (s)':>12}{'base':>10}{'Δ':>8}"
+          f"{'pico (MB)':>12}{'base':>10}{'Δ':>8}")
+    for name, by_rows in results.items():
+        for rows, current in by_rows.items():
+            base = baseline.get(name, {}).get(rows)
+            if base is None:
+                print(f"{name:<18}{rows:>9}{current['seconds']:>12.3f}{'-':>10}{'':>8}"
+                      f"{current['peak_mb']:>12.1f}{'-':>10}")
+                continue
+
+            time_delta = current['seconds'] / base['seconds'] - 1 if base['seconds'] else 0
+            memory_delta = current['peak_mb'] / base['peak_mb'] - 1 if base['peak_mb'] else 0
+            slow = (time_delta > time_tolerance
+                    and current['seconds'] - base['seconds'] > min_delta)
+            heavy = (memory_delta > memory_tolerance
+                     and current['peak_mb'] - base['peak_mb'] > 1)
+            flag = ''
+            if slow or heavy:
+                flag = '  <-- REGRESIÓN'
+                kind = ' y '.join(label for label, hit in (('tiempo', slow), ('memoria', heavy)) if hit)
+                regressions.append((name, rows, kind))
+            print(f"{name:<18}{rows:>9}{current['seconds']:>12.3f}{base['seconds']:>10.3f}{time_delta:>+8.0%}"
+                  f"{current['peak_mb']:>12.1f}{base['peak_mb']:>10.1f}{memory_delta:>+8.0%}{flag}")
+    return regressions
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count()
+    }
+
+
+def environment_mismatches(stored, current):
+    """Diferencias de versión menor de Python/pandas entre la línea base y este entorno."""
+    mismatches = []
+    for key in ('python', 'pandas'):
+        recorded = str(stored.get(key, ''))
+        if recorded.split('.')[:2] != str(current[key]).split('.')[:2]:
+            mismatches.append(f"{key} {recorded or '?'} (línea base) vs {current[key]} (actual)")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', nargs='+', help="medir solo estos casos")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--allow-env-mismatch', action='store_true',
+                        help="comparar aunque Python o pandas no coincidan con la línea base")
+    parser.add_argument('--time-tolerance', type=float, default=0.5,
+                        help="fracción de tiempo extra tolerada (0.5 = +50%%)")
+    parser.add_argument('--memory-tolerance', type=float, default=0.25)
+    parser.add_argument('--min-delta', type=float, default=0.05,
+                        help="segundos extra por debajo de los cuales no se considera regresión")
+    args = parser.parse_args()
+
+    stored = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        # Se revisa antes de medir: los números de otro stack no sirven como referencia
+        mismatches = environment_mismatches(stored.get('environment', {}), environment())
+        if mismatches:
+            print("La línea base se grabó con otro entorno: " + "; ".join(mismatches))
+            if not args.allow_env_mismatch:
+                print("Regenérala con --save-baseline en el stack fijado o usa --allow-env-mismatch")
+                sys.exit(2)
+            print("Se compara de todos modos (--allow-env-mismatch): los resultados son solo orientativos\n")
+
+    print(f"Filas: {args.rows}, repeticiones: {args.repeat}")
+    results = run(args.rows, args.repeat, args.only)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2)
+            f.write("\n")
+        print(f"\nLínea base guardada en {args.baseline}")
+        return
+
+    if stored is None:
+        print(f"\nNo existe la línea base {args.baseline}; créala con --save-baseline")
+        return
+    print(f"\nLínea base: {stored.get('environment')}")
+    regressions = compare(results, stored.get('results', {}),
+                          args.time_tolerance, args.memory_tolerance, args.min_delta)
+    if regressions:
+        print(f"\n{len(regressions)} regresión(es): " +
+              ", ".join(f"{name} ({rows} filas, {kind})" for name, rows, kind in regressions))
+        sys.exit(1)
+    print("\nSin regresiones respecto a la línea base.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark de arranque: tiempo de import/create_app y tiempo hasta la primera petición.
+
+Cada medición corre en un intérprete nuevo (como un worker de gunicorn recién
+creado). Supabase se sustituye por el stand-in en memoria para /api/login;
+la creación del cliente real se mide aparte (no abre conexiones).
+
+Uso:
+    python -m benchmarks.bench_startup --repeat 5
+    python -m benchmarks.bench_startup --importtime     # módulos más lentos de importar
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = r"""
+import importlib, json, time
+started = time.perf_counter()
+from app import create_app
+app = create_app()
+timings = {"create_app": time.perf_counter() - started}
+client = app.test_client()
+
+t = time.perf_counter()
+assert client.get('/').status_code == 200
+timings["primera GET /"] = time.perf_counter() - t
+
+import bcrypt
+from app.supabase_client import supabase_factory
+t = time.perf_counter()
+supabase_factory.get()
+timings["cliente Supabase"] = time.perf_counter() - t
+
+from benchmarks.fake_supabase import FakeSupabase
+fake = FakeSupabase()
+fake.tables['users'] = [{"id": "1", "email": "a@example.com", "is_admin": False,
+                         "password": bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds=4)).decode()}]
+supabase_factory.use(fake)
+t = time.perf_counter()
+response = client.post('/api/login', json={"email": "a@example.com", "password": "secret"})
+assert response.status_code == 200, response.get_json()
+timings["primer POST /api/login"] = time.perf_counter() - t
+
+t = time.perf_counter()
+for module in ('app.pipeline', 'app.reference_sync', 'app.pdf_renderer'):
+    importlib.import_module(module)
+timings["imports de process-all"] = time.perf_counter() - t
+print(json.dumps(timings))
+"""
+
+HEAVY_MODULES = ('pandas', 'numpy', 'openpyxl', 'reportlab', 'supabase')
+
+
+def _run(args, warmup=False):
+    env = dict(os.environ, WARMUP_ON_START='true' if warmup else 'false')
+    env.setdefault('SUPABASE_URL', 'http://localhost:54321')
+    env.setdefault('SUPABASE_API_KEY', 'bench')
+    env.setdefault('DATABASE_URL', 'sqlite://')
+    # bcrypt con rounds bajos: se mide el arranque, no el hash
+    env.setdefault('BCRYPT_ROUNDS', '4')
+    return subprocess.run([sys.executable, *args], env=env, capture_output=True, text=True, check=True)
+
+
+def run_probe(warmup):
+    return json.loads(_run(['-c', PROBE], warmup).stdout.strip().splitlines()[-1])
+
+
+def loaded_after_create_app():
+    code = ("import sys; from app import create_app; create_app(); "
+            f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])")
+    return _run(['-c', code]).stdout.strip()
+
+
+def import_profile(limit):
+    """Módulos con mayor tiempo acumulado según `python -X importtime`."""
+    stderr = _run(['-X', 'importtime', '-c', 'from app import create_app; create_app()']).stderr
+    rows = []
+    for line in stderr.splitlines():
+        # "import time:   self |  cumulative | módulo"
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative), name.rstrip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--importtime', action='store_true')
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    print(f"Módulos pesados cargados tras create_app(): {loaded_after_create_app()}\n")
+    for warmup in (False, True):
+        runs = [run_probe(warmup) for _ in range(args.repeat)]
+        print(f"WARMUP_ON_START={'true' if warmup else 'false'} (mediana de {args.repeat} procesos)")
+        for step in runs[0]:
+            values = [run[step] for run in runs]
+            print(f"  {step:<26} {statistics.median(values) * 1000:8.1f} ms   max {max(values) * 1000:8.1f} ms")
+        print()
+
+    if args.importtime:
+        print("Import acumulado más lento (create_app, sin warm-up):")
+        for cumulative, name in import_profile(args.top):
+            print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""
+Supabase en memoria para benchmarks y pruebas locales.
+
+Implementa el subconjunto de supabase-py que usa el backend:
+- Tablas (PostgREST): select, eq, neq, in_, order, range, limit,
+  insert, upsert(on_conflict=...), update, delete.
+- Storage: upload, download, list (limit/offset/sortBy), get_public_url,
+  create_signed_url.
+
+Cada llamada que en producción sería una petición HTTP (`execute()` y los
+métodos de Storage) espera `latency` segundos. Se instala en la app con
+`supabase_factory.use(FakeSupabase(...))`.
+"""
+import copy
+import itertools
+import threading
+import time
+from datetime import datetime, timezone
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def dict(self):
+        return {"data": self.data, "error": None}
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.operation = 'select'
+        self.payload = None
+        self.on_conflict = None
+        self.columns = None
+        self.filters = []
+        self.order_by = []
+        self.offset = 0
+        self.max_rows = None
+
+    # --- Operaciones ---
+    def select(self, columns='*', **kwargs):
+        self.operation = 'select'
+        self.columns = None if columns.strip() == '*' else [c.strip() for c in columns.split(',')]
+        return self
+
+    def insert(self, payload, **kwargs):
+        self.operation, self.payload = 'insert', payload
+        return self
+
+    def upsert(self, payload, on_conflict='id', **kwargs):
+        self.operation, self.payload, self.on_conflict = 'upsert', payload, on_conflict
+        return self
+
+    def update(self, payload, **kwargs):
+        self.operation, self.payload = 'update', payload
+        return self
+
+    def delete(self, **kwargs):
+        self.operation = 'delete'
+        return self
+
+    # --- Filtros y modificadores ---
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def neq(self, column, value):
+        self.filters.append(lambda row: row.get(column) != value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column, desc=False, **kwargs):
+        self.order_by.append((column, desc))
+        return self
+
+    def range(self, start, end):
+        self.offset = start
+        self.max_rows = end - start + 1
+        return self
+
+    def limit(self, count):
+        self.max_rows = count
+        return self
+
+    def _matches(self, row):
+        return all(condition(row) for condition in self.filters)
+
+    def _project(self, row):
+        return {c: row.get(c) for c in self.columns} if self.columns else dict(row)
+
+    def execute(self):
+        time.sleep(self.client.latency)
+        with self.client.lock:
+            self.client.calls += 1
+            rows = self.client.tables.setdefault(self.table, [])
+
+            if self.operation == 'select':
+                selected = [row for row in rows if self._matches(row)]
+                for column, desc in reversed(self.order_by):
+                    selected.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+                end = None if self.max_rows is None else self.offset + self.max_rows
+                data = [self._project(row) for row in selected[self.offset:end]]
+
+            elif self.operation in ('insert', 'upsert'):
+                payload = self.payload if isinstance(self.payload, list) else [self.payload]
+                existing = {}
+                if self.operation == 'upsert':
+                    existing = {row.get(self.on_conflict): row for row in rows}
+                data = []
+                for new_row in payload:
+                    current = existing.get(new_row.get(self.on_conflict))
+                    if current is not None:
+                        current.update(new_row)
+                        data.append(dict(current))
+                        continue
+                    row = dict(new_row)
+                    row.setdefault('id', next(self.client.ids))
+                    rows.append(row)
+                    if self.operation == 'upsert':
+                        existing[row.get(self.on_conflict)] = row
+                    data.append(dict(row))
+
+            elif self.operation == 'update':
+                data = []
+                for row in rows:
+                    if self._matches(row):
+                        row.update(self.payload)
+                        data.append(dict(row))
+
+            else:  # delete
+                data = [dict(row) for row in rows if self._matches(row)]
+                rows[:] = [row for row in rows if not self._matches(row)]
+
+        return FakeResponse(copy.deepcopy(data))
+
+
+class FakeBucket:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def _key(self, path):
+        return f"{self.name}/{path}"
+
+    def upload(self, path, file, file_options=None):
+        time.sleep(self.client.latency)
+        body = file.read() if hasattr(file, 'read') else bytes(file)
+        with self.client.lock:
+            self.client.calls += 1
+            if self._key(path) in self.client.objects:
+                raise Exception(f"Duplicate: The resource already exists ({path})")
+            self.client.objects[self._key(path)] = (body, datetime.now(timezone.utc).isoformat())
+        return {"Key": self._key(path)}
+
+    def download(self, path):
+        time.sleep(self.client.latency)
+        with self.client.lock:
+            self.client.calls += 1
+            if self._key(path) not in self.client.objects:
+                raise Exception(f"Object not found ({path})")
+            return self.client.objects[self._key(path)][0]
+
+    def list(self, path=None, options=None):
+        time.sleep(self.client.latency)
+        options = options or {}
+        prefix = self._key(path or '').rstrip('/') + '/'
+        with self.client.lock:
+            self.client.calls += 1
+            entries = [
+                {"name": key[len(prefix):], "created_at": created_at, "metadata": {"size": len(body)}}
+                for key, (body, created_at) in self.client.objects.items()
+                if key.startswith(prefix) and '/' not in key[len(prefix):]
+            ]
+        sort_by = options.get('sortBy', {'column': 'name', 'order': 'asc'})
+        entries.sort(key=lambda e: e[sort_by['column']], reverse=sort_by['order'] == 'desc')
+        offset = options.get('offset', 0)
+        return entries[offset:offset + options.get('limit', 100)]
+
+    def get_public_url(self, path, options=None):
+        return f"http://storage.local/object/public/{self.name}/{path}"
+
+    def create_signed_url(self, path, expires_in, options=None):
+        time.sleep(self.client.latency)
+        url = f"http://storage.local/object/sign/{self.name}/{path}?expires={expires_in}"
+        return {"signedURL": url, "signedUrl": url, "signed_url": url}
+
+
+class FakeSupabase:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.tables = {}
+        # Storage: "<bucket>/<ruta>" -> (contenido, created_at)
+        self.objects = {}
+        self.calls = 0
+        self.ids = itertools.count(1)
+        self.lock = threading.RLock()
+        self.storage = self
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def from_(self, bucket):
+        return FakeBucket(self, bucket)
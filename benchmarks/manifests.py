@@ -0,0 +1,84 @@
+"""Generador de manifiestos sintéticos con la forma del modelo Inventory."""
+import os
+
+import numpy as np
+import pandas as pd
+
+INVENTORY_COLUMNS = [
+    'series_code', 'series_desc', 'pallet_id', 'pallet_available_flag',
+    'item_id', 'item_desc', 'family_code', 'reporting_group_desc',
+    'publisher_desc', 'imprint_desc', 'us_price', 'can_price', 'pub_date',
+    'quantity', 'extended_retail', 'extended_percent'
+]
+
+
+PRICE_COLUMNS = ['us_price', 'can_price', 'extended_retail', 'extended_percent']
+
+
+def format_price(values):
+    """Precios como los exporta el proveedor: "$1,234.00"."""
+    return pd.Series(values).map("${:,.2f}".format).to_numpy()
+
+
+def make_manifest(rows, seed=0, formatted=False):
+    """
+    Devuelve un DataFrame de `rows` filas con todas las columnas de Inventory.
+
+    Con `formatted=True` imita el export real del proveedor: series_code y
+    pallet_id numéricos con ceros a la izquierda ("00042", "0000012345"),
+    algunos precios por encima de 1.000 y las columnas de precio como texto
+    "$1,234.00".
+    """
+    if formatted:
+        return _make_formatted_manifest(rows, seed)
+    rng = np.random.default_rng(seed)
+    series = rng.integers(1, max(2, rows // 400), rows)
+    pallets = rng.integers(1, max(2, rows // 40), rows)
+    us_price = np.round(rng.uniform(1, 80, rows), 2)
+    quantity = rng.integers(1, 50, rows)
+    publishers = np.array([f"Publisher {i}" for i in range(40)])
+    return pd.DataFrame({
+        'series_code': [f"S{n:05d}" for n in series],
+        'series_desc': [f"Series description {n}" for n in series],
+        'pallet_id': [f"P{n:07d}" for n in pallets],
+        'pallet_available_flag': rng.integers(0, 2, rows).astype(bool),
+        'item_id': [f"{n:013d}" for n in rng.integers(10**9, 10**12, rows)],
+        'item_desc': [f"Item title {n}" for n in rng.integers(0, rows, rows)],
+        'family_code': rng.choice(['HC', 'PB', 'MM', 'BB'], rows),
+        'reporting_group_desc': rng.choice(['Adult', 'Children', 'Young Adult'], rows),
+        'publisher_desc': publishers[rng.integers(0, len(publishers), rows)],
+        'imprint_desc': [f"Imprint {n % 120}" for n in series],
+        'us_price': us_price,
+        'can_price': np.round(us_price * 1.3, 2),
+        'pub_date': pd.Timestamp('2015-01-01') + pd.to_timedelta(rng.integers(0, 3650, rows), unit='D'),
+        'quantity': quantity,
+        'extended_retail': np.round(us_price * quantity, 2),
+        'extended_percent': np.round(us_price * quantity * 0.1, 2),
+    })
+
+
+def _make_formatted_manifest(rows, seed):
+    df = make_manifest(rows, seed)
+    rng = np.random.default_rng(seed + 1)
+    df['series_code'] = [f"{n:05d}" for n in rng.integers(1, max(2, rows // 400), rows)]
+    df['pallet_id'] = [f"{n:010d}" for n in rng.integers(1, max(2, rows // 40), rows)]
+    # Cola larga de precios (enciclopedias, sets): ~2% por encima de $1,000
+    us_price = np.round(np.where(rng.random(rows) < 0.02, rng.uniform(1000, 2500, rows), df['us_price']), 2)
+    quantity = df['quantity'].to_numpy()
+    df['us_price'] = format_price(us_price)
+    df['can_price'] = format_price(np.round(us_price * 1.3, 2))
+    df['extended_retail'] = format_price(np.round(us_price * quantity, 2))
+    df['extended_percent'] = format_price(np.round(us_price * quantity * 0.1, 2))
+    return df
+
+
+def write_manifest(path, rows, seed=0, formatted=False):
+    """Escribe el manifiesto en .xlsx o .csv (se reutiliza si ya existe)."""
+    if os.path.exists(path):
+        return path
+    df = make_manifest(rows, seed, formatted)
+    if path.endswith('.csv'):
+        df.to_csv(path, index=False)
+    else:
+        df.to_excel(path, index=False, engine='openpyxl')
+    return path
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Cargar variables de entorno
@@ -10,4 +11,98 @@ class Config:
     SUPABASE_URL = os.getenv("SUPABASE_URL")
     SUPABASE_API_KEY = os.getenv("SUPABASE_API_KEY")
     PORT = os.getenv("PORT", 8000)
-    CORS_ALLOWED_ORIGINS = os.getenv("CORS_ALLOWED_ORIGINS", "https://bks4less-po-generator.com").split(",")
\ No newline at end of file
+    CORS_ALLOWED_ORIGINS = os.getenv("CORS_ALLOWED_ORIGINS", "https://bks4less-po-generator.com").split(",")
+    # Índice en memoria de item_reference (segundos antes de recargar)
+    REFERENCE_CACHE_TTL = int(os.getenv("REFERENCE_CACHE_TTL", 300))
+    REFERENCE_GENERATION_FILE = os.getenv(
+        "REFERENCE_GENERATION_FILE",
+        os.path.join(tempfile.gettempdir(), "books4less_reference_generation")
+    )
+
+    # Modo asíncrono de /api/process-all (cola local respaldada en SQLite)
+    JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join(tempfile.gettempdir(), "books4less_jobs.sqlite3"))
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+    JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", 8))
+    JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", 86400))
+    # Duración máxima de un stream SSE de /api/jobs/<id>/events (ocupa un worker síncrono);
+    # el navegador se reconecta tras JOB_EVENTS_RETRY_MS
+    JOB_EVENTS_TIMEOUT = int(os.getenv("JOB_EVENTS_TIMEOUT", 25))
+    JOB_EVENTS_RETRY_MS = int(os.getenv("JOB_EVENTS_RETRY_MS", 2000))
+
+    # Subidas concurrentes a Supabase Storage
+    STORAGE_UPLOAD_WORKERS = int(os.getenv("STORAGE_UPLOAD_WORKERS", 8))
+
+    # Lectura en paralelo de archivos en consolidate_files/process-all (1 = en serie)
+    PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", min(4, os.cpu_count() or 1)))
+    PARSE_START_METHOD = os.getenv("PARSE_START_METHOD", "spawn")
+
+    # Motor de lectura de Excel: auto | calamine | openpyxl-stream | openpyxl
+    INGEST_ENGINE = os.getenv("INGEST_ENGINE", "auto")
+    # Tipos compactos al leer manifiestos: categorías para textos repetidos y enteros angostos
+    MANIFEST_COMPACT_DTYPES = os.getenv("MANIFEST_COMPACT_DTYPES", "true").lower() in ("1", "true", "yes")
+    # Fracción máxima de valores distintos para codificar un texto como categoría
+    MANIFEST_CATEGORY_RATIO = float(os.getenv("MANIFEST_CATEGORY_RATIO", 0.5))
+    # Descargas desde Supabase Storage (/download/<tipo>): tamaño de bloque y timeout
+    DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", 64 * 1024))
+    STORAGE_TIMEOUT = float(os.getenv("STORAGE_TIMEOUT", 60))
+
+    # Caché local de artefactos (CSV/PDF generados y descargas de Storage)
+    ARTIFACT_CACHE_DIR = os.getenv("ARTIFACT_CACHE_DIR", os.path.join("downloads", "cache"))
+    ARTIFACT_CACHE_MAX_BYTES = int(os.getenv("ARTIFACT_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+    ARTIFACT_CACHE_TTL = int(os.getenv("ARTIFACT_CACHE_TTL", 3600))
+    ARTIFACT_CACHE_JANITOR_INTERVAL = int(os.getenv("ARTIFACT_CACHE_JANITOR_INTERVAL", 60))
+
+    # Caché de listados de Storage para /api/files (por usuario y tipo)
+    FILE_LISTING_DB = os.getenv("FILE_LISTING_DB", os.path.join(tempfile.gettempdir(), "books4less_listings.sqlite3"))
+    FILE_LISTING_TTL = int(os.getenv("FILE_LISTING_TTL", 60))
+
+    # Caché de tokens JWT verificados (token_required)
+    TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 4096))
+    TOKEN_CACHE_MAX_TTL = int(os.getenv("TOKEN_CACHE_MAX_TTL", 300))
+
+    # Contraseñas: costo de bcrypt, hashes simultáneos por worker (PASSWORD_WORKERS) y cola
+    # (login / register / change-password). Acota CPU y cola; la petición sigue esperando el hash
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+    PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", 2))
+    PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", 32))
+    PASSWORD_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_QUEUE_TIMEOUT", 5))
+    # Caché corta de usuarios por email (sin el hash de la contraseña)
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 30))
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 1024))
+
+    # Cliente de Supabase compartido: pool HTTP (keep-alive / HTTP/2) y timeouts
+    SUPABASE_HTTP2 = os.getenv("SUPABASE_HTTP2", "true").lower() in ("1", "true", "yes")
+    SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", 20))
+    SUPABASE_MAX_KEEPALIVE = int(os.getenv("SUPABASE_MAX_KEEPALIVE", 10))
+    SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", 30))
+    SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", 60))
+    SUPABASE_CONNECT_TIMEOUT = float(os.getenv("SUPABASE_CONNECT_TIMEOUT", 10))
+
+    # Métricas estilo Prometheus (/metrics), compartidas por los workers del host
+    METRICS_DB = os.getenv("METRICS_DB", os.path.join(tempfile.gettempdir(), "books4less_metrics.sqlite3"))
+    METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 5))
+    # Si se define, /metrics exige "Authorization: Bearer <METRICS_TOKEN>"
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+    # Profiling bajo demanda (admins: cabecera X-Profile o ?profile=1)
+    PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join("downloads", "profiles"))
+    PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", 0.005))
+    PROFILE_MAX_PROFILES = int(os.getenv("PROFILE_MAX_PROFILES", 50))
+    PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", 30))
+
+    # Carga de manifiestos en la tabla Inventory desde process-all (COPY en PostgreSQL)
+    # Crear/actualizar inventory e item_comparison al arrancar (por defecto se usa `flask init-db`)
+    DB_SCHEMA_ON_START = os.getenv("DB_SCHEMA_ON_START", "false").lower() in ("1", "true", "yes")
+    INVENTORY_INGEST = os.getenv("INVENTORY_INGEST", "false").lower() in ("1", "true", "yes")
+    INVENTORY_BATCH_SIZE = int(os.getenv("INVENTORY_BATCH_SIZE", 50000))
+    # Guardar la comparación de process-all en item_comparison y re-evaluar
+    # las filas no coincidentes cuando cambia item_reference
+    COMPARISON_PERSIST = os.getenv("COMPARISON_PERSIST", "false").lower() in ("1", "true", "yes")
+    COMPARISON_BATCH_SIZE = int(os.getenv("COMPARISON_BATCH_SIZE", 10000))
+    # Tamaño de página por defecto y máximo de /api/inventory
+    INVENTORY_PAGE_LIMIT = int(os.getenv("INVENTORY_PAGE_LIMIT", 100))
+    INVENTORY_MAX_PAGE_LIMIT = int(os.getenv("INVENTORY_MAX_PAGE_LIMIT", 1000))
+
+    # Importar pandas/reportlab/supabase al crear la app en lugar de en la primera petición
+    # (útil con gunicorn --preload: los workers heredan los módulos ya cargados)
+    WARMUP_ON_START = os.getenv("WARMUP_ON_START", "false").lower() in ("1", "true", "yes")